@@ -0,0 +1,44 @@
+"""Microbenchmark of the text and binary message codecs in utils.
+Usage:
+    python bench/codec_bench.py --number 200000
+"""
+
+import sys
+import timeit
+import argparse
+
+from server_process import ROOT
+
+sys.path.insert(0, ROOT)
+import utils  # noqa: E402
+
+CHAT_NAME = '2017011527-2017011528'
+MESSAGES = {
+    'text': (0, 'Hello, how are you doing today? ' * 4, 0),
+    'file header': (2, './receive/files/some_large_installer_v1.2.3.exe', 1234567890),
+}
+
+
+def bench(number):
+    for name, (message_type, content, length) in MESSAGES.items():
+        for codec in ('text', 'binary'):
+            encode = getattr(utils, 'encode_message_' + codec)
+            encoded = encode(CHAT_NAME, 2333, message_type, '2017011527', content, length)
+            assert utils.decode_message(encoded) == [CHAT_NAME, 2333, message_type,
+                                                     '2017011527', content, length]
+            encode_time = timeit.timeit(
+                lambda: encode(CHAT_NAME, 2333, message_type, '2017011527', content, length),
+                number=number)
+            decode_time = timeit.timeit(lambda: utils.decode_message(encoded), number=number)
+            print('{:12s} {:7s} {:4d} bytes, encode {:.2f} us, decode {:.2f} us'.format(
+                name, codec, len(encoded), encode_time / number * 1e6, decode_time / number * 1e6))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--number', type=int, default=200000)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    bench(parse_args().number)
@@ -0,0 +1,167 @@
+"""Measure the CPU time and syscalls a chat spends receiving a file body:
+    legacy: the old Chat.write_to_file loop, sock.recv 1 KiB packages and spin on BlockingIOError
+    selector: utils.recv_file into a new file, recv_into a 1 MB buffer and write it
+    checksum: the same but also computes crc32 of every chunk, like Chat.receive_content() did
+    mmap: utils.recv_file into a preallocated file (utils.preallocate()),
+        received straight into a mapping of it with checksums, like Chat.receive_content()
+The sender is throttled to --rate MB/s like a real network, so that the receiver
+    has to wait for data most of the time, --rate 0 sends as fast as possible.
+Syscalls are recv calls (including those that would block), waits for data
+    and writes (syscw of the receiving thread in /proc, Linux only).
+Usage:
+    python bench/file_receive_bench.py --size 1024 --rate 200
+"""
+
+import os
+import sys
+import time
+import socket
+import argparse
+import tempfile
+from threading import Thread
+
+from server_process import ROOT
+
+sys.path.insert(0, ROOT)
+import utils  # noqa: E402
+import config  # noqa: E402
+
+
+def legacy_receive(sock, path, size):
+    file = open(path, 'wb')
+    received_size = 0
+    while True:
+        next_size = config.MAX_PACKAGE_SIZE if \
+            received_size + config.MAX_PACKAGE_SIZE <= size else size - received_size
+        while True:
+            try:
+                package = sock.recv(next_size)
+                break
+            except BlockingIOError:
+                pass
+        file.write(package)
+        received_size += len(package)
+        if received_size >= size:
+            break
+    file.close()
+    return received_size
+
+
+def mapped_receive(sock, path, size):
+    utils.preallocate(path, size)
+    return utils.recv_file(sock, path, size, 0, checksums=[])
+
+
+RECEIVERS = {
+    'legacy': legacy_receive,
+    'selector': utils.recv_file,
+    'checksum': lambda sock, path, size: utils.recv_file(sock, path, size, checksums=[]),
+    'mmap': mapped_receive,
+}
+
+
+class CountingSocket:
+    """Count recv calls on sock, and the waits for data that follow those which would block."""
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.recvs = 0
+        self.blocked = 0
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def recv(self, *args):
+        return self.count(self.sock.recv, *args)
+
+    def recv_into(self, *args):
+        return self.count(self.sock.recv_into, *args)
+
+    def count(self, recv, *args):
+        self.recvs += 1
+        try:
+            return recv(*args)
+        except BlockingIOError:
+            self.blocked += 1
+            raise
+
+
+def thread_writes():
+    """Write syscalls made by the current thread so far, 0 if unknown."""
+    try:
+        with open('/proc/thread-self/io') as f:
+            return int(dict(line.split(': ') for line in f.read().splitlines())['syscw'])
+    except (OSError, KeyError, ValueError):
+        return 0
+
+
+def send(sock, size, rate):
+    """Send size bytes at about rate bytes per second."""
+    block = os.urandom(1 << 16)
+    start = time.perf_counter()
+    sent = 0
+    while sent < size:
+        sock.sendall(block[:size - sent])
+        sent += min(len(block), size - sent)
+        ahead = sent / rate - (time.perf_counter() - start) if rate else 0
+        if ahead > 0:
+            time.sleep(ahead)
+
+
+def receive(mode, sock, path, size, result):
+    sock.setblocking(False)  # like the sockets of chats
+    counting_sock = CountingSocket(sock)
+    writes = thread_writes()
+    start = time.thread_time()
+    received = RECEIVERS[mode](counting_sock, path, size)
+    cpu = time.thread_time() - start
+    writes = thread_writes() - writes
+    waits = 0 if mode == 'legacy' else counting_sock.blocked  # legacy spins instead
+    result.extend((received, cpu, counting_sock.recvs + waits + writes))
+
+
+def transfer(mode, path, size, rate):
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(1)
+    sock = socket.create_connection(listener.getsockname())
+    receiver_sock, _ = listener.accept()
+    listener.close()
+    result = []
+    receiver = Thread(target=receive, args=(mode, receiver_sock, path, size, result))
+    receiver.start()
+    start = time.perf_counter()
+    send(sock, size, rate)
+    receiver.join()
+    seconds = time.perf_counter() - start
+    sock.close()
+    receiver_sock.close()
+    received, cpu, syscalls = result
+    assert received == size, 'received {} of {} bytes'.format(received, size)
+    return cpu / (size / 2 ** 30), seconds, syscalls / (size / 2 ** 30)
+
+
+def main(args):
+    fd, path = tempfile.mkstemp()
+    os.close(fd)
+    try:
+        for mode in args.modes:
+            cpu, seconds, syscalls = transfer(mode, path, args.size * 2 ** 20, args.rate * 2 ** 20)
+            print('{:8s} {} MB at {} MB/s: {:.2f} s ({:.0f} MB/s), receiver CPU {:.2f} s '
+                  'and {:.0f} syscalls per GB'.format(mode, args.size, args.rate or 'unlimited',
+                                                      seconds, args.size / seconds, cpu, syscalls))
+    finally:
+        os.remove(path)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--size', type=int, default=1024, help='file size in MB')
+    parser.add_argument('--rate', type=int, default=200, help='sending rate in MB/s, 0: unlimited')
+    parser.add_argument('--modes', nargs='+', choices=RECEIVERS,
+                        default=['legacy', 'selector', 'checksum', 'mmap'])
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    main(parse_args())
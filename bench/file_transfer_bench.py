@@ -0,0 +1,113 @@
+"""Measure the throughput of sending a file over loopback, the way Chat sends files:
+    legacy: the old loop, config.MAX_PACKAGE_SIZE packages by sock.send
+    legacy-image: the old image loop, which also sleeps 1 ms per package
+    buffered: utils.send_file without os.sendfile, config.FILE_CHUNK_SIZE chunks
+    sendfile: utils.send_file
+Usage:
+    python bench/file_transfer_bench.py --size 1024 --modes legacy buffered sendfile
+"""
+
+import os
+import sys
+import time
+import socket
+import argparse
+import tempfile
+from threading import Thread
+
+from server_process import ROOT
+
+sys.path.insert(0, ROOT)
+import utils  # noqa: E402
+import config  # noqa: E402
+
+
+def legacy_send(sock, path, sleep):
+    with open(path, 'rb') as file:
+        while True:
+            package = file.read(config.MAX_PACKAGE_SIZE)
+            if sleep:
+                time.sleep(0.001)
+            if not package:
+                break
+            while True:
+                try:
+                    sock.send(package)
+                    break
+                except BlockingIOError:
+                    time.sleep(0.001)
+
+
+def buffered_send(sock, path):
+    with open(path, 'rb') as file:
+        utils.send_file_chunks(sock, file, 0, os.fstat(file.fileno()).st_size)
+
+
+SENDERS = {
+    'legacy': lambda sock, path: legacy_send(sock, path, False),
+    'legacy-image': lambda sock, path: legacy_send(sock, path, True),
+    'buffered': buffered_send,
+    'sendfile': utils.send_file,
+}
+
+
+def receive(sock, result):
+    header = utils.decode_message(utils.recv_msg(sock))
+    size, received = header[5], 0
+    buffer = bytearray(1 << 20)
+    while received < size:
+        n = sock.recv_into(buffer, min(len(buffer), size - received))
+        if not n:
+            break
+        received += n
+    result.append(received)
+
+
+def transfer(path, mode):
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(1)
+    sock = socket.create_connection(listener.getsockname())
+    receiver_sock, _ = listener.accept()
+    listener.close()
+    result = []
+    receiver = Thread(target=receive, args=(receiver_sock, result), daemon=True)
+    receiver.start()
+
+    sock.setblocking(False)  # like the sockets of chats
+    size = os.path.getsize(path)
+    start = time.perf_counter()
+    utils.send_msg(sock, utils.encode_message('2017011527-2017011528', 2333, 2,
+                                              '2017011527', path, size))
+    SENDERS[mode](sock, path)
+    receiver.join()
+    seconds = time.perf_counter() - start
+    sock.close()
+    receiver_sock.close()
+    assert result == [size], 'received {} of {} bytes'.format(result, size)
+    return size / seconds / 2 ** 20
+
+
+def main(args):
+    fd, path = tempfile.mkstemp()
+    try:
+        block = os.urandom(2 ** 20)
+        with os.fdopen(fd, 'wb') as f:
+            for _ in range(args.size):
+                f.write(block)
+        for mode in args.modes:
+            print('{:12s} {} MB: {:.0f} MB/s'.format(mode, args.size, transfer(path, mode)))
+    finally:
+        os.remove(path)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--size', type=int, default=1024, help='file size in MB')
+    parser.add_argument('--modes', nargs='+', choices=SENDERS,
+                        default=['legacy', 'buffered', 'sendfile'])
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    main(parse_args())
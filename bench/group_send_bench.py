@@ -0,0 +1,115 @@
+"""Measure the time for GroupChat to send a file to members of different speeds:
+    sequential: send to one member after another, like GroupChat did before fan_out()
+    fan-out: GroupChat.send_message(), all members at the same time from one mmap
+Every member is a thread reading the file body at its own --rates MB/s and answering
+    like a receiving chat does, so the time of the slowest member alone is size / min(rates).
+Usage:
+    python bench/group_send_bench.py --size 64 --rates 40 40 40 10
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import tempfile
+from threading import Thread
+
+from server_process import ROOT
+
+sys.path.insert(0, ROOT)
+import utils  # noqa: E402
+import config  # noqa: E402
+from classes.user import User  # noqa: E402
+from classes.chat import GroupChat  # noqa: E402
+from classes.message import FileMessage  # noqa: E402
+
+
+class Signal:
+    def emit(self, *args):
+        pass
+
+
+def member(chat, user, sock, rate):
+    """Answer the offer with everything missing, read the body at rate,
+        then answer done once all its frames are received.
+    """
+    sock.setblocking(True)
+    left = 0
+    while True:
+        decoded_message = utils.decode_message(utils.recv_msg(sock))
+        if decoded_message is None:
+            return
+        header = json.loads(decoded_message[4])
+        if decoded_message[2] == 11:  # offer
+            left = decoded_message[5]
+            missing = [[0, left]]
+        else:  # content
+            received, count = 0, decoded_message[5]
+            buffer = bytearray(1 << 16)
+            start = time.perf_counter()
+            while received < count:
+                received += sock.recv_into(buffer, min(len(buffer), count - received))
+                ahead = received / rate - (time.perf_counter() - start)
+                if ahead > 0:
+                    time.sleep(ahead)
+            left -= count
+            if left > 0:  # more frames coming
+                continue
+            missing = []
+        # what the chat's run loop does with the answer
+        answer = json.dumps({'id': header['id'], 'missing': missing})
+        chat.receive_answer([chat.name, 0, 12, user.user_id, answer, 0], user)
+
+
+def group_send(path, size, rates, mode):
+    me = User('2017011527', ip='127.0.0.1', port=2333)
+    users = {str(2017011528 + i): User(str(2017011528 + i), ip='127.0.0.1', port=2333)
+             for i in range(len(rates))}
+    chat = GroupChat(me, users, [Signal()] * 5)
+    members = []
+    for (user_id, user), rate in zip(users.items(), rates):
+        chat.socks[user_id], member_sock = socket.socketpair()
+        chat.socks[user_id].setblocking(False)  # like the sockets of chats
+        members.append(Thread(target=member, daemon=True,
+                              args=(chat, user, member_sock, rate * 2 ** 20)))
+    [t.start() for t in members]
+
+    start = time.perf_counter()
+    if mode == 'fan-out':
+        display_message = chat.send_message(2, path)
+        assert 'success' in display_message.text, display_message.text
+    else:
+        for user_id, user in users.items():
+            message = FileMessage(None, me.user_id, user_id, '', path, size)
+            assert chat.send_content(message, chat.socks[user_id]).state == 'done'
+    return time.perf_counter() - start
+
+
+def main(args):
+    config.FILE_BULK_CHANNEL = False  # all via the chat sockets
+    fd, path = tempfile.mkstemp()
+    size = args.size * 2 ** 20
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(os.urandom(size))
+        print('slowest member alone: {:.2f} s, all members one by one: {:.2f} s'.format(
+            args.size / min(args.rates), sum(args.size / rate for rate in args.rates)))
+        for mode in ('sequential', 'fan-out'):
+            print('{:10s} {} MB to members at {} MB/s: {:.2f} s'.format(
+                mode, args.size, args.rates, group_send(path, size, args.rates, mode)))
+    finally:
+        os.remove(path)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--size', type=int, default=64, help='file size in MB')
+    parser.add_argument('--rates', type=int, nargs='+', default=[40, 40, 40, 10],
+                        help='reading rate of every member in MB/s')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    main(parse_args())
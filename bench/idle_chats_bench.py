@@ -0,0 +1,175 @@
+"""Measure threads, idle CPU and message latency of a client with many private or group chats:
+    polling: every chat has its own thread polling its sockets, like chats did,
+        every 0.1 s for a PrivateChat, without ever sleeping for a GroupChat
+    reactor: all chat sockets are watched by classes.reactor, like chats do
+    asyncio: all chat sockets are served by the event loop of classes.aio_chat
+Usage:
+    python bench/idle_chats_bench.py --chats 1000 --seconds 5 --modes polling reactor asyncio
+    python bench/idle_chats_bench.py --groups 10 --members 4
+    python bench/idle_chats_bench.py --send  # every chat sends a text before it's idle
+"""
+
+import sys
+import time
+import random
+import socket
+import argparse
+import threading
+from threading import Event
+
+from server_process import ROOT
+
+sys.path.insert(0, ROOT)
+import utils  # noqa: E402
+from classes.user import User  # noqa: E402
+from classes.chat import PrivateChat, GroupChat  # noqa: E402
+from classes.aio_chat import AsyncPrivateChat, AsyncGroupChat  # noqa: E402
+
+PRIVATE_CHATS = {'reactor': PrivateChat, 'asyncio': AsyncPrivateChat}
+GROUP_CHATS = {'reactor': GroupChat, 'asyncio': AsyncGroupChat}
+
+
+class Signal:
+    def emit(self, *args):
+        pass
+
+
+class DisplaySignal:
+    """display_message_signal of all chats, wakes up the one waiting for a text."""
+
+    def __init__(self):
+        self.received = Event()
+
+    def emit(self, display_message):
+        self.received.set()
+
+
+class PollingChat(PrivateChat):
+    """PrivateChat with its own thread polling self.sock, as before classes.reactor."""
+
+    def run(self):
+        while self.is_alive:
+            try:
+                message = utils.recv_msg(self.sock)
+            except BlockingIOError:
+                time.sleep(0.1)
+                continue
+            if message is None:
+                return
+            self.handle_receive_message(message)
+
+    def kill(self):
+        self.is_alive = False
+
+
+class PollingGroupChat(GroupChat):
+    """GroupChat with its own thread trying every sock in turn, as before classes.reactor."""
+
+    def run(self):
+        while any(sock is None for sock in self.socks.values()):
+            time.sleep(0.1)
+        while self.is_alive:
+            for key, sock in self.socks.items():
+                try:
+                    message = utils.recv_msg(sock)
+                except BlockingIOError:
+                    continue
+                if message is not None:
+                    self.handle_receive_message(message, key)
+
+    def kill(self):
+        self.is_alive = False
+
+
+def open_chats(mode, count, display_signal):
+    me = User('2017011527', ip='127.0.0.1', port=2333)
+    chat_class = PRIVATE_CHATS.get(mode, PollingChat)
+    chats = []
+    for i in range(count):
+        other = User(str(2000000000 + i), ip='127.0.0.1', port=2333)
+        sock, other_sock = socket.socketpair()
+        chat = chat_class(me, other, (display_signal,) + tuple(Signal() for _ in range(4)),
+                          tuple(Signal() for _ in range(3)), sock=sock)
+        chat.is_current = True
+        chat.daemon = True
+        chat.start()
+        chats.append((chat, other, other_sock))
+    return chats
+
+
+def open_groups(mode, count, members, display_signal):
+    """Returns (chat, member, sock of the member) for every member of every group."""
+    me = User('2017011527', ip='127.0.0.1', port=2333)
+    chat_class = GROUP_CHATS.get(mode, PollingGroupChat)
+    chats = []
+    for i in range(count):
+        others = {str(2000000000 + i * members + j): None for j in range(members)}
+        for user_id in others:
+            others[user_id] = User(user_id, ip='127.0.0.1', port=2333)
+        chat = chat_class(me, others, (display_signal,) + tuple(Signal() for _ in range(4)))
+        chat.is_current = True
+        chat.daemon = True
+        chat.start()
+        for user_id, other in others.items():  # members connect after the chat starts
+            sock, other_sock = socket.socketpair()
+            chat.update_server_sock(sock, user_id)
+            chats.append((chat, other, other_sock))
+    return chats
+
+
+def ping(chat, other, other_sock, display_signal):
+    """Seconds from the other user sending a text until the chat displays it."""
+    display_signal.received.clear()
+    start = time.perf_counter()
+    utils.send_msg(other_sock, utils.encode_message(chat.name, 2333, 0, other.user_id, 'ping', 0))
+    display_signal.received.wait(5)
+    return time.perf_counter() - start
+
+
+def measure(mode, args):
+    display_signal = DisplaySignal()
+    if args.groups:
+        chats = open_groups(mode, args.groups, args.members, display_signal)
+    else:
+        chats = open_chats(mode, args.chats, display_signal)
+    if args.send:  # chats that have sent something may keep a writer
+        [chat.send_message(0, 'hello') for chat, _, _ in chats]
+    seconds = args.seconds
+    time.sleep(1)  # let every chat settle
+    threads = threading.active_count()
+    start = time.process_time()
+    time.sleep(seconds)
+    cpu = (time.process_time() - start) / seconds
+    latencies = sorted(ping(*random.choice(chats), display_signal) for _ in range(args.pings))
+    for chat, _, other_sock in chats:
+        chat.kill()
+        other_sock.close()
+    return threads, cpu, latencies
+
+
+def main(args):
+    chats = '{} groups of {}'.format(args.groups, args.members + 1) if args.groups else \
+        '{} chats'.format(args.chats)
+    for mode in args.modes:
+        threads, cpu, latencies = measure(mode, args)
+        print('{:8s} {}: {} threads, idle CPU {:.1f}%, text latency '
+              'median {:.1f} ms, max {:.1f} ms'.format(
+                  mode, chats, threads, cpu * 100,
+                  latencies[len(latencies) // 2] * 1000, latencies[-1] * 1000))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--chats', type=int, default=1000, help='private chats')
+    parser.add_argument('--groups', type=int, default=0, help='group chats instead of private')
+    parser.add_argument('--members', type=int, default=4, help='other members of every group')
+    parser.add_argument('--seconds', type=float, default=5, help='idle time to measure CPU')
+    parser.add_argument('--pings', type=int, default=50, help='texts to measure latency')
+    parser.add_argument('--send', action='store_true', help='every chat sends a text first')
+    parser.add_argument('--modes', nargs='+', choices=['polling', 'reactor', 'asyncio'],
+                        default=['polling', 'reactor', 'asyncio'])
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    main(parse_args())
@@ -0,0 +1,55 @@
+"""Measure how many idle clients my central server holds per MB and how fast it accepts log ins.
+Usage:
+    python bench/idle_connections.py --mode async --clients 10000
+"""
+
+import time
+import asyncio
+import argparse
+
+from server_process import ServerProcess
+
+MB = 1024 * 1024
+
+
+async def log_in(port, user_id, limit):
+    async with limit:
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write('{}_net2019_{}'.format(user_id, 2333).encode())
+        reply = await reader.read(1024)
+    assert reply == b'lol', reply
+    return writer
+
+
+async def run(args):
+    limit = asyncio.Semaphore(args.concurrency)
+    with ServerProcess(args.port, args.mode) as server:
+        base_rss = server.rss()
+        start = time.perf_counter()
+        writers = await asyncio.gather(*[log_in(args.port, str(2000000000 + i), limit)
+                                         for i in range(args.clients)])
+        elapsed = time.perf_counter() - start
+        await asyncio.sleep(1)  # let the server settle with every client idle
+        rss = server.rss()
+        for writer in writers:
+            writer.close()
+
+    used_mb = max(rss - base_rss, 1) / MB
+    print('mode: {}, clients: {}'.format(args.mode, args.clients))
+    print('server RSS: {:.1f} MB idle, {:.1f} MB with all clients'.format(base_rss / MB, rss / MB))
+    print('connections per MB: {:.0f}'.format(args.clients / used_mb))
+    print('log ins per second: {:.0f}'.format(args.clients / elapsed))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--mode', choices=['thread', 'async'], default='async')
+    parser.add_argument('--port', type=int, default=10100)
+    parser.add_argument('--clients', type=int, default=10000)
+    parser.add_argument('--concurrency', type=int, default=500,
+                        help='connections being set up at the same time')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    asyncio.run(run(parse_args()))
@@ -0,0 +1,193 @@
+"""Load generator for my central server.
+Start the server on localhost, then simulate many clients sending the plain commands
+    from the MyCentralServer docstring with a configurable mix:
+        log in: UserID_net2019_ListeningPort, query: qUserID, log out: logoutUserID
+Reports throughput, p50/p95/p99 latency and errors of every command,
+    plus RSS of the server and its worker processes, as JSON
+    so results of different server versions can be compared.
+Usage:
+    python bench/load_generator.py --mode async --clients 2000 --duration 10 \\
+        --mix login=1 query=8 logout=1 --output result.json
+"""
+
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+
+from server_process import ServerProcess
+
+COMMANDS = ('login', 'query', 'logout')
+FIRST_ID = 2000000000
+
+
+class Client:
+    """A simulated user keeping one connection, logs in again after logging out."""
+
+    def __init__(self, index, args, stats):
+        self.user_id = str(FIRST_ID + index)
+        self.args = args
+        self.stats = stats
+        self.reader = None
+        self.writer = None
+
+    async def send(self, name, command, expected):
+        """Send a command, wait for the reply and record latency or error."""
+        start = time.perf_counter()
+        try:
+            self.writer.write(command.encode())
+            reply = await asyncio.wait_for(self.reader.read(1024), self.args.timeout)
+        except (OSError, asyncio.TimeoutError):
+            reply = None
+        latency = time.perf_counter() - start
+        if reply is None or not expected(reply.decode()):
+            self.stats[name]['errors'] += 1
+            return False
+        self.stats[name]['latencies'].append(latency)
+        return True
+
+    async def connect_and_log_in(self):
+        self.reader, self.writer = await asyncio.open_connection('127.0.0.1', self.args.port)
+        return await self.log_in()
+
+    async def log_in(self):
+        port = random.randint(10000, 20000)  # no config.INVALID_PORT in this range
+        return await self.send('login', '{}_net2019_{}'.format(self.user_id, port),
+                               lambda reply: reply == 'lol')
+
+    async def query(self):
+        user_id = str(FIRST_ID + random.randrange(self.args.clients))
+        return await self.send('query', 'q{}'.format(user_id),
+                               lambda reply: reply == 'n' or '_' in reply)
+
+    async def log_out(self):
+        ok = await self.send('logout', 'logout{}'.format(self.user_id),
+                             lambda reply: reply == 'loo')
+        self.writer.close()
+        try:
+            return await self.connect_and_log_in() and ok
+        except OSError:  # e.g. refused when the server is overloaded
+            self.stats['login']['errors'] += 1
+            return False
+
+    async def run(self, deadline, weights):
+        while time.perf_counter() < deadline:
+            command = random.choices(COMMANDS, weights)[0]
+            if command == 'login':
+                ok = await self.log_in()
+            elif command == 'query':
+                ok = await self.query()
+            else:
+                ok = await self.log_out()
+            if not ok:  # start over with a new connection
+                self.writer.close()
+                try:
+                    await self.connect_and_log_in()
+                except OSError:
+                    await asyncio.sleep(self.args.think)
+            if self.args.think > 0:
+                await asyncio.sleep(random.uniform(0, 2 * self.args.think))
+        self.writer.close()
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    idx = min(len(sorted_values) - 1, int(round(p / 100. * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+def summarize(stats, elapsed):
+    result = {}
+    for name in COMMANDS:
+        latencies = sorted(stats[name]['latencies'])
+        result[name] = {
+            'count': len(latencies),
+            'errors': stats[name]['errors'],
+            'throughput': len(latencies) / elapsed,
+            'p50_ms': None if not latencies else percentile(latencies, 50) * 1000,
+            'p95_ms': None if not latencies else percentile(latencies, 95) * 1000,
+            'p99_ms': None if not latencies else percentile(latencies, 99) * 1000,
+        }
+    return result
+
+
+async def run(args, server):
+    stats = {name: {'latencies': [], 'errors': 0} for name in COMMANDS}
+    clients = [Client(i, args, stats) for i in range(args.clients)]
+
+    # connect and log in everyone first, a bit at a time
+    limit = asyncio.Semaphore(args.concurrency)
+
+    async def setup(client):
+        async with limit:
+            await client.connect_and_log_in()
+
+    await asyncio.gather(*[setup(client) for client in clients])
+    for name in COMMANDS:  # only measure the steady state
+        stats[name] = {'latencies': [], 'errors': 0}
+
+    weights = [args.mix[name] for name in COMMANDS]
+    start = time.perf_counter()
+    await asyncio.gather(*[client.run(start + args.duration, weights) for client in clients])
+    elapsed = time.perf_counter() - start
+
+    commands = summarize(stats, elapsed)
+    return {
+        'server': {'mode': args.mode, 'workers': args.workers, 'rss_bytes': server.rss()},
+        'clients': args.clients,
+        'duration_s': elapsed,
+        'mix': args.mix,
+        'throughput': sum(command['count'] for command in commands.values()) / elapsed,
+        'errors': sum(command['errors'] for command in commands.values()),
+        'commands': commands,
+    }
+
+
+def parse_mix(items):
+    mix = {name: 0 for name in COMMANDS}
+    for item in items:
+        name, weight = item.split('=')
+        if name not in COMMANDS:
+            raise argparse.ArgumentTypeError('unknown command {}'.format(name))
+        mix[name] = float(weight)
+    return mix
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mode', choices=['thread', 'async'], default='async')
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--port', type=int, default=10103)
+    parser.add_argument('--clients', type=int, default=2000)
+    parser.add_argument('--duration', type=float, default=10, help='seconds of steady load')
+    parser.add_argument('--mix', nargs='+', default=['login=1', 'query=8', 'logout=1'],
+                        help='weights of commands, e.g. login=1 query=8 logout=1')
+    parser.add_argument('--think', type=float, default=0.,
+                        help='mean seconds every client waits between two commands')
+    parser.add_argument('--timeout', type=float, default=5.)
+    parser.add_argument('--concurrency', type=int, default=500,
+                        help='connections being set up at the same time')
+    parser.add_argument('--output', default=None, help='write JSON here instead of stdout')
+    args = parser.parse_args()
+    args.mix = parse_mix(args.mix)
+    return args
+
+
+def main():
+    args = parse_args()
+    with ServerProcess(args.port, args.mode, ['--workers', str(args.workers)]) as server:
+        result = asyncio.run(run(args, server))
+    if args.output is None:
+        json.dump(result, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""Measure threads and time to handle a burst of texts arriving on many private chats at once:
+    threads: every readable chat socket is read and handled in a new thread, like chats did
+    pool: chat sockets are read and handled by classes.worker_pool, like chats do
+    asyncio: chat sockets are read and texts handled by the event loop of classes.aio_chat
+Every other user sends --messages numbered texts, which must be displayed in order.
+Usage:
+    python bench/message_burst_bench.py --chats 1000 --messages 20 --modes threads pool
+    python bench/message_burst_bench.py --work 1 --queue 64
+"""
+
+import sys
+import time
+import socket
+import argparse
+import threading
+from threading import Thread, Condition
+
+from server_process import ROOT
+
+sys.path.insert(0, ROOT)
+import utils  # noqa: E402
+from classes.user import User  # noqa: E402
+from classes.chat import PrivateChat  # noqa: E402
+from classes.aio_chat import AsyncPrivateChat  # noqa: E402
+from classes.worker_pool import workers  # noqa: E402
+
+
+class Signal:
+    def emit(self, *args):
+        pass
+
+
+class DisplaySignal:
+    """display_message_signal of all chats, checks the order of texts and counts them."""
+
+    def __init__(self, work):
+        self.work = work
+        self.last = {}
+        self.displayed = 0
+        self.out_of_order = 0
+        self.condition = Condition()
+
+    def emit(self, display_message):
+        time.sleep(self.work)  # e.g. the UI thread being busy
+        number = int(display_message.text)
+        with self.condition:
+            if number != self.last.get(display_message.sender_id, -1) + 1:
+                self.out_of_order += 1
+            self.last[display_message.sender_id] = number
+            self.displayed += 1
+            self.condition.notify_all()
+
+    def wait(self, count, timeout):
+        with self.condition:
+            self.condition.wait_for(lambda: self.displayed >= count, timeout)
+
+
+class ThreadChat(PrivateChat):
+    """PrivateChat reading every message in a new thread, as before classes.worker_pool."""
+
+    def check_sock(self, sock, *args):
+        t = Thread(target=self.read_message, args=(sock,) + args, daemon=True)
+        t.start()
+
+
+def open_chats(mode, count, display_signal):
+    me = User('2017011527', ip='127.0.0.1', port=2333)
+    chat_class = {'threads': ThreadChat, 'pool': PrivateChat, 'asyncio': AsyncPrivateChat}[mode]
+    chats = []
+    for i in range(count):
+        other = User(str(2000000000 + i), ip='127.0.0.1', port=2333)
+        sock, other_sock = socket.socketpair()
+        chat = chat_class(me, other, (display_signal,) + tuple(Signal() for _ in range(4)),
+                          tuple(Signal() for _ in range(3)), sock=sock)
+        chat.is_current = True
+        chat.daemon = True
+        chat.start()
+        chats.append((chat, other, other_sock))
+    return chats
+
+
+def count_threads(result, done):
+    """Keep the most threads seen in result[0] until done is set."""
+    while not done.wait(0.01):
+        result[0] = max(result[0], threading.active_count())
+
+
+def measure(mode, args):
+    display_signal = DisplaySignal(args.work / 1000)
+    chats = open_chats(mode, args.chats, display_signal)
+    time.sleep(1)  # let every chat settle
+    peak, done = [threading.active_count()], threading.Event()
+    Thread(target=count_threads, args=(peak, done), daemon=True).start()
+
+    start = time.perf_counter()
+    for number in range(args.messages):  # a round of texts on every chat
+        for chat, other, other_sock in chats:
+            utils.send_msg(other_sock, utils.encode_message(
+                chat.name, 2333, 0, other.user_id, str(number), 0))
+    display_signal.wait(args.chats * args.messages, 60)
+    seconds = time.perf_counter() - start
+    done.set()
+
+    for chat, _, other_sock in chats:
+        chat.kill()
+        other_sock.close()
+    return seconds, peak[0], display_signal
+
+
+def main(args):
+    workers.limit = args.queue
+    for mode in args.modes:
+        seconds, threads, display_signal = measure(mode, args)
+        print('{:8s} {} chats x {} texts: {} displayed ({} out of order) in {:.2f} s, '
+              'peak {} threads'.format(mode, args.chats, args.messages, display_signal.displayed,
+                                       display_signal.out_of_order, seconds, threads))
+        if mode == 'pool':
+            print('         pool: {}'.format(', '.join(
+                '{} {:.1f}'.format(k, v) if isinstance(v, float) else '{} {}'.format(k, v)
+                for k, v in workers.stats().items())))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--chats', type=int, default=1000, help='private chats')
+    parser.add_argument('--messages', type=int, default=20, help='texts sent on every chat')
+    parser.add_argument('--work', type=float, default=0, help='ms to display a text')
+    parser.add_argument('--queue', type=int, default=1024, help='worker pool queue limit')
+    parser.add_argument('--modes', nargs='+', choices=['threads', 'pool', 'asyncio'],
+                        default=['threads', 'pool'])
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    main(parse_args())
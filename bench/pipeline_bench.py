@@ -0,0 +1,52 @@
+"""Measure queries per second of a pipelined MyCentralServerConnector with different depths.
+Usage:
+    python bench/pipeline_bench.py --mode async --queries 20000 --depth 1 32
+"""
+
+import sys
+import time
+import argparse
+from collections import deque
+
+from server_process import ServerProcess, ROOT
+
+sys.path.insert(0, ROOT)
+from central_server_connector import MyCentralServerConnector  # noqa: E402
+
+
+def run_queries(connector, queries, depth):
+    """Keep `depth` queries in flight until `queries` ones are answered, returns QPS."""
+    in_flight = deque()
+    start = time.perf_counter()
+    for i in range(queries):
+        if len(in_flight) >= depth:
+            in_flight.popleft().result()
+        in_flight.append(connector.search_user_async('2017011527'))
+    while in_flight:
+        in_flight.popleft().result()
+    return queries / (time.perf_counter() - start)
+
+
+def main(args):
+    with ServerProcess(args.port, args.mode):
+        connector = MyCentralServerConnector('127.0.0.1', args.port, pipelined=True)
+        connector.connect()
+        connector.log_in('2017011527', 'net2019', 2333)
+        assert connector.search_user('2017011527') != 'n'
+        for depth in args.depth:
+            qps = run_queries(connector, args.queries, depth)
+            print('mode: {}, depth: {:3d}, queries per second: {:.0f}'.format(args.mode, depth, qps))
+        connector.disconnect('2017011527')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--mode', choices=['thread', 'async'], default='async')
+    parser.add_argument('--port', type=int, default=10101)
+    parser.add_argument('--queries', type=int, default=20000)
+    parser.add_argument('--depth', type=int, nargs='+', default=[1, 32])
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    main(parse_args())
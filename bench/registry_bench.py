@@ -0,0 +1,77 @@
+"""Measure the cost of persisting my central server's registry.
+    1. log ins per second with persistence on vs off
+    2. time to recover 1M registrations from log only, and from snapshot
+Usage:
+    python bench/registry_bench.py --logins 50000 --registrations 1000000
+"""
+
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+from collections import deque
+
+from server_process import ServerProcess, ROOT
+
+sys.path.insert(0, ROOT)
+from registry_log import RegistryLog  # noqa: E402
+from central_server_connector import MyCentralServerConnector  # noqa: E402
+
+
+def log_in_throughput(port, logins, depth, extra_args):
+    with ServerProcess(port, 'async', extra_args):
+        connector = MyCentralServerConnector('127.0.0.1', port, pipelined=True)
+        connector.connect()
+        in_flight = deque()
+        start = time.perf_counter()
+        for i in range(logins):
+            if len(in_flight) >= depth:
+                assert in_flight.popleft().result() == 'lol'
+            in_flight.append(connector.request('{}_net2019_{}'.format(2000000000 + i, 2333)))
+        while in_flight:
+            assert in_flight.popleft().result() == 'lol'
+        return logins / (time.perf_counter() - start)
+
+
+def recovery_time(folder):
+    start = time.perf_counter()
+    all_users = RegistryLog(folder).load()
+    return time.perf_counter() - start, len(all_users)
+
+
+def main(args):
+    folder = tempfile.mkdtemp()
+    try:
+        off = log_in_throughput(args.port, args.logins, args.depth, [])
+        on = log_in_throughput(args.port, args.logins, args.depth, ['--data-folder', folder])
+        print('log ins per second: {:.0f} persistence off, {:.0f} persistence on'.format(off, on))
+        shutil.rmtree(folder)
+
+        registry_log = RegistryLog(folder, snapshot_records=args.registrations * 2)
+        all_users = registry_log.load()
+        for i in range(args.registrations):  # like what the server does when log in
+            user_id, port = str(2000000000 + i), 2333 + i % 60000
+            all_users[user_id] = {'ip': '127.0.0.1', 'port': port}
+            registry_log.log_in(user_id, '127.0.0.1', port)
+        registry_log.flush()
+        seconds, users = recovery_time(folder)
+        print('recover {} users from log: {:.2f} s'.format(users, seconds))
+        registry_log.snapshot()
+        seconds, users = recovery_time(folder)
+        print('recover {} users from snapshot: {:.2f} s'.format(users, seconds))
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--port', type=int, default=10102)
+    parser.add_argument('--logins', type=int, default=50000)
+    parser.add_argument('--depth', type=int, default=32, help='pipelined log ins in flight')
+    parser.add_argument('--registrations', type=int, default=1000000)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    main(parse_args())
@@ -0,0 +1,135 @@
+"""Measure sending a burst of texts from many threads on one private chat:
+    spin: every sender waits for is_sending and writes by itself, like chats did
+    outbox: texts wait in the Outbox of the chat socket, written by its writer thread,
+        back to back ones together
+Every sender is a thread, like MainWin.send_message() starts one for every text.
+For text sent during an image or file on the chat socket, see text_latency_bench.py.
+Usage:
+    python bench/send_queue_bench.py --threads 20 --messages 50 --modes spin outbox
+"""
+
+import sys
+import time
+import socket
+import argparse
+from threading import Thread, Condition
+
+from server_process import ROOT
+
+sys.path.insert(0, ROOT)
+import utils  # noqa: E402
+from classes.user import User  # noqa: E402
+from classes.chat import PrivateChat  # noqa: E402
+
+
+class Signal:
+    def emit(self, *args):
+        pass
+
+
+class DisplaySignal:
+    """display_message_signal of the receiving chat, counts texts."""
+
+    def __init__(self):
+        self.displayed = 0
+        self.condition = Condition()
+
+    def emit(self, display_message):
+        with self.condition:
+            self.displayed += 1
+            self.condition.notify_all()
+
+    def wait(self, count, timeout):
+        with self.condition:
+            self.condition.wait_for(lambda: self.displayed >= count, timeout)
+
+
+class CountingSocket:
+    """Count send calls on sock."""
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.sends = 0
+
+    def send(self, *args):
+        self.sends += 1
+        return self.sock.send(*args)
+
+    def __getattr__(self, name):
+        return getattr(self.sock, name)
+
+
+class SpinChat(PrivateChat):
+    """PrivateChat waiting for is_sending and writing by itself, as before classes.outbox."""
+
+    def __init__(self, *args, **kwargs):
+        super(SpinChat, self).__init__(*args, **kwargs)
+        self.is_sending = False
+
+    def send_message(self, message_type, new_message):
+        while self.is_sending:  # send one thing at one time
+            time.sleep(0.1)
+        self.is_sending = True
+        display_message = self.send_new_message(message_type, new_message)
+        self.is_sending = False
+        self.update_history_message(display_message)
+        return display_message
+
+    def send_frame(self, sock, message_type, message, length=0):
+        utils.send_msg(sock, utils.encode_message(self.name, self.me_user.port, message_type,
+                                                  self.me_user.user_id, message, length))
+
+
+def make_chat(chat_class, me, other, sock, signals, video_signals):
+    chat = chat_class(me, other, signals, video_signals, sock=sock)
+    chat.is_current = True
+    chat.daemon = True
+    chat.start()
+    return chat
+
+
+def burst(mode, threads, messages):
+    me = User('2017011527', ip='127.0.0.1', port=2333)
+    other = User('2017011528', ip='127.0.0.1', port=2333)
+    sock, other_sock = socket.socketpair()
+    counting_sock = CountingSocket(sock)
+    display_signal = DisplaySignal()
+    chat = make_chat(SpinChat if mode == 'spin' else PrivateChat, me, other, counting_sock,
+                     tuple(Signal() for _ in range(5)), tuple(Signal() for _ in range(3)))
+    other_chat = make_chat(PrivateChat, other, me, other_sock,
+                           (display_signal,) + tuple(Signal() for _ in range(4)),
+                           tuple(Signal() for _ in range(3)))
+
+    def send():
+        for _ in range(messages):
+            chat.send_message(0, 'hello')
+
+    start = time.perf_counter()
+    senders = [Thread(target=send, daemon=True) for _ in range(threads)]
+    [t.start() for t in senders]
+    display_signal.wait(threads * messages, 120)
+    seconds = time.perf_counter() - start
+
+    chat.kill()
+    other_chat.kill()
+    return seconds, display_signal.displayed, counting_sock.sends
+
+
+def main(args):
+    for mode in args.modes:
+        seconds, displayed, sends = burst(mode, args.threads, args.messages)
+        print('{:6s} {} threads x {} texts: {} displayed in {:.2f} s, {} sends'.format(
+            mode, args.threads, args.messages, displayed, seconds, sends))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--threads', type=int, default=20, help='threads sending texts')
+    parser.add_argument('--messages', type=int, default=50, help='texts sent by every thread')
+    parser.add_argument('--modes', nargs='+', choices=['spin', 'outbox'],
+                        default=['spin', 'outbox'])
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    main(parse_args())
@@ -0,0 +1,73 @@
+"""This file contains helpers to run my central server in a separate process for benchmarks."""
+
+import os
+import sys
+import time
+import signal
+import socket
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class ServerProcess:
+    """Run `python my_central_server.py` in a child process and measure it."""
+
+    def __init__(self, port, mode='async', extra_args=()):
+        self.port = port
+        self.mode = mode
+        self.extra_args = list(extra_args)
+        self.proc = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def start(self):
+        command = [sys.executable, 'my_central_server.py',
+                   '--mode', self.mode, '--port', str(self.port)] + self.extra_args
+        # own process group, so that worker processes are killed together
+        self.proc = subprocess.Popen(command, cwd=ROOT, stdout=subprocess.DEVNULL,
+                                     start_new_session=True)
+        self.wait_until_ready()
+
+    def wait_until_ready(self, timeout=30.):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            try:
+                socket.create_connection(('127.0.0.1', self.port), timeout=1).close()
+                return
+            except OSError:
+                time.sleep(0.1)
+        raise RuntimeError('central server did not start')
+
+    def stop(self):
+        if self.proc is not None:
+            os.killpg(self.proc.pid, signal.SIGKILL)
+            self.proc.wait()
+            self.proc = None
+
+    def rss(self):
+        """Resident memory of the server and its worker processes in bytes (Linux only),
+            pages shared by the workers are counted once for every process.
+        """
+        total = 0
+        for name in os.listdir('/proc'):
+            if not name.isdigit():
+                continue
+            try:
+                with open('/proc/{}/stat'.format(name)) as f:
+                    # fields after the command name: state, parent pid, process group
+                    group = int(f.read().rsplit(')', 1)[1].split()[2])
+                if group != self.proc.pid:  # in the server's own process group, see start()
+                    continue
+                with open('/proc/{}/status'.format(name)) as f:
+                    for line in f:
+                        if line.startswith('VmRSS:'):
+                            total += int(line.split()[1]) * 1024
+            except (OSError, IndexError, ValueError):  # exited meanwhile
+                continue
+        return total
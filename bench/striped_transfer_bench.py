@@ -0,0 +1,174 @@
+"""Measure the throughput of sending a large file over K parallel connections
+    (like Chat.send_stripe()) through a local proxy that injects latency.
+The proxy delays every piece of data by --delay ms and lets at most --window KB
+    be in flight per connection, like a TCP window on a high-latency link,
+    so a single connection can't go faster than window / delay.
+Usage:
+    python bench/striped_transfer_bench.py --size 128 --streams 1 2 4 8 --delay 25 --window 256
+"""
+
+import os
+import sys
+import time
+import socket
+import argparse
+import tempfile
+from collections import deque
+from threading import Thread, Condition
+
+from server_process import ROOT
+
+sys.path.insert(0, ROOT)
+import utils  # noqa: E402
+from classes.transfer import split_ranges  # noqa: E402
+
+CHAT_NAME = '2017011527-2017011528'
+
+
+class DelayedPipe:
+    """Forward data from src to dst delay seconds later, with at most window bytes in flight."""
+
+    def __init__(self, src, dst, delay, window):
+        self.src = src
+        self.dst = dst
+        self.delay = delay
+        self.window = window
+        self.pieces = deque()
+        self.in_flight = 0
+        self.condition = Condition()
+        Thread(target=self.read, daemon=True).start()
+        Thread(target=self.write, daemon=True).start()
+
+    def read(self):
+        while True:
+            with self.condition:
+                while self.in_flight >= self.window:
+                    self.condition.wait()
+            data = self.src.recv(1 << 16)
+            with self.condition:
+                self.pieces.append((time.perf_counter() + self.delay, data))
+                self.in_flight += len(data)
+                self.condition.notify_all()
+            if not data:
+                return
+
+    def write(self):
+        while True:
+            with self.condition:
+                while not self.pieces:
+                    self.condition.wait()
+                deliver_time, data = self.pieces.popleft()
+            time.sleep(max(0., deliver_time - time.perf_counter()))
+            if not data:
+                self.dst.shutdown(socket.SHUT_WR)
+                return
+            self.dst.sendall(data)
+            with self.condition:
+                self.in_flight -= len(data)
+                self.condition.notify_all()
+
+
+def serve(listener, handle):
+    while True:
+        sock, _ = listener.accept()
+        Thread(target=handle, args=(sock,), daemon=True).start()
+
+
+def listen():
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(64)
+    return listener
+
+
+class Receiver:
+    """Receive ranges into a preallocated file like Chat.receive_stream()."""
+
+    def __init__(self, path):
+        self.path = path
+        self.received = 0
+        self.condition = Condition()
+        self.listener = listen()
+        Thread(target=serve, args=(self.listener, self.receive), daemon=True).start()
+
+    def receive(self, sock):
+        with sock:
+            while True:
+                decoded_message = utils.decode_message(utils.recv_msg(sock))
+                if decoded_message is None:
+                    return
+                offset, count = int(decoded_message[4]), decoded_message[5]
+                received = utils.recv_file(sock, self.path, count, offset)
+                with self.condition:
+                    self.received += received
+                    self.condition.notify_all()
+
+    def wait(self, size):
+        with self.condition:
+            while self.received < size:
+                self.condition.wait()
+
+
+def send_stripe(address, path, ranges):
+    with socket.create_connection(address) as sock:
+        for start, end in ranges:
+            utils.send_msg(sock, utils.encode_message(CHAT_NAME, 2333, 14, '2017011527',
+                                                      str(start), end - start))
+            utils.send_file(sock, path, start, end - start)
+
+
+def transfer(path, save_path, size, streams, delay, window):
+    with open(save_path, 'wb') as f:
+        f.truncate(size)
+    receiver = Receiver(save_path)
+    proxy = listen()
+
+    def forward(sock):
+        upstream = socket.create_connection(receiver.listener.getsockname())
+        DelayedPipe(sock, upstream, delay, window)
+
+    Thread(target=serve, args=(proxy, forward), daemon=True).start()
+
+    start = time.perf_counter()
+    senders = [Thread(target=send_stripe, args=(proxy.getsockname(), path, stripe))
+               for stripe in split_ranges([[0, size]], streams)]
+    [t.start() for t in senders]
+    [t.join() for t in senders]
+    receiver.wait(size)
+    seconds = time.perf_counter() - start
+    proxy.close()
+    receiver.listener.close()
+    return size / seconds / 2 ** 20
+
+
+def main(args):
+    folder = tempfile.mkdtemp()
+    path, save_path = os.path.join(folder, 'file'), os.path.join(folder, 'received')
+    size = args.size * 2 ** 20
+    try:
+        with open(path, 'wb') as f:
+            f.write(os.urandom(size))
+        for streams in args.streams:
+            throughput = transfer(path, save_path, size, streams,
+                                  args.delay / 1000, args.window * 1024)
+            with open(path, 'rb') as a, open(save_path, 'rb') as b:
+                assert a.read() == b.read()
+            print('{} streams, {} MB, delay {} ms, window {} KB: {:.1f} MB/s'.format(
+                streams, args.size, args.delay, args.window, throughput))
+    finally:
+        for name in os.listdir(folder):
+            os.remove(os.path.join(folder, name))
+        os.rmdir(folder)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--size', type=int, default=128, help='file size in MB')
+    parser.add_argument('--streams', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--delay', type=float, default=25, help='one way delay in ms')
+    parser.add_argument('--window', type=int, default=256, help='max KB in flight per stream')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    main(parse_args())
@@ -0,0 +1,152 @@
+"""Measure the latency of text messages sent while a large file is sent in the same chat:
+    chat-socket: the file body goes through the chat socket (config.FILE_BULK_CHANNEL = False)
+    bulk-channel: the file body goes over a separate data connection
+Two PrivateChats talk over loopback, a text with its send time is sent every --interval ms
+    during the transfer, each in its own thread like MainWin.send_message(),
+    and its latency is taken when the receiving chat displays it.
+Usage:
+    python bench/text_latency_bench.py --size 1024 --interval 50
+"""
+
+import os
+import sys
+import time
+import socket
+import shutil
+import argparse
+import tempfile
+from threading import Thread, Condition
+
+from server_process import ROOT
+
+sys.path.insert(0, ROOT)
+import utils  # noqa: E402
+import config  # noqa: E402
+
+# before classes.transfer takes them as default folders
+WORK_FOLDER = tempfile.mkdtemp()
+config.IMAGE_SAVE_FOLDER = os.path.join(WORK_FOLDER, 'imgs')
+config.FILE_SAVE_FOLDER = os.path.join(WORK_FOLDER, 'files')
+os.makedirs(config.IMAGE_SAVE_FOLDER)
+os.makedirs(config.FILE_SAVE_FOLDER)
+
+from classes.user import User  # noqa: E402
+from classes.chat import PrivateChat  # noqa: E402
+
+
+class Signal:
+    def emit(self, *args):
+        pass
+
+
+class LatencySignal:
+    """display_message_signal of the receiving chat, takes the latency of texts."""
+
+    def __init__(self):
+        self.latencies = []
+        self.condition = Condition()
+
+    def emit(self, display_message):
+        if display_message.message_type != 0:
+            return
+        with self.condition:
+            self.latencies.append(time.perf_counter() - float(display_message.text))
+            self.condition.notify_all()
+
+    def wait(self, count, timeout):
+        with self.condition:
+            self.condition.wait_for(lambda: len(self.latencies) >= count, timeout)
+
+
+def connected_pair():
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(1)
+    sock = socket.create_connection(listener.getsockname())
+    other_sock, _ = listener.accept()
+    listener.close()
+    return sock, other_sock
+
+
+def serve_data_connections(listener, chat):
+    """What MainWin.handle_receive_message() does with data connections."""
+    while True:
+        try:
+            sock, _ = listener.accept()
+        except OSError:
+            return
+        decoded_message = utils.decode_message(utils.recv_msg(sock))
+        if decoded_message is not None and decoded_message[2] == 14:
+            Thread(target=chat.receive_stream, args=(decoded_message, sock), daemon=True).start()
+
+
+def make_chat(me, other, sock, display_message_signal):
+    chat = PrivateChat(me, other, (display_message_signal,) + tuple(Signal() for _ in range(4)),
+                       tuple(Signal() for _ in range(3)), sock=sock)
+    chat.is_current = True
+    chat.daemon = True
+    chat.start()
+    return chat
+
+
+def transfer(path, mode, interval):
+    config.FILE_BULK_CHANNEL = mode == 'bulk-channel'
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(config.PEER_BACKLOG)
+    me = User('2017011527', ip='127.0.0.1', port=2333)
+    other = User('2017011528', ip='127.0.0.1', port=listener.getsockname()[1])
+    sock, other_sock = connected_pair()
+    latency_signal = LatencySignal()
+    chat = make_chat(me, other, sock, Signal())
+    other_chat = make_chat(other, me, other_sock, latency_signal)
+    Thread(target=serve_data_connections, args=(listener, other_chat), daemon=True).start()
+
+    result = []
+    sender = Thread(target=lambda: result.append(chat.send_message(2, path)))
+    start = time.perf_counter()
+    sender.start()
+    sent = 0
+    while sender.is_alive():
+        Thread(target=chat.send_message, args=(0, repr(time.perf_counter())), daemon=True).start()
+        sent += 1
+        time.sleep(interval)
+    seconds = time.perf_counter() - start
+    latency_signal.wait(sent, config.FILE_TRANSFER_TIMEOUT)
+    assert 'success' in result[0].text, result[0].text
+
+    chat.kill()
+    other_chat.kill()
+    listener.close()
+    return seconds, sent, sorted(latency_signal.latencies)
+
+
+def main(args):
+    path = os.path.join(WORK_FOLDER, 'file')
+    try:
+        for mode in args.modes:
+            block = os.urandom(2 ** 20)  # new content every time, or it's not sent again
+            with open(path, 'wb') as f:
+                for _ in range(args.size):
+                    f.write(block)
+            seconds, sent, latencies = transfer(path, mode, args.interval / 1000)
+            percentile = lambda p: latencies[min(int(p * len(latencies)), len(latencies) - 1)]
+            print('{:12s} {} MB in {:.2f} s, {} of {} texts received, latency '
+                  'median {:.0f} ms, p99 {:.0f} ms, max {:.0f} ms'.format(
+                      mode, args.size, seconds, len(latencies), sent,
+                      percentile(.5) * 1000, percentile(.99) * 1000, latencies[-1] * 1000))
+    finally:
+        shutil.rmtree(WORK_FOLDER, ignore_errors=True)  # the receiver may still be moving files
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--size', type=int, default=1024, help='file size in MB')
+    parser.add_argument('--interval', type=float, default=50, help='ms between two texts')
+    parser.add_argument('--modes', nargs='+', choices=['chat-socket', 'bulk-channel'],
+                        default=['chat-socket', 'bulk-channel'])
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    main(parse_args())
@@ -1,135 +1,499 @@
-"""This file contains code for interact with the central server."""
-
-import socket
-
-import config
-
-
-class CentralServerConnector:
-
-    def __init__(self, ip, port):
-        assert type(ip) is str
-        assert type(port) is int
-
-        self.central_server_ip = ip
-        self.central_server_port = port
-
-        self.central_server_sock = None
-        self.is_connect = False
-        self.is_log_in = False
-
-    def connect(self):
-        if self.is_connect:
-            return
-        self.central_server_sock = \
-            socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        try:
-            self.central_server_sock. \
-                connect((self.central_server_ip, self.central_server_port))
-        except ConnectionRefusedError:
-            return
-        self.is_connect = True
-
-    def log_in(self, user_id, password):
-        if not self.is_connect:
-            self.connect()
-        if self.is_log_in:
-            return
-        command = '{}_{}'.format(user_id, password)
-        self.central_server_sock.send(command.encode())
-        reply = self.central_server_sock.recv(config.MAX_PACKAGE_SIZE).decode()
-        if reply == 'lol':
-            self.is_log_in = True
-
-    def log_out(self, user_id):
-        if not self.is_log_in:
-            return
-        command = 'logout{}'.format(user_id)
-        self.central_server_sock.send(command.encode())
-        reply = self.central_server_sock.recv(config.MAX_PACKAGE_SIZE).decode()
-        if reply == 'loo':
-            self.is_log_in = False
-
-    def disconnect(self, user_id):
-        if not self.is_connect:
-            return
-        if self.is_log_in:
-            self.log_out(user_id)
-        self.central_server_sock.close()
-        self.central_server_sock = None
-        self.is_connect = False
-
-    def search_user(self, user_id):
-        """Search for a user using his/her id.
-        If exists, return IP. Otherwise return 'n'.
-        """
-        command = 'q{}'.format(user_id)
-        self.central_server_sock.send(command.encode())
-        reply = self.central_server_sock.recv(config.MAX_PACKAGE_SIZE).decode()
-        return reply
-
-
-class MyCentralServerConnector:
-
-    def __init__(self, ip, port):
-        assert type(ip) is str
-        assert type(port) is int
-
-        self.central_server_ip = ip
-        self.central_server_port = port
-
-        self.central_server_sock = None
-        self.is_connect = False
-        self.is_log_in = False
-
-    def connect(self):
-        if self.is_connect:
-            return
-        self.central_server_sock = \
-            socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        try:
-            self.central_server_sock. \
-                connect((self.central_server_ip, self.central_server_port))
-        except ConnectionRefusedError:
-            return
-        self.is_connect = True
-
-    def log_in(self, user_id, password, port):
-        if not self.is_connect:
-            self.connect()
-        command = '{}_{}_{}'.format(user_id, password, port)
-        self.central_server_sock.send(command.encode())
-        reply = self.central_server_sock.recv(config.MAX_PACKAGE_SIZE).decode()
-
-        if reply == 'lol':
-            self.is_log_in = True
-
-    def log_out(self, user_id):
-        if not self.is_log_in:
-            return
-        command = 'logout{}'.format(user_id)
-        self.central_server_sock.send(command.encode())
-        reply = self.central_server_sock.recv(config.MAX_PACKAGE_SIZE).decode()
-        if reply == 'loo':
-            self.is_log_in = False
-
-    def disconnect(self, user_id):
-        if not self.is_connect:
-            return
-        if self.is_log_in:
-            self.log_out(user_id)
-        self.central_server_sock.close()
-        self.central_server_sock = None
-        self.is_connect = False
-
-    def search_user(self, user_id):
-        """Search for a user using his/her id.
-        If exists, return IP and PORT. Otherwise return 'n'.
-        """
-        command = 'q{}'.format(user_id)
-        self.central_server_sock.send(command.encode())
-        reply = self.central_server_sock.recv(config.MAX_PACKAGE_SIZE).decode()
-        if reply == 'n':
-            return reply
-        idx = reply.index('_')
-        return reply[:idx], int(reply[idx + 1:])
+"""This file contains code for interact with the central server."""
+
+import time
+import socket
+from threading import Thread, Lock
+from contextlib import nullcontext
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+import utils
+import config
+
+
+class CentralServerConnector:
+
+    def __init__(self, ip, port):
+        assert type(ip) is str
+        assert type(port) is int
+
+        self.central_server_ip = ip
+        self.central_server_port = port
+
+        self.central_server_sock = None
+        self.is_connect = False
+        self.is_log_in = False
+
+    def connect(self):
+        if self.is_connect:
+            return
+        self.central_server_sock = \
+            socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            self.central_server_sock. \
+                connect((self.central_server_ip, self.central_server_port))
+        except ConnectionRefusedError:
+            return
+        self.is_connect = True
+
+    def log_in(self, user_id, password):
+        if not self.is_connect:
+            self.connect()
+        if self.is_log_in:
+            return
+        command = '{}_{}'.format(user_id, password)
+        self.central_server_sock.send(command.encode())
+        reply = self.central_server_sock.recv(config.MAX_PACKAGE_SIZE).decode()
+        if reply == 'lol':
+            self.is_log_in = True
+
+    def log_out(self, user_id):
+        if not self.is_log_in:
+            return
+        command = 'logout{}'.format(user_id)
+        self.central_server_sock.send(command.encode())
+        reply = self.central_server_sock.recv(config.MAX_PACKAGE_SIZE).decode()
+        if reply == 'loo':
+            self.is_log_in = False
+
+    def disconnect(self, user_id):
+        if not self.is_connect:
+            return
+        if self.is_log_in:
+            self.log_out(user_id)
+        self.central_server_sock.close()
+        self.central_server_sock = None
+        self.is_connect = False
+
+    def search_user(self, user_id):
+        """Search for a user using his/her id.
+        If exists, return IP. Otherwise return 'n'.
+        """
+        command = 'q{}'.format(user_id)
+        self.central_server_sock.send(command.encode())
+        reply = self.central_server_sock.recv(config.MAX_PACKAGE_SIZE).decode()
+        return reply
+
+    def search_users(self, user_ids):
+        """Search for many users, returns a dict of user_id: search_user() result.
+        The course central server has no multi-query command,
+            so it still costs one round trip per user.
+        """
+        return {user_id: self.search_user(user_id) for user_id in user_ids}
+
+
+class MyCentralServerConnector:
+    """Connector for my central server.
+    If pipelined, commands are length-prefixed and tagged with request ids,
+        a reader thread matches the replies to requests in any order,
+        so many lookups can be in flight on one connection via request().
+    """
+
+    def __init__(self, ip, port, pipelined=False):
+        assert type(ip) is str
+        assert type(port) is int
+
+        self.central_server_ip = ip
+        self.central_server_port = port
+
+        self.central_server_sock = None
+        self.is_connect = False
+        self.is_log_in = False
+
+        # about pipelined mode
+        self.pipelined = pipelined
+        self.pending = {}  # request id: (future, parser) waiting for reply, None if connection lost
+        self.last_request_id = 0
+        self.pending_lock = Lock()
+        self.send_lock = Lock()  # keeps the frames of concurrent requests whole
+
+    def connect(self):
+        if self.is_connect:
+            return
+        self.central_server_sock = \
+            socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            self.central_server_sock. \
+                connect((self.central_server_ip, self.central_server_port))
+        except ConnectionRefusedError:
+            return
+        self.is_connect = True
+        if self.pipelined:
+            self.pending = {}
+            t = Thread(target=self.receive_replies,
+                       args=(self.central_server_sock, self.pending), daemon=True)
+            t.start()
+
+    def reconnect(self):
+        """Drop the connection, e.g. lost when the central server restarts, and connect again.
+        The caller logs in again, the server may have forgotten me.
+        """
+        if self.central_server_sock is not None:
+            self.central_server_sock.close()  # its reader thread fails what's still waiting
+        self.central_server_sock = None
+        self.is_connect = False
+        self.is_log_in = False
+        self.connect()
+
+    def log_in(self, user_id, password, port):
+        if not self.is_connect:
+            self.connect()
+        reply = self.execute('{}_{}_{}'.format(user_id, password, port))
+
+        if reply == 'lol':
+            self.is_log_in = True
+
+    def log_out(self, user_id):
+        if not self.is_log_in:
+            return
+        reply = self.execute('logout{}'.format(user_id))
+        if reply == 'loo':
+            self.is_log_in = False
+
+    def disconnect(self, user_id):
+        if not self.is_connect:
+            return
+        if self.is_log_in:
+            self.log_out(user_id)
+        self.central_server_sock.close()
+        self.central_server_sock = None
+        self.is_connect = False
+
+    def search_user(self, user_id):
+        """Search for a user using his/her id.
+        If exists, return IP and PORT. Otherwise return 'n'.
+        """
+        return self.execute('q{}'.format(user_id), self.parse_address)
+
+    def search_users(self, user_ids):
+        """Search for many users in one round trip.
+        Returns a dict of user_id: search_user() result.
+        """
+        if not user_ids:
+            return {}
+        command = 'm{}'.format(','.join(user_ids))
+        if self.pipelined:
+            try:
+                reply = self.execute(command)
+            except ConnectionError:
+                reply = None
+        else:
+            utils.send_msg(self.central_server_sock, command.encode())
+            reply = utils.recv_msg(self.central_server_sock)
+            reply = reply if reply is None else bytes(reply).decode()
+        if reply is None:  # lost connection, treat everyone as offline
+            return {user_id: 'n' for user_id in user_ids}
+        replies = reply.split(',')
+        return {user_id: self.parse_address(reply) for user_id, reply in zip(user_ids, replies)}
+
+    def execute(self, command, parser=str):
+        """Send a command and wait for its reply."""
+        if self.pipelined:
+            try:
+                return self.request(command, parser).result(config.CENTRAL_SERVER_TIMEOUT)
+            except FutureTimeoutError:
+                raise ConnectionError('Central server not responding!')
+        self.central_server_sock.send(command.encode())
+        return parser(self.central_server_sock.recv(config.MAX_PACKAGE_SIZE).decode())
+
+    def request(self, command, parser=str):
+        """Send a tagged command without waiting (pipelined mode only).
+        Returns a Future of the reply, converted by parser.
+        """
+        assert self.pipelined
+        future = Future()
+        with self.pending_lock:
+            if self.pending is None:
+                raise ConnectionError('Lost connection to central server!')
+            self.last_request_id += 1
+            request_id = self.last_request_id
+            self.pending[request_id] = (future, parser)
+        # not under pending_lock, the reader thread needs it to take replies while I wait to send
+        try:
+            with self.send_lock:
+                utils.send_msg(self.central_server_sock,
+                               '#{}_{}'.format(request_id, command).encode())
+        except OSError as e:
+            with self.pending_lock:
+                sent = self.pending.pop(request_id, None) if self.pending is not None else None
+            if sent is not None:  # else already failed by the reader thread
+                future.set_exception(e)
+        return future
+
+    def heartbeat(self, user_id):
+        """Renew my lease, returns False if the server has logged me out."""
+        return self.execute('h{}'.format(user_id)) == 'hb'
+
+    def search_user_async(self, user_id):
+        """Like search_user() but returns a Future (pipelined mode only)."""
+        return self.request('q{}'.format(user_id), self.parse_address)
+
+    def receive_replies(self, sock, pending):
+        """Keep reading tagged replies and resolve the matching requests.
+        pending is self.pending of sock, a later connection has its own.
+        """
+        while True:
+            try:
+                message = utils.recv_msg(sock)
+            except OSError:
+                break
+            if message is None:
+                break
+            message = bytes(message).decode()
+            if not message.startswith('#'):  # not a reply, e.g. presence push
+                continue
+            idx = message.index('_')
+            with self.pending_lock:
+                future, parser = pending.pop(int(message[1:idx]), (None, None))
+            if future is None:
+                continue
+            try:
+                future.set_result(parser(message[idx + 1:]))
+            except ValueError as e:
+                future.set_exception(e)
+
+        # fail all the requests still waiting, and let connect() work again
+        with self.pending_lock:
+            if self.pending is pending:
+                self.pending = None
+                self.is_connect = False
+            waiting = list(pending.values())
+            pending.clear()
+        for future, _ in waiting:
+            future.set_exception(ConnectionError('Lost connection to central server!'))
+
+    @staticmethod
+    def parse_address(reply):
+        """Parse 'ip_port' to (IP, PORT). Returns 'n' if the user is offline."""
+        if reply == 'n':
+            return reply
+        idx = reply.index('_')
+        return reply[:idx], int(reply[idx + 1:])
+
+
+class CachedConnector:
+    """Wrap CentralServerConnector or MyCentralServerConnector to share it among threads.
+    Lookup results (including offline 'n') are cached for a while in a LRU map,
+        and concurrent lookups of the same user share one request.
+    Member Variables:
+        connector: the wrapped connector, its other attributes are available here too
+        cache: OrderedDict of user_id: (expire_time, result), least recently used first
+        in_flight: user_id: Future of the lookup being sent
+        hits/misses/coalesced: count of lookups answered by cache,
+            sent to the central server, or waiting for the same lookup
+    """
+
+    def __init__(self, connector, ttl=config.LOOKUP_CACHE_TTL,
+                 negative_ttl=config.LOOKUP_CACHE_NEGATIVE_TTL, max_size=config.LOOKUP_CACHE_SIZE):
+        self.connector = connector
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_size = max_size
+
+        self.cache = OrderedDict()
+        self.in_flight = {}
+        self.cache_lock = Lock()
+        # a pipelined connector is already thread-safe, others use one socket in lockstep
+        self.io_lock = nullcontext() if getattr(connector, 'pipelined', False) else Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def __getattr__(self, name):
+        """Forward other attributes like is_connect, is_log_in to the wrapped connector."""
+        return getattr(self.connector, name)
+
+    def connect(self):
+        with self.io_lock:
+            self.connector.connect()
+
+    def reconnect(self):
+        """See MyCentralServerConnector.reconnect(), cached results may be stale by then."""
+        with self.io_lock:
+            self.connector.reconnect()
+        self.clear_cache()
+
+    def log_in(self, *args):
+        with self.io_lock:
+            self.connector.log_in(*args)
+
+    def log_out(self, user_id):
+        with self.io_lock:
+            self.connector.log_out(user_id)
+
+    def disconnect(self, user_id):
+        with self.io_lock:
+            self.connector.disconnect(user_id)
+        self.clear_cache()
+
+    def heartbeat(self, user_id):
+        with self.io_lock:
+            return self.connector.heartbeat(user_id)
+
+    def search_user(self, user_id):
+        """Same as the wrapped search_user(), but maybe answered by cache."""
+        return self.search_users([user_id])[user_id]
+
+    def search_users(self, user_ids):
+        """Same as the wrapped search_users(), only uncached users are sent in one request."""
+        results = {}
+        waiting = {}  # user_id: Future of other threads' lookups
+        to_search = []
+        with self.cache_lock:
+            for user_id in user_ids:
+                result = self.get_cached(user_id)
+                if result is not None:
+                    self.hits += 1
+                    results[user_id] = result
+                elif user_id in self.in_flight:
+                    self.coalesced += 1
+                    waiting[user_id] = self.in_flight[user_id]
+                elif user_id not in to_search:
+                    self.misses += 1
+                    self.in_flight[user_id] = Future()
+                    to_search.append(user_id)
+
+        if to_search:
+            try:
+                with self.io_lock:
+                    if len(to_search) == 1:
+                        searched = {to_search[0]: self.connector.search_user(to_search[0])}
+                    else:
+                        searched = self.connector.search_users(to_search)
+            except Exception as e:
+                self.finish_search(to_search, error=e)
+                raise
+            self.finish_search(to_search, results=searched)
+            results.update(searched)
+
+        for user_id, future in waiting.items():
+            results[user_id] = future.result()
+        return results
+
+    def finish_search(self, user_ids, results=None, error=None):
+        """Cache the results and wake up threads waiting for the same users."""
+        with self.cache_lock:
+            futures = [self.in_flight.pop(user_id) for user_id in user_ids]
+            if results is not None:
+                for user_id in user_ids:
+                    self.put_cached(user_id, results[user_id])
+        for user_id, future in zip(user_ids, futures):
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(results[user_id])
+
+    def update_cache(self, user_id, result):
+        """Put a result known from elsewhere (e.g. presence push) into cache."""
+        with self.cache_lock:
+            self.put_cached(user_id, result)
+
+    def clear_cache(self):
+        with self.cache_lock:
+            self.cache.clear()
+
+    def get_cached(self, user_id):
+        """Returns the cached result or None, call with self.cache_lock held."""
+        item = self.cache.get(user_id)
+        if item is None:
+            return None
+        expire_time, result = item
+        if expire_time < time.monotonic():
+            del self.cache[user_id]
+            return None
+        self.cache.move_to_end(user_id)
+        return result
+
+    def put_cached(self, user_id, result):
+        """Call with self.cache_lock held."""
+        ttl = self.negative_ttl if result == 'n' else self.ttl
+        self.cache[user_id] = (time.monotonic() + ttl, result)
+        self.cache.move_to_end(user_id)
+        while len(self.cache) > self.max_size:
+            self.cache.popitem(last=False)
+
+    def stats(self):
+        with self.cache_lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'coalesced': self.coalesced, 'size': len(self.cache)}
+
+
+class PresenceSubscriber(Thread):
+    """Keep a connection to my central server to receive presence changes of watched users,
+        so we don't need to poll search_user() for them.
+    Member Variables:
+        callback: called as callback(user_id, result) in this thread,
+            result is (IP, PORT) like search_user() or 'n' for offline.
+        lost_callback: called in this thread if the connection is lost, not by disconnect(),
+            pushes stop and the caller has to subscribe again or poll.
+    """
+
+    def __init__(self, ip, port, callback, lost_callback=None):
+        super(PresenceSubscriber, self).__init__()
+
+        self.setDaemon(True)
+        self.central_server_ip = ip
+        self.central_server_port = port
+        self.callback = callback
+        self.lost_callback = lost_callback
+
+        self.central_server_sock = None
+        self.is_connect = False
+        self.send_lock = Lock()  # watch() and unwatch() maybe called from many threads
+
+    def connect(self):
+        if self.is_connect:
+            return
+        self.central_server_sock = \
+            socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            self.central_server_sock. \
+                connect((self.central_server_ip, self.central_server_port))
+        except ConnectionRefusedError:
+            return
+        self.is_connect = True
+
+    def disconnect(self):
+        if not self.is_connect:
+            return
+        self.is_connect = False
+        try:
+            self.central_server_sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.central_server_sock.close()
+
+    def watch(self, user_ids):
+        """Subscribe to users, their current states will be pushed at once."""
+        self.send_command('w', user_ids)
+
+    def unwatch(self, user_ids):
+        self.send_command('u', user_ids)
+
+    def send_command(self, command_type, user_ids):
+        if not self.is_connect or not user_ids:
+            return
+        command = '{}{}'.format(command_type, ','.join(user_ids))
+        with self.send_lock:
+            utils.send_msg(self.central_server_sock, command.encode())
+
+    def run(self):
+        """Receive pushed presence changes, other replies are just acknowledgements."""
+        while self.is_connect:
+            try:
+                message = utils.recv_msg(self.central_server_sock)
+            except OSError:
+                break
+            if message is None:
+                break
+            message = bytes(message).decode()
+            if not message.startswith('p'):
+                continue
+            for change in message[1:].split(','):
+                idx = change.index('_')
+                self.callback(change[:idx], MyCentralServerConnector.parse_address(change[idx + 1:]))
+        if self.is_connect:  # lost, e.g. the central server restarted
+            self.is_connect = False
+            if self.lost_callback is not None:
+                self.lost_callback()
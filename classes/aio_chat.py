@@ -0,0 +1,194 @@
+"""This file contains the asyncio chat engine, one event loop for the sockets of all chats."""
+
+import struct
+import asyncio
+import threading
+import traceback
+from threading import Thread, Lock
+
+import utils
+import config
+from .chat import PrivateChat, GroupChat
+
+# types whose handling reads a body from the sock or touches the disk,
+# handled in a thread of the loop's executor while the sock waits
+BLOCKING_TYPES = {1, 2, 11, 13}
+
+
+class ChatLoop(Thread):
+    """Runs one asyncio event loop, which reads and writes the chat sockets of
+        all AsyncPrivateChat and AsyncGroupChat, however many there are.
+    Member Variables:
+        loop: the event loop, started at the first submit()
+    """
+
+    def __init__(self):
+        super(ChatLoop, self).__init__()
+        self.daemon = True
+
+        self.loop = asyncio.new_event_loop()
+        self.lock = Lock()
+
+    def run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coroutine):
+        """Run coroutine in the loop, from any thread, returns a concurrent.futures.Future."""
+        with self.lock:
+            if not self.is_alive():
+                self.start()
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    def is_current(self):
+        """Whether it's called from the loop itself, which must not wait for a Future."""
+        return threading.get_ident() == self.ident
+
+
+# shared by all async chats
+chat_loop = ChatLoop()
+
+
+class AsyncChat:
+    """Mixin putting a chat on chat_loop instead of the reactor and worker pool,
+        for dense bot and test deployments with thousands of chats.
+    The public methods are the same as those of PrivateChat and GroupChat and can be called
+        from any thread, messages on a sock are written by the loop one at a time in the order
+        they are sent. Signals are emitted from the loop thread, PyQt queues them
+        to the UI thread as it does for the reactor and workers.
+    Images and files always go over data connections (config.FILE_BULK_CHANNEL),
+        their content can't be written to a chat socket owned by the loop.
+    Member Variables:
+        write_locks: {sock: asyncio.Lock} keeping messages on sock whole and in order
+        broken: socks a write timed out on, maybe in the middle of a message,
+            nothing more is written to them
+        writing: tasks of writes started from the loop, kept until they are done
+        serving: Futures of serve() for every watched sock, cancelled by kill()
+    """
+
+    def init_async(self):
+        self.write_locks = {}
+        self.broken = set()
+        self.writing = set()
+        self.serving = []
+
+    def watch(self, sock, *args):
+        """Read and handle the messages of sock in the loop.
+        args are passed to self.handle_receive_message() after the message.
+        """
+        self.serving.append(chat_loop.submit(self.serve(sock, *args)))
+
+    async def serve(self, sock, *args):
+        while self.is_alive:
+            try:
+                message = await self.read(sock)
+            except OSError:
+                message = None
+            if message is None:  # closed by the other user
+                return
+            decoded_message = utils.decode_message(message)
+            try:
+                if decoded_message is not None and decoded_message[2] in BLOCKING_TYPES:
+                    await chat_loop.loop.run_in_executor(
+                        None, self.handle_receive_message, message, *args)
+                else:
+                    self.handle_receive_message(message, *args)
+            except Exception:  # keep serving the sock, as the workers do
+                traceback.print_exc()
+
+    @staticmethod
+    async def read(sock):
+        """utils.recv_msg() in the loop, reads exactly one message and nothing after it,
+            which may be the body of an image or file read by the executor.
+        """
+        header = await AsyncChat.read_exactly(sock, 4)
+        if header is None:
+            return None
+        return await AsyncChat.read_exactly(sock, struct.unpack('>I', header)[0])
+
+    @staticmethod
+    async def read_exactly(sock, n):
+        data = bytearray()
+        while len(data) < n:
+            packet = await chat_loop.loop.sock_recv(sock, n - len(data))
+            if not packet:
+                return None
+            data.extend(packet)
+        return data
+
+    def send_frame(self, sock, message_type, message, length=0):
+        """Send a message on a chat socket from the loop, instead of its Outbox.
+        From another thread it waits until the message is sent, from the loop it returns
+            at once, the message is sent after those sent before it (asyncio.Lock is fair).
+        Gives up after config.FILE_TRANSFER_TIMEOUT if the other user doesn't read,
+            as the threads engine does.
+        """
+        message = utils.encode_message(self.name, self.me_user.port, message_type,
+                                       self.me_user.user_id, message, length)
+        coroutine = self.write(sock, message)
+        if chat_loop.is_current():
+            task = chat_loop.loop.create_task(coroutine)
+            self.writing.add(task)  # the loop only keeps a weak reference
+            task.add_done_callback(self.writing.discard)
+        else:
+            chat_loop.submit(coroutine).result()
+
+    async def write(self, sock, message):
+        async with self.write_locks.setdefault(sock, asyncio.Lock()):
+            if sock in self.broken:
+                return
+            try:
+                await asyncio.wait_for(chat_loop.loop.sock_sendall(sock, utils.pack_msg(message)),
+                                       config.FILE_TRANSFER_TIMEOUT)
+            except asyncio.TimeoutError:
+                self.broken.add(sock)
+            except OSError:  # closed, serve() finds out
+                pass
+
+    async def send_message_async(self, message_type, new_message):
+        """send_message() for coroutines in the loop, e.g. bots,
+            send_message() itself sends an image or file in the calling thread.
+        """
+        if message_type == 0:  # only schedules the writes
+            return self.send_message(message_type, new_message)
+        return await chat_loop.loop.run_in_executor(
+            None, self.send_message, message_type, new_message)
+
+    def send_missing(self, transfer, message, missing, sock, source):
+        return self.send_stripes(transfer, message, missing, source)
+
+    def kill(self, flush_timeout=config.SEND_FLUSH_TIMEOUT):
+        """Stop serving all socks."""
+        super(AsyncChat, self).kill(flush_timeout)
+        [future.cancel() for future in self.serving]
+
+
+class AsyncPrivateChat(AsyncChat, PrivateChat):
+    """PrivateChat on chat_loop, see AsyncChat."""
+
+    def __init__(self, me_user, other_user,
+                 normal_chat_signals, video_chat_signals, sock=None):
+        self.init_async()
+        super(AsyncPrivateChat, self).__init__(me_user, other_user,
+                                               normal_chat_signals, video_chat_signals, sock)
+
+    def run(self):
+        self.watch(self.sock)
+
+
+class AsyncGroupChat(AsyncChat, GroupChat):
+    """GroupChat on chat_loop, see AsyncChat."""
+
+    def __init__(self, me_user, other_user, normal_chat_signals,
+                 group_leader_id=None, sock=None):
+        self.init_async()
+        super(AsyncGroupChat, self).__init__(me_user, other_user, normal_chat_signals,
+                                             group_leader_id, sock)
+
+    def run(self):
+        """Wait until every member is connected, then serve their socks."""
+        self.all_connected.wait()
+        if not self.is_alive:
+            return
+        for key, sock in self.socks.items():
+            self.watch(sock, key)
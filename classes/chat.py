@@ -1,641 +1,984 @@
-"""This file contains classes for chats, including private, group, video chats."""
-
-import os
-import time
-import socket
-from numpy import array
-from threading import Thread
-from .camera import VideoServer, VideoClient
-from .microphone import AudioServer, AudioClient
-
-import utils
-import config
-from .message import TextMessage, ImageMessage, FileMessage, DisplayMessage
-
-
-class Chat(Thread):
-    """Basic class for private and group chat.
-    Member Variables:
-        me_user: me
-        other_user: another user (maybe be one person or many persons)
-        message_history: a list of past received or sent messages
-    """
-
-    def __init__(self, me_user, other_user, signals):
-        super(Chat, self).__init__()
-
-        self.me_user = me_user
-        self.other_user = other_user
-        self.name = None
-        self.is_current = False
-        self.is_alive = True
-
-        self.message_history = []
-
-        self.display_message_signal = signals[0]
-        self.new_message_signal = signals[1]
-        self.friend_delete_chat_signal = signals[2]
-        self.friend_log_out_signal = signals[3]
-
-    def __eq__(self, other):
-        pass
-
-    def __hash__(self):
-        return hash(id(self))
-
-    def run(self):
-        """Iteratively check self.sock(s) for new message."""
-        pass
-
-    def send_message(self, message_type, new_message):
-        """Send message to self.other_user"""
-        pass
-
-    def send_text_message(self, text_message, sock):
-        """Send text message via client_sock."""
-        utils.send_msg(sock,
-                       utils.encode_message(self.name, self.me_user.port,
-                                            0, self.me_user.user_id, text_message.text, 0))
-        return DisplayMessage(text_message.sender_icon, text_message.sender_id,
-                              text_message.t, 0, text_message.text)
-
-    def send_image_message(self, image_message, sock):
-        """Send image message via client_sock.
-        Split the image into different packages,
-            first send 'type_id_filename', then send packages.
-        """
-        # send notification message
-        utils.send_msg(sock,
-                       utils.encode_message(self.name, self.me_user.port,
-                                            1, self.me_user.user_id, image_message.path,
-                                            image_message.size))
-        # start send image packages
-        image = open(image_message.path, 'rb')
-        while True:
-            package = image.read(config.MAX_PACKAGE_SIZE)
-
-            time.sleep(0.001)
-
-            if not package:  # image send over
-                break
-            while True:
-                try:
-                    sock.send(package)
-                    break
-                except BlockingIOError:
-                    time.sleep(0.001)
-        image.close()
-        return DisplayMessage(image_message.sender_icon, image_message.sender_id,
-                              image_message.t, 1,
-                              'Image {} send success!'.format(image_message.path),
-                              img_path=image_message.path)
-
-    def send_file_message(self, file_message, sock):
-        """Send file message via client_sock.
-        Split the file into different packages,
-            first send 'type_id_filename', then send packages.
-        """
-        # send notification message
-        utils.send_msg(sock,
-                       utils.encode_message(self.name, self.me_user.port,
-                                            2, self.me_user.user_id, file_message.path,
-                                            file_message.size))
-        # start send file packages
-        file = open(file_message.path, 'rb')
-        while True:
-            package = file.read(config.MAX_PACKAGE_SIZE)
-            if not package:  # file send over
-                break
-            while True:
-                try:
-                    sock.send(package)
-                    break
-                except BlockingIOError:
-                    time.sleep(0.001)
-        file.close()
-        return DisplayMessage(file_message.sender_icon, file_message.sender_id,
-                              file_message.t, 2,
-                              'File {} send success!'.format(file_message.path))
-
-    def receive_message(self, decoded_message, sock, sender):
-        """Receive message from someone."""
-        _, _, message_type, _, receive_text, file_size = decoded_message
-        receive_time = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
-        if message_type == 0:  # text
-            receive_message = \
-                TextMessage(sender.icon, sender.user_id, self.me_user.user_id,
-                            receive_time, receive_text)
-            display_message = self.receive_text_message(receive_message)
-        elif message_type == 1:  # image
-            receive_message = \
-                ImageMessage(sender.icon, sender.user_id, self.me_user.user_id,
-                             receive_time, receive_text, file_size)
-            display_message = self.receive_image_message(receive_message, sock)
-        elif message_type == 2:  # file
-            receive_message = \
-                FileMessage(sender.icon, sender.user_id, self.me_user.user_id,
-                            receive_time, receive_text, file_size)
-            display_message = self.receive_file_message(receive_message, sock)
-
-        self.update_history_message(display_message)
-
-        return display_message
-
-    def receive_text_message(self, text_message):
-        """Process received text message.
-        Currently only display it.
-        """
-        return DisplayMessage(text_message.sender_icon, text_message.sender_id,
-                              text_message.t, 0, text_message.text)
-
-    def receive_image_message(self, image_message, sock):
-        """Process received image message.
-        Currently only store it in ./receive/imgs/file_name,
-            may also display it on screen in the future.
-        """
-        # write image into file
-        filename = utils.get_filename_from_path(image_message.path)
-        save_path = os.path.join(config.IMAGE_SAVE_FOLDER, filename)
-
-        # write to file
-        self.write_to_file(save_path, image_message, sock)
-
-        # display
-        return DisplayMessage(image_message.sender_icon, image_message.sender_id,
-                              image_message.t, 1, 'Receive image, saved to {}'.format(save_path),
-                              img_path=save_path)
-
-    def receive_file_message(self, file_message, sock):
-        """Process received file message.
-        Currently only store it in ./receive/files/file_name.
-        """
-        # write into file
-        filename = utils.get_filename_from_path(file_message.path)
-        save_path = os.path.join(config.FILE_SAVE_FOLDER, filename)
-
-        # write to file
-        self.write_to_file(save_path, file_message, sock)
-
-        # display
-        return DisplayMessage(file_message.sender_icon, file_message.sender_id,
-                              file_message.t, 2, 'Receive file, saved to {}'.format(save_path))
-
-    @staticmethod
-    def write_to_file(save_path, info_message, sock):
-        file = open(save_path, 'wb')
-        received_size = 0  # count the exact size to receive
-        while True:
-            next_size = config.MAX_PACKAGE_SIZE if \
-                received_size + config.MAX_PACKAGE_SIZE <= info_message.size else \
-                info_message.size - received_size
-            while True:
-                try:
-                    package = sock.recv(next_size)
-                    break
-                except BlockingIOError:
-                    pass
-            file.write(package)
-            received_size += next_size
-            if received_size >= info_message.size:
-                break
-        file.close()
-
-    def check_chat_end(self, message_type):
-        """If a user within the chat deletes the chat or logs out."""
-        if message_type == 7:
-            self.friend_delete_chat_signal.emit(self.name)
-            return True
-        elif message_type == 8:
-            self.friend_log_out_signal.emit(self.name)
-            return True
-        return False
-
-    def update_history_message(self, new_message):
-        self.message_history.append(new_message)
-
-    def select_state_change(self):
-        """Change self.is_current to reverse."""
-        self.is_current = not self.is_current
-
-    def kill(self):
-        """Kill the thread."""
-        self.is_alive = False
-
-
-class PrivateChat(Chat):
-    """Class for a chat between two users.
-    Input:
-        sock: if None, meaning I'm starter and should send request to other user.
-            else I should send response to other user.
-
-    Member Variables:
-        name: chat name, which is unique among all chats.
-        sock: keep checking it and sending message via it.
-    """
-
-    def __init__(self, me_user, other_user,
-                 normal_chat_signals, video_chat_signals, sock=None):
-        super(PrivateChat, self).__init__(me_user, other_user, normal_chat_signals)
-
-        # signals for video chat
-        self.video_request_signal = video_chat_signals[0]
-        self.video_agree_signal = video_chat_signals[1]
-        self.video_reject_signal = video_chat_signals[2]
-
-        # generate name for the private chat
-        # in the order of sort()
-        all_id = [me_user.user_id, other_user.user_id]
-        self.name = utils.get_chat_name_from_id(all_id)  # len == 21
-
-        # setup socket
-        if sock is None:  # I start the chat, should send a request
-            self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.sock.connect((self.other_user.ip, self.other_user.port))
-        else:
-            self.sock = sock
-        self.sock.setblocking(False)
-
-        # if I start this chat, then I should send private chat request
-        if sock is None:
-            utils.send_msg(self.sock,
-                           utils.encode_message(self.name, self.me_user.port,
-                                                3, self.me_user.user_id, '', 0))
-        # can only send one thing at one time
-        self.is_sending = False
-
-        # when receiving images or files, not check self.sock
-        self.is_receiving = False
-
-    def __del__(self):
-        self.sock.close()
-
-    def __eq__(self, other):
-        return isinstance(other, PrivateChat) and self.name == other.name
-
-    def __hash__(self):
-        return hash(id(self))
-
-    def run(self):
-        """Check self.sock."""
-        while self.is_alive:
-            # if is receiving image or file, not check
-            while self.is_receiving:
-                time.sleep(0.1)
-            try:
-                message = utils.recv_msg(self.sock)
-            except BlockingIOError:
-                time.sleep(0.1)
-                continue
-            self.is_receiving = True
-            t = Thread(target=self.handle_receive_message,
-                       args=(message,), daemon=True)
-            t.start()
-
-    def handle_receive_message(self, message):
-        """Handle received message, which maybe text, image or file."""
-        decoded_message = utils.decode_message(message)
-        if decoded_message is None:
-            self.is_receiving = False
-            return
-
-        chat_name = decoded_message[0]
-        message_type = decoded_message[2]
-
-        # make sure it's for this chat
-        if chat_name != self.name:
-            self.is_receiving = False
-            return
-
-        # maybe that friend deletes you or logs out
-        chat_end = self.check_chat_end(message_type)
-        if chat_end:
-            self.is_receiving = False
-            return
-
-        # maybe that friend wants to start a video chat with you
-        video_chat = self.check_video_chat(message_type, decoded_message[4])
-        if video_chat:
-            self.is_receiving = False
-            return
-
-        display_message = self.receive_message(decoded_message, self.sock, self.other_user)
-
-        self.is_receiving = False
-
-        # optionally display
-        if self.is_current:
-            self.display_message_signal.emit(display_message)
-        else:  # mark with '(new message)'
-            self.new_message_signal.emit(self.name)
-
-    def send_message(self, message_type, new_message):
-        """Only need to send to one person."""
-        while self.is_sending:  # send one thing at one time
-            time.sleep(0.1)
-
-        self.is_sending = True
-
-        send_time = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
-
-        # different types of message
-        if message_type == 0:  # text
-            new_text_message = \
-                TextMessage(self.me_user.icon, self.me_user.user_id,
-                            self.other_user.user_id, send_time, new_message)
-            display_message = self.send_text_message(new_text_message, self.sock)
-        elif message_type == 1:  # image
-            new_image_message = \
-                ImageMessage(self.me_user.icon, self.me_user.user_id,
-                             self.other_user.user_id, send_time, new_message,
-                             os.stat(new_message).st_size)
-            display_message = self.send_image_message(new_image_message, self.sock)
-        elif message_type == 2:  # file
-            new_file_message = \
-                FileMessage(self.me_user.icon, self.me_user.user_id,
-                            self.other_user.user_id, send_time, new_message,
-                            os.stat(new_message).st_size)
-            display_message = self.send_file_message(new_file_message, self.sock)
-
-        self.is_sending = False
-
-        self.update_history_message(display_message)
-
-        return display_message
-
-    def send_video_chat_request(self):
-        """Send a message to inform video chat request."""
-        utils.send_msg(self.sock,
-                       utils.encode_message(self.name, self.me_user.port,
-                                            9, self.me_user.user_id, '', 0))
-
-    def send_video_chat_agree(self):
-        """Send a message to inform video chat request."""
-        utils.send_msg(self.sock,
-                       utils.encode_message(self.name, self.me_user.port,
-                                            10, self.me_user.user_id, 'y', 0))
-
-    def send_video_chat_reject(self):
-        """Send a message to inform video chat request."""
-        utils.send_msg(self.sock,
-                       utils.encode_message(self.name, self.me_user.port,
-                                            10, self.me_user.user_id, 'n', 0))
-
-    def send_delete_message(self):
-        """Delete other user as your friend, send a message to inform."""
-        utils.send_msg(self.sock,
-                       utils.encode_message(self.name, self.me_user.port,
-                                            7, self.me_user.user_id, '', 0))
-
-    def send_log_out_message(self):
-        """Delete other user as your friend, send a message to inform."""
-        utils.send_msg(self.sock,
-                       utils.encode_message(self.name, self.me_user.port,
-                                            8, self.me_user.user_id, '', 0))
-
-    def check_video_chat(self, message_type, message_content):
-        """Check whether the received message is about video chat."""
-        if message_type == 9:
-            self.video_request_signal.emit(self.name)
-            return True
-        elif message_type == 10:
-            if message_content == 'y':
-                self.video_agree_signal.emit(self.name)
-            elif message_content == 'n':
-                self.video_reject_signal.emit(self.name)
-            return True
-        return False
-
-
-class GroupChat(Chat):
-    """Class for a group of users.
-    Input:
-        sock: the sock connected to me from group_leader_id user.
-            If None, meaning I'm the starter and should send request to all others.
-            Else I should send response to users whose user_id is
-                larger (list.sort()) than me (except group_leader).
-
-    Member Variables:
-        name: the unique identity of a group chat (also unique among all chats).
-            In the form of 'id1-id2-id3...', in the order of np.sort!
-        socks: a dict of sockets. Keep checking them and sending message via them.
-            Every time sending a message, just iterate over all of them.
-    """
-
-    def __init__(self, me_user, other_user, normal_chat_signals,
-                 group_leader_id=None, sock=None):
-        super(GroupChat, self).__init__(me_user, other_user, normal_chat_signals)
-
-        # generate the name for the group chat
-        # in the order of sort()
-        all_id = list(self.other_user.keys()) + [self.me_user.user_id]
-        self.name = utils.get_chat_name_from_id(all_id)  # len >= 33
-
-        # setup sockets for every user
-        self.socks = {user_id: None for user_id in self.other_user.keys()}
-
-        # set up sock for leader
-        if group_leader_id is not None:
-            sock.setblocking(False)
-            self.socks[group_leader_id] = sock
-
-        # flags
-        self.group_leader_id = group_leader_id
-        self.is_sending = False
-        self.is_receiving = {user_id: False for user_id in self.other_user.keys()}
-
-    def __del__(self):
-        [sock.close() for sock in self.socks.values()]
-
-    def __eq__(self, other):
-        return isinstance(other, GroupChat) and self.name == other.name
-
-    def __hash__(self):
-        return hash(id(self))
-
-    def run(self):
-        """Check every sock in self.server_socks."""
-        while array([sock is None for sock in self.socks.values()]).any():  # someone haven't confirm
-            time.sleep(0.1)
-        while self.is_alive:
-            for key, sock in self.socks.items():
-
-                if self.is_receiving[key]:
-                    continue
-
-                try:
-                    message = utils.recv_msg(sock)
-                except BlockingIOError:
-                    continue
-
-                self.is_receiving[key] = True
-
-                t = Thread(target=self.handle_receive_message,
-                           args=(message, key), daemon=True)
-                t.start()
-
-    def init_socks(self):
-        """Connect sockets with users whose id is less than me."""
-        if self.group_leader_id is None:  # I start the chat, should send request to other users
-            for user in self.other_user.values():
-                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                sock.connect((user.ip, user.port))
-                self.socks[user.user_id] = sock
-                sock.setblocking(False)
-                utils.send_msg(sock,
-                               utils.encode_message(self.name, self.me_user.port,
-                                                    4, self.me_user.user_id, '', 0))
-        else:  # should send response to those whose user_id is larger than me
-            time.sleep(1)  # wait for everyone to first create a GroupChat and update
-            for user in self.other_user.values():
-                if self.me_user.user_id > user.user_id or user.user_id == self.group_leader_id:
-                    continue
-                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                sock.connect((user.ip, user.port))
-                self.socks[user.user_id] = sock
-                sock.setblocking(False)
-                utils.send_msg(sock,
-                               utils.encode_message(self.name, self.me_user.port,
-                                                    6, self.me_user.user_id, '', 0))
-
-    def handle_receive_message(self, message, key):
-        """Handle received message, which maybe text, image or file."""
-        decoded_message = utils.decode_message(message)
-        if decoded_message is None:
-            self.is_receiving[key] = False
-            return
-
-        chat_name = decoded_message[0]
-        message_type = decoded_message[2]
-
-        if chat_name != self.name:
-            self.is_receiving[key] = False
-            return
-
-        # maybe a user deletes the chat or logs out
-        chat_end = self.check_chat_end(message_type)
-        if chat_end:
-            self.is_receiving[key] = False
-            return
-
-        display_message = self.receive_message(decoded_message,
-                                               self.socks[key], self.other_user[key])
-
-        self.is_receiving[key] = False
-
-        # optionally display
-        if self.is_current:
-            self.display_message_signal.emit(display_message)
-        else:  # mark with '(new message)'
-            self.new_message_signal.emit(self.name)
-
-    def send_message(self, message_type, new_message):
-        """Needs to send to all users in self.other_user."""
-        while self.is_sending:
-            time.sleep(0.1)
-
-        send_time = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
-
-        # first pack the message in a Message class
-        if message_type == 0:  # text
-            new_message = \
-                TextMessage(self.me_user.icon, self.me_user.user_id,
-                            None, send_time, new_message)
-        elif message_type == 1:  # image
-            new_message = \
-                ImageMessage(self.me_user.icon, self.me_user.user_id,
-                             None, send_time, new_message,
-                             os.stat(new_message).st_size)
-        elif message_type == 2:  # file
-            new_message = \
-                FileMessage(self.me_user.icon, self.me_user.user_id,
-                            None, send_time, new_message,
-                            os.stat(new_message).st_size)
-
-        # then iterate over all users in self.other_user to send message
-        self.is_sending = True
-        display_message = None
-        for key, user in self.other_user.items():
-            new_message.receiver_id = user.user_id
-
-            # different types of message
-            if message_type == 0:  # text
-                display_message = self.send_text_message(new_message, self.socks[key])
-            elif message_type == 1:  # image
-                display_message = self.send_image_message(new_message, self.socks[key])
-            elif message_type == 2:  # file
-                display_message = self.send_file_message(new_message, self.socks[key])
-
-        self.is_sending = False
-
-        # finally store history message
-        self.update_history_message(display_message)
-
-        return display_message
-
-    def send_delete_message(self):
-        """Delete other user as your friend, send a message to inform."""
-        for sock in self.socks.values():
-            utils.send_msg(sock,
-                           utils.encode_message(self.name, self.me_user.port,
-                                                7, self.me_user.user_id, '', 0))
-
-    def send_log_out_message(self):
-        """Delete other user as your friend, send a message to inform."""
-        for sock in self.socks.values():
-            utils.send_msg(sock,
-                           utils.encode_message(self.name, self.me_user.port,
-                                                8, self.me_user.user_id, '', 0))
-
-    def update_server_sock(self, sock, user_id):
-        """Set self.server_socks according to id. (the socket that other user connect to me)"""
-        sock.setblocking(False)
-        self.socks[user_id] = sock
-
-
-class VideoChat(Thread):
-    """Class for a video chat.
-    Inherit from thread because we can do other things when having video chat.
-    We need to have four sockets:
-        send video, send audio, receive video, receive audio
-    """
-
-    def __init__(self, me_user, other_user):
-        super(VideoChat, self).__init__()
-
-        self.me_user = me_user
-        self.other_user = other_user
-
-        # camera reader and voice recoder
-        self.video_sender = VideoClient(self.other_user.ip, config.VIDEO_PORT)
-        self.video_receiver = VideoServer(config.VIDEO_PORT, self.other_user.name)
-        self.audio_sender = AudioClient(self.other_user.ip, config.VOICE_PORT)
-        self.audio_receiver = AudioServer(config.VOICE_PORT)
-
-        # mark whether it's still talking
-        self.is_alive = False
-
-    def __del__(self):
-        del self.video_sender, self.audio_sender, self.video_receiver, self.audio_receiver
-
-    def run(self):
-        """Get video and audio piece then send."""
-        self.is_alive = True
-        self.video_sender.start()
-        self.audio_sender.start()
-        time.sleep(1)
-        self.video_receiver.start()
-        self.audio_receiver.start()
-
-        while self.audio_sender.is_alive and self.video_sender.is_alive \
-                and self.audio_receiver.is_alive and self.video_receiver.is_alive and \
-                self.is_alive:
-            time.sleep(1)
-        self.kill()
-
-    def kill(self):
-        """Kill the thread."""
-        self.video_sender.kill()
-        self.audio_sender.kill()
-        self.video_receiver.kill()
-        self.audio_receiver.kill()
-        self.is_alive = False
+"""This file contains classes for chats, including private, group, video chats."""
+
+import os
+import copy
+import mmap
+import json
+import time
+import socket
+from threading import Thread, Event
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from .camera import VideoServer, VideoClient
+from .microphone import AudioServer, AudioClient
+from .reactor import reactor
+from .worker_pool import workers
+from .outbox import Outbox, CONTROL, MESSAGE, BULK, flush_all
+
+import utils
+import config
+from .message import TextMessage, ImageMessage, FileMessage, DisplayMessage
+from .transfer import PartialFile, Transfer, content_digest, content_store, get_transfer_id, \
+    is_transfer_id, split_ranges, NoRoomError
+
+# types followed by an image or file body on the chat socket,
+# read in their own thread instead of holding a worker for the whole transfer
+BODY_TYPES = {1, 2, 13}
+
+# display text of a sent image or file by Transfer.state
+SEND_RESULTS = {
+    'done': 'send success!',
+    'failed': 'send failed, send it again to resume.',
+    'cancelled': 'send cancelled.',
+}
+
+
+class Chat(Thread):
+    """Basic class for private and group chat.
+    Member Variables:
+        me_user: me
+        other_user: another user (maybe be one person or many persons)
+        message_history: a list of past received or sent messages
+        pending_answers: {(transfer_id, receiver_id): Future} of offered images or files
+        partial_files: {transfer_id: PartialFile} of images or files being received
+        transfers: {(transfer_id, receiver_id): Transfer} of images or files being sent
+        outboxes: {sock: Outbox} of chat sockets something has been sent on
+    """
+
+    def __init__(self, me_user, other_user, signals):
+        super(Chat, self).__init__()
+
+        self.me_user = me_user
+        self.other_user = other_user
+        self.name = None
+        self.is_current = False
+        self.is_alive = True
+
+        self.message_history = []
+        self.pending_answers = {}
+        self.partial_files = {}
+        self.transfers = {}
+        self.outboxes = {}
+
+        self.display_message_signal = signals[0]
+        self.new_message_signal = signals[1]
+        self.friend_delete_chat_signal = signals[2]
+        self.friend_log_out_signal = signals[3]
+        self.transfer_signal = signals[4]
+
+    def __eq__(self, other):
+        pass
+
+    def __hash__(self):
+        return hash(id(self))
+
+    def run(self):
+        """Iteratively check self.sock(s) for new message."""
+        pass
+
+    def send_message(self, message_type, new_message):
+        """Send message to self.other_user, returns what to display.
+        Text and control messages wait in the Outbox of the chat socket, not for each other.
+        """
+        display_message = self.send_new_message(message_type, new_message)
+        self.update_history_message(display_message)
+        return display_message
+
+    def send_new_message(self, message_type, new_message):
+        """Pack new_message in a Message class and send it, returns what to display."""
+        pass
+
+    def get_member(self, user_id):
+        """Returns the other user with user_id in this chat, None if not found."""
+        pass
+
+    def get_sock(self, user_id):
+        """Returns the socket to the other user with user_id in this chat."""
+        pass
+
+    def check_sock(self, sock, *args):
+        """Called by the reactor when sock has a message, read and handle it in a worker,
+            the reactor doesn't watch sock meanwhile.
+        Messages of the same chat are handled in the order they come, even from different socks.
+        args are passed to self.handle_receive_message() after the message.
+        """
+        workers.submit(self, self.read_message, sock, *args)
+
+    def read_message(self, sock, *args):
+        try:
+            message = utils.recv_msg(sock)
+        except BlockingIOError:  # nothing to read after all
+            message = b''
+        except OSError:
+            message = None
+        if message is None:  # closed by the other user
+            reactor.unregister(sock)
+            return
+        decoded_message = utils.decode_message(message) if message else None
+        if decoded_message is not None and decoded_message[2] in BODY_TYPES:
+            t = Thread(target=self.handle_message, args=(sock, message) + args, daemon=True)
+            t.start()
+            return
+        self.handle_message(sock, message, *args)
+
+    def handle_message(self, sock, message, *args):
+        """Handle a message read from sock, then let the reactor watch sock again."""
+        try:
+            if message:
+                self.handle_receive_message(message, *args)
+        finally:
+            if self.is_alive:
+                reactor.resume(sock)
+
+    def handle_receive_message(self, message, *args):
+        """Handle received message, which maybe text, image or file."""
+        pass
+
+    def send_frame(self, sock, message_type, message, length=0):
+        """Send a message on a chat socket (not a data connection) through its Outbox,
+            control messages go before others waiting, see classes.outbox.
+        classes.aio_chat sends it from its event loop instead.
+        """
+        priority = CONTROL if message_type in config.CONTROL_MESSAGE_TYPES else MESSAGE
+        self.get_outbox(sock).put(utils.encode_message(self.name, self.me_user.port, message_type,
+                                                       self.me_user.user_id, message, length),
+                                  priority)
+
+    def get_outbox(self, sock):
+        return self.outboxes.setdefault(sock, Outbox(sock))
+
+    def send_text_message(self, text_message, sock):
+        """Send text message via client_sock."""
+        self.send_frame(sock, 0, text_message.text)
+        return DisplayMessage(text_message.sender_icon, text_message.sender_id,
+                              text_message.t, 0, text_message.text)
+
+    def send_image_message(self, image_message, sock):
+        """Send image message via client_sock, see send_content()."""
+        transfer = self.send_content(image_message, sock)
+        text = 'Image {} {}'.format(image_message.path, SEND_RESULTS[transfer.state])
+        return DisplayMessage(image_message.sender_icon, image_message.sender_id,
+                              image_message.t, 1, text, img_path=image_message.path)
+
+    def send_file_message(self, file_message, sock):
+        """Send file message via client_sock, see send_content()."""
+        transfer = self.send_content(file_message, sock)
+        text = 'File {} {}'.format(file_message.path, SEND_RESULTS[transfer.state])
+        return DisplayMessage(file_message.sender_icon, file_message.sender_id,
+                              file_message.t, 2, text)
+
+    def send_content(self, message, sock, source=None):
+        """Send the image or file of message to message.receiver_id via sock.
+        First offer 'id_hash_checksums' of it, the receiver answers which ranges
+            of it are missing, then only send those ranges (the whole thing if it has none,
+            nothing if it has received the same content before).
+        After receiving them, the receiver answers again with the chunks that fail
+            their checksum, which are sent again up to config.FILE_RETRANSMIT_LIMIT times.
+        If source is given, send from it (the mapped file) instead of reading the file.
+        Returns the Transfer, its state tells whether the receiver has the whole content now.
+        """
+        stat = os.stat(message.path)
+        transfer_id = get_transfer_id(self.name, self.me_user.user_id, message.path, stat)
+        content_hash, checksums = content_digest(message.path, stat)
+        offer = json.dumps({'id': transfer_id, 'hash': content_hash, 'checksums': checksums,
+                            'type': message.message_type, 'path': message.path})
+        key = (transfer_id, message.receiver_id)
+        transfer = Transfer(transfer_id, self.name, message.receiver_id, message.path,
+                            True, self.transfer_signal)
+        self.transfers[key] = transfer
+        self.pending_answers[key] = Future()
+        try:
+            self.send_frame(sock, 11, offer, message.size)
+            missing = self.pending_answers[key].result(config.FILE_TRANSFER_TIMEOUT)
+            for _ in range(config.FILE_RETRANSMIT_LIMIT + 1):
+                if missing is None:  # cancelled, see cancel_transfer()
+                    break
+                if not missing:
+                    transfer.finish('done')
+                    return transfer
+                transfer.expect(sum(end - start for start, end in missing))
+                self.pending_answers[key] = Future()  # before the answer may come
+                if not self.send_missing(transfer, message, missing, sock, source):
+                    break
+                missing = self.pending_answers[key].result(config.FILE_TRANSFER_TIMEOUT)
+        except (OSError, FutureTimeoutError):
+            pass
+        finally:
+            self.pending_answers.pop(key, None)
+            self.transfers.pop(key, None)
+        if transfer.is_cancelled:  # by me or the receiver, who ignores it then
+            self.send_cancel(transfer, sock)
+        transfer.finish('failed')  # unless cancelled
+        return transfer
+
+    def send_missing(self, transfer, message, missing, sock, source):
+        """Send missing ranges of the content over a new data connection to the receiver,
+            so that the chat socket stays free for text and control messages,
+            striped over config.FILE_STREAMS connections if they are large.
+        Via sock itself if not config.FILE_BULK_CHANNEL.
+        """
+        if not config.FILE_BULK_CHANNEL:
+            return self.send_ranges(transfer, message.path, missing, sock, 13, source)
+        return self.send_stripes(transfer, message, missing, source)
+
+    def send_stripes(self, transfer, message, missing, source):
+        """Send missing ranges over one or config.FILE_STREAMS data connections."""
+        streams = 1
+        if sum(end - start for start, end in missing) >= config.FILE_STRIPE_THRESHOLD:
+            streams = config.FILE_STREAMS
+        receiver = self.get_member(message.receiver_id)
+        results = []
+        threads = [Thread(target=self.send_stripe, daemon=True,
+                          args=(transfer, message.path, stripe,
+                                (receiver.ip, receiver.port), results, source))
+                   for stripe in split_ranges(missing, streams, config.FILE_CHUNK_SIZE)]
+        [t.start() for t in threads]
+        [t.join() for t in threads]
+        return len(results) == len(threads) and all(results)
+
+    def send_ranges(self, transfer, path, ranges, sock, message_type, source=None):
+        """Send '{"id", "offset"}_Count' and then Count bytes of the file for every range,
+            in frames of at most config.FILE_FRAME_SIZE, stop between two if transfer is cancelled.
+        """
+        for start, end in ranges:
+            for offset in range(start, end, config.FILE_FRAME_SIZE):
+                if transfer.is_cancelled:
+                    return False
+                count = min(config.FILE_FRAME_SIZE, end - offset)
+                if message_type == 13:  # on the chat socket, after text and control messages
+                    sent = self.get_outbox(sock).put(
+                        lambda sock: self.send_frame_of(transfer, path, offset, count,
+                                                        sock, message_type, source),
+                        BULK).result()
+                else:
+                    sent = self.send_frame_of(transfer, path, offset, count,
+                                              sock, message_type, source)
+                if sent != count:
+                    return False
+        return True
+
+    def send_frame_of(self, transfer, path, offset, count, sock, message_type, source=None):
+        """Send a frame of the file: '{"id", "offset"}_Count' and then Count bytes from offset."""
+        utils.send_msg(sock,
+                       utils.encode_message(self.name, self.me_user.port,
+                                            message_type, self.me_user.user_id,
+                                            json.dumps({'id': transfer.transfer_id,
+                                                        'offset': offset}),
+                                            count))
+        # the content itself, copied to sock by the kernel
+        if source is None:
+            return utils.send_file(sock, path, offset, count, transfer.advance)
+        return utils.send_mapped(sock, source, offset, count, transfer.advance)
+
+    def send_stripe(self, transfer, path, ranges, address, results, source=None):
+        """Send some ranges of the file over a new connection to the receiver's listening port,
+            on a high-latency link several connections get more throughput than one.
+        """
+        try:
+            with socket.create_connection(address, config.FILE_TRANSFER_TIMEOUT) as sock:
+                results.append(self.send_ranges(transfer, path, ranges, sock, 14, source))
+        except OSError:
+            results.append(False)
+
+    def receive_message(self, decoded_message, sock, sender):
+        """Receive message from someone.
+        Returns None if there is nothing to display.
+        """
+        _, _, message_type, _, receive_text, file_size = decoded_message
+        display_message = None
+        receive_time = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
+        if message_type == 0:  # text
+            receive_message = \
+                TextMessage(sender.icon, sender.user_id, self.me_user.user_id,
+                            receive_time, receive_text)
+            display_message = self.receive_text_message(receive_message)
+        elif message_type == 1:  # image
+            receive_message = \
+                ImageMessage(sender.icon, sender.user_id, self.me_user.user_id,
+                             receive_time, receive_text, file_size)
+            display_message = self.receive_image_message(receive_message, sock)
+        elif message_type == 2:  # file
+            receive_message = \
+                FileMessage(sender.icon, sender.user_id, self.me_user.user_id,
+                            receive_time, receive_text, file_size)
+            display_message = self.receive_file_message(receive_message, sock)
+        elif message_type == 11:  # offer of image or file
+            display_message = self.receive_offer(decoded_message, sock, sender)
+        elif message_type == 12:  # answer to my offer
+            display_message = self.receive_answer(decoded_message, sender)
+        elif message_type == 13:  # content of image or file
+            display_message = self.receive_content(decoded_message, sock, sender)
+        elif message_type == 15:  # the other side cancels an image or file
+            display_message = self.receive_cancel(decoded_message, sender)
+
+        if display_message is not None:
+            self.update_history_message(display_message)
+
+        return display_message
+
+    def receive_text_message(self, text_message):
+        """Process received text message.
+        Currently only display it.
+        """
+        return DisplayMessage(text_message.sender_icon, text_message.sender_id,
+                              text_message.t, 0, text_message.text)
+
+    def receive_image_message(self, image_message, sock):
+        """Process received image message.
+        Currently only store it in ./receive/imgs/file_name,
+            may also display it on screen in the future.
+        """
+        # write image into file
+        filename = utils.get_filename_from_path(image_message.path)
+        save_path = os.path.join(config.IMAGE_SAVE_FOLDER, filename)
+
+        # write to file
+        self.write_to_file(save_path, image_message, sock)
+
+        # display
+        return DisplayMessage(image_message.sender_icon, image_message.sender_id,
+                              image_message.t, 1, 'Receive image, saved to {}'.format(save_path),
+                              img_path=save_path)
+
+    def receive_file_message(self, file_message, sock):
+        """Process received file message.
+        Currently only store it in ./receive/files/file_name.
+        """
+        # write into file
+        filename = utils.get_filename_from_path(file_message.path)
+        save_path = os.path.join(config.FILE_SAVE_FOLDER, filename)
+
+        # write to file
+        self.write_to_file(save_path, file_message, sock)
+
+        # display
+        return DisplayMessage(file_message.sender_icon, file_message.sender_id,
+                              file_message.t, 2, 'Receive file, saved to {}'.format(save_path))
+
+    def receive_offer(self, decoded_message, sock, sender):
+        """Answer an offered image or file with which ranges of it I don't have,
+            none at all if I have received the same content before.
+        """
+        _, _, _, _, offer, size = decoded_message
+        try:
+            offer = json.loads(offer)
+            if not is_transfer_id(offer['id']):  # not answered, the sender times out
+                return None
+            save_path = self.get_save_path(offer['type'], offer['path'])
+            if content_store.copy(offer['hash'], save_path):
+                partial, missing = None, []
+            else:
+                partial = PartialFile(offer['id'])
+                missing = partial.start(offer['hash'], offer['checksums'], size,
+                                        offer['type'], offer['path'])
+        except NoRoomError:  # tell the sender at once, instead of letting it time out
+            self.send_frame(sock, 15, json.dumps({'id': offer['id']}))
+            receive_time = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
+            return DisplayMessage(sender.icon, sender.user_id, receive_time, offer['type'],
+                                  'Refused {} of {} bytes, more than I can receive'.format(
+                                      offer['path'], size))
+        except (ValueError, KeyError, TypeError, OSError):  # OSError: no space for it
+            return None
+        if missing:
+            partial.transfer = Transfer(offer['id'], self.name, sender.user_id, offer['path'],
+                                        False, self.transfer_signal)
+            partial.transfer.expect(sum(end - start for start, end in missing))
+            self.partial_files[offer['id']] = partial
+        self.send_frame(sock, 12, json.dumps({'id': offer['id'], 'missing': missing}))
+        if missing:
+            return None
+        if partial is not None:  # completely received last time
+            partial.finish(save_path)
+            content_store.add(offer['hash'], save_path)
+        return self.get_received_message(offer['type'], save_path, sender)
+
+    def receive_answer(self, decoded_message, sender):
+        """Wake up send_content() waiting for this answer."""
+        try:
+            answer = json.loads(decoded_message[4])
+            future = self.pending_answers.get((answer['id'], sender.user_id))
+            if future is not None:
+                future.set_result([[int(start), int(end)] for start, end in answer['missing']])
+        except (ValueError, KeyError, TypeError):
+            pass
+        return None
+
+    def receive_content(self, decoded_message, sock, sender):
+        """Receive a range of an offered image or file,
+            from the chat socket or a data connection (see receive_stream()).
+        """
+        _, _, _, _, header, count = decoded_message
+        try:
+            header = json.loads(header)
+            partial = self.partial_files.get(header['id'])
+            offset = int(header['offset'])
+        except (ValueError, KeyError, TypeError):
+            return None
+        if partial is None or offset + count > partial.manifest['size']:
+            utils.recv_file(sock, os.devnull, count)  # skip it to keep the stream in order
+            return None
+
+        checksums = []
+        received = utils.recv_file(sock, partial.part_path, count, offset, checksums,
+                                   partial.transfer.advance)
+        if partial.receive(offset, count, received, checksums):
+            # the sender waits for an answer, with the chunks to send again if any
+            missing = partial.expect(partial.missing())
+            self.send_frame(self.get_sock(sender.user_id), 12,
+                            json.dumps({'id': header['id'], 'missing': missing}))
+            if missing:
+                partial.transfer.expect(sum(end - start for start, end in missing))
+                return None
+            self.partial_files.pop(header['id'], None)
+            save_path = self.get_save_path(partial.manifest['type'], partial.manifest['path'])
+            partial.finish(save_path)
+            content_store.add(partial.manifest['hash'], save_path)
+            partial.transfer.finish('done')
+            return self.get_received_message(partial.manifest['type'], save_path, sender)
+        if received == count or partial.is_discarded:  # other ranges are still coming, or cancelled
+            return None
+        partial.transfer.finish('failed')
+        receive_time = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
+        return DisplayMessage(sender.icon, sender.user_id, receive_time, partial.manifest['type'],
+                              'Receive {} interrupted at {} of {} bytes, '
+                              'it will resume if sent again'.format(
+                                  partial.manifest['path'], partial.received,
+                                  partial.manifest['size']))
+
+    def receive_cancel(self, decoded_message, sender):
+        """The other side cancels an image or file, whether I'm sending or receiving it."""
+        try:
+            transfer_id = json.loads(decoded_message[4])['id']
+        except (ValueError, KeyError, TypeError):
+            return None
+        transfer = self.transfers.get((transfer_id, sender.user_id))
+        if transfer is not None:  # I'm sending it
+            self.stop_transfer(transfer)
+            return None
+        partial = self.partial_files.pop(transfer_id, None)
+        if partial is None:
+            return None
+        partial.discard()
+        partial.transfer.cancel()
+        partial.transfer.finish('cancelled')
+        receive_time = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
+        return DisplayMessage(sender.icon, sender.user_id, receive_time, partial.manifest['type'],
+                              'Receive {} cancelled by {}'.format(partial.manifest['path'],
+                                                                  sender.user_id))
+
+    def cancel_transfer(self, transfer):
+        """Cancel an image or file I'm sending or receiving (see Transfer), called by the UI.
+        Tell the other side, which stops too.
+        """
+        if transfer.state != 'running':
+            return
+        if transfer.is_sending:  # send_content() tells the receiver after it stops
+            self.stop_transfer(transfer)
+            return
+        partial = self.partial_files.pop(transfer.transfer_id, None)
+        if partial is not None:
+            partial.discard()
+        transfer.cancel()
+        transfer.finish('cancelled')
+        self.send_cancel(transfer, self.get_sock(transfer.user_id))
+
+    def send_cancel(self, transfer, sock):
+        if sock is not None:
+            self.send_frame(sock, 15, json.dumps({'id': transfer.transfer_id}))
+
+    def stop_transfer(self, transfer):
+        """Make send_content() of transfer stop after the frame it's sending."""
+        transfer.cancel()
+        future = self.pending_answers.get((transfer.transfer_id, transfer.user_id))
+        if future is not None and not future.done():
+            future.set_result(None)
+
+    def receive_stream(self, decoded_message, sock):
+        """Receive ranges over a data connection made to my listening port by send_stripe().
+        Called by MainWin with the first message of the connection.
+        """
+        sender = self.get_member(decoded_message[3])
+        sock.settimeout(config.FILE_TRANSFER_TIMEOUT)
+        try:
+            while sender is not None and decoded_message is not None and \
+                    decoded_message[2] == 14:
+                display_message = self.receive_content(decoded_message, sock, sender)
+                if display_message is not None:
+                    self.update_history_message(display_message)
+                    self.show_message(display_message)
+                decoded_message = utils.decode_message(utils.recv_msg(sock))
+        except OSError:
+            pass
+        finally:
+            sock.close()
+
+    @staticmethod
+    def get_save_path(message_type, path):
+        """Where to save a received image or file, path is where it's on the sender."""
+        filename = utils.get_filename_from_path(path)
+        if message_type == 1:
+            return os.path.join(config.IMAGE_SAVE_FOLDER, filename)
+        return os.path.join(config.FILE_SAVE_FOLDER, filename)
+
+    @staticmethod
+    def get_received_message(message_type, save_path, sender):
+        receive_time = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
+        if message_type == 1:
+            return DisplayMessage(sender.icon, sender.user_id, receive_time, 1,
+                                  'Receive image, saved to {}'.format(save_path),
+                                  img_path=save_path)
+        return DisplayMessage(sender.icon, sender.user_id, receive_time, 2,
+                              'Receive file, saved to {}'.format(save_path))
+
+    @staticmethod
+    def write_to_file(save_path, info_message, sock):
+        """Receive info_message.size bytes of image or file body from sock to save_path."""
+        return utils.recv_file(sock, save_path, info_message.size)
+
+    def check_chat_end(self, message_type):
+        """If a user within the chat deletes the chat or logs out."""
+        if message_type == 7:
+            self.friend_delete_chat_signal.emit(self.name)
+            return True
+        elif message_type == 8:
+            self.friend_log_out_signal.emit(self.name)
+            return True
+        return False
+
+    def update_history_message(self, new_message):
+        self.message_history.append(new_message)
+
+    def show_message(self, display_message):
+        """Display a received message if this chat is selected, else mark it."""
+        if self.is_current:
+            self.display_message_signal.emit(display_message)
+        else:  # mark with '(new message)'
+            self.new_message_signal.emit(self.name)
+
+    def select_state_change(self):
+        """Change self.is_current to reverse."""
+        self.is_current = not self.is_current
+
+    def kill(self, flush_timeout=config.SEND_FLUSH_TIMEOUT):
+        """Kill the thread, after what's waiting in the outboxes is sent,
+            e.g. the message that I delete the chat or log out, for at most flush_timeout seconds.
+        """
+        self.is_alive = False
+        flush_all(list(self.outboxes.values()), flush_timeout)
+
+
+class PrivateChat(Chat):
+    """Class for a chat between two users.
+    Input:
+        sock: if None, meaning I'm starter and should send request to other user.
+            else I should send response to other user.
+
+    Member Variables:
+        name: chat name, which is unique among all chats.
+        sock: watched by the reactor for messages, and sending message via it.
+    """
+
+    def __init__(self, me_user, other_user,
+                 normal_chat_signals, video_chat_signals, sock=None):
+        super(PrivateChat, self).__init__(me_user, other_user, normal_chat_signals)
+
+        # signals for video chat
+        self.video_request_signal = video_chat_signals[0]
+        self.video_agree_signal = video_chat_signals[1]
+        self.video_reject_signal = video_chat_signals[2]
+
+        # generate name for the private chat
+        # in the order of sort()
+        all_id = [me_user.user_id, other_user.user_id]
+        self.name = utils.get_chat_name_from_id(all_id)  # len == 21
+
+        # setup socket
+        if sock is None:  # I start the chat, should send a request
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.sock.connect((self.other_user.ip, self.other_user.port))
+        else:
+            self.sock = sock
+        self.sock.setblocking(False)
+
+        # if I start this chat, then I should send private chat request
+        if sock is None:
+            utils.send_msg(self.sock,
+                           utils.encode_message(self.name, self.me_user.port,
+                                                3, self.me_user.user_id, '', 0))
+
+    def __del__(self):
+        self.sock.close()
+
+    def __eq__(self, other):
+        return isinstance(other, PrivateChat) and self.name == other.name
+
+    def __hash__(self):
+        return hash(id(self))
+
+    def get_member(self, user_id):
+        return self.other_user if self.other_user.user_id == user_id else None
+
+    def get_sock(self, user_id):
+        return self.sock
+
+    def run(self):
+        """Let the reactor watch self.sock, it calls self.check_sock() when there is a message."""
+        reactor.register(self.sock, self.check_sock)
+
+    def handle_receive_message(self, message):
+        """Handle received message, which maybe text, image or file."""
+        decoded_message = utils.decode_message(message)
+        if decoded_message is None:
+            return
+
+        chat_name = decoded_message[0]
+        message_type = decoded_message[2]
+
+        # make sure it's for this chat
+        if chat_name != self.name:
+            return
+
+        # maybe that friend deletes you or logs out
+        chat_end = self.check_chat_end(message_type)
+        if chat_end:
+            return
+
+        # maybe that friend wants to start a video chat with you
+        video_chat = self.check_video_chat(message_type, decoded_message[4])
+        if video_chat:
+            return
+
+        display_message = self.receive_message(decoded_message, self.sock, self.other_user)
+
+        if display_message is None:
+            return
+
+        # optionally display
+        self.show_message(display_message)
+
+    def send_new_message(self, message_type, new_message):
+        """Only need to send to one person.
+        Images and files are sent over data connections (see Chat.send_missing()),
+            text sent meanwhile doesn't wait for them.
+        """
+        send_time = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
+
+        # different types of message
+        if message_type == 0:  # text
+            new_text_message = \
+                TextMessage(self.me_user.icon, self.me_user.user_id,
+                            self.other_user.user_id, send_time, new_message)
+            display_message = self.send_text_message(new_text_message, self.sock)
+        elif message_type == 1:  # image
+            new_image_message = \
+                ImageMessage(self.me_user.icon, self.me_user.user_id,
+                             self.other_user.user_id, send_time, new_message,
+                             os.stat(new_message).st_size)
+            display_message = self.send_image_message(new_image_message, self.sock)
+        elif message_type == 2:  # file
+            new_file_message = \
+                FileMessage(self.me_user.icon, self.me_user.user_id,
+                            self.other_user.user_id, send_time, new_message,
+                            os.stat(new_message).st_size)
+            display_message = self.send_file_message(new_file_message, self.sock)
+
+        return display_message
+
+    def send_video_chat_request(self):
+        """Send a message to inform video chat request."""
+        self.send_frame(self.sock, 9, '')
+
+    def send_video_chat_agree(self):
+        """Send a message to inform video chat request."""
+        self.send_frame(self.sock, 10, 'y')
+
+    def send_video_chat_reject(self):
+        """Send a message to inform video chat request."""
+        self.send_frame(self.sock, 10, 'n')
+
+    def send_delete_message(self):
+        """Delete other user as your friend, send a message to inform."""
+        self.send_frame(self.sock, 7, '')
+
+    def send_log_out_message(self):
+        """Delete other user as your friend, send a message to inform."""
+        self.send_frame(self.sock, 8, '')
+
+    def kill(self, flush_timeout=config.SEND_FLUSH_TIMEOUT):
+        """Stop watching self.sock."""
+        super(PrivateChat, self).kill(flush_timeout)
+        reactor.unregister(self.sock)
+
+    def check_video_chat(self, message_type, message_content):
+        """Check whether the received message is about video chat."""
+        if message_type == 9:
+            self.video_request_signal.emit(self.name)
+            return True
+        elif message_type == 10:
+            if message_content == 'y':
+                self.video_agree_signal.emit(self.name)
+            elif message_content == 'n':
+                self.video_reject_signal.emit(self.name)
+            return True
+        return False
+
+
+class GroupChat(Chat):
+    """Class for a group of users.
+    Input:
+        sock: the sock connected to me from group_leader_id user.
+            If None, meaning I'm the starter and should send request to all others.
+            Else I should send response to users whose user_id is
+                larger (list.sort()) than me (except group_leader).
+
+    Member Variables:
+        name: the unique identity of a group chat (also unique among all chats).
+            In the form of 'id1-id2-id3...', in the order of np.sort!
+        socks: a dict of sockets. Watched by the reactor for messages and sending message via them.
+            Every time sending a message, just iterate over all of them.
+        all_connected: Event set once every member has a sock in socks.
+    """
+
+    def __init__(self, me_user, other_user, normal_chat_signals,
+                 group_leader_id=None, sock=None):
+        super(GroupChat, self).__init__(me_user, other_user, normal_chat_signals)
+
+        # generate the name for the group chat
+        # in the order of sort()
+        all_id = list(self.other_user.keys()) + [self.me_user.user_id]
+        self.name = utils.get_chat_name_from_id(all_id)  # len >= 33
+
+        # setup sockets for every user
+        self.socks = {user_id: None for user_id in self.other_user.keys()}
+
+        # set up sock for leader
+        if group_leader_id is not None:
+            sock.setblocking(False)
+            self.socks[group_leader_id] = sock
+
+        # flags
+        self.group_leader_id = group_leader_id
+        self.all_connected = Event()
+        self.check_all_connected()
+
+    def __del__(self):
+        [sock.close() for sock in self.socks.values()]
+
+    def __eq__(self, other):
+        return isinstance(other, GroupChat) and self.name == other.name
+
+    def __hash__(self):
+        return hash(id(self))
+
+    def get_member(self, user_id):
+        return self.other_user.get(user_id)
+
+    def get_sock(self, user_id):
+        return self.socks.get(user_id)
+
+    def run(self):
+        """Wait until every member is connected, then let the reactor watch their socks,
+            it calls self.check_sock() with the member's id when one has a message.
+        """
+        self.all_connected.wait()  # someone haven't confirm
+        if not self.is_alive:
+            return
+        for key, sock in self.socks.items():
+            reactor.register(sock, lambda sock, key=key: self.check_sock(sock, key))
+
+    def check_all_connected(self):
+        if all(sock is not None for sock in self.socks.values()):
+            self.all_connected.set()
+
+    def init_socks(self):
+        """Connect sockets with users whose id is less than me."""
+        if self.group_leader_id is None:  # I start the chat, should send request to other users
+            for user in self.other_user.values():
+                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                sock.connect((user.ip, user.port))
+                self.socks[user.user_id] = sock
+                sock.setblocking(False)
+                utils.send_msg(sock,
+                               utils.encode_message(self.name, self.me_user.port,
+                                                    4, self.me_user.user_id, '', 0))
+                self.check_all_connected()
+        else:  # should send response to those whose user_id is larger than me
+            time.sleep(1)  # wait for everyone to first create a GroupChat and update
+            for user in self.other_user.values():
+                if self.me_user.user_id > user.user_id or user.user_id == self.group_leader_id:
+                    continue
+                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                sock.connect((user.ip, user.port))
+                self.socks[user.user_id] = sock
+                sock.setblocking(False)
+                utils.send_msg(sock,
+                               utils.encode_message(self.name, self.me_user.port,
+                                                    6, self.me_user.user_id, '', 0))
+                self.check_all_connected()
+
+    def handle_receive_message(self, message, key):
+        """Handle received message, which maybe text, image or file."""
+        decoded_message = utils.decode_message(message)
+        if decoded_message is None:
+            return
+
+        chat_name = decoded_message[0]
+        message_type = decoded_message[2]
+
+        if chat_name != self.name:
+            return
+
+        # maybe a user deletes the chat or logs out
+        chat_end = self.check_chat_end(message_type)
+        if chat_end:
+            return
+
+        display_message = self.receive_message(decoded_message,
+                                               self.socks[key], self.other_user[key])
+
+        if display_message is None:
+            return
+
+        # optionally display
+        self.show_message(display_message)
+
+    def send_new_message(self, message_type, new_message):
+        """Needs to send to all users in self.other_user.
+        Text doesn't wait for images or files being sent, as in PrivateChat.send_new_message().
+        """
+        send_time = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
+
+        # first pack the message in a Message class
+        if message_type == 0:  # text
+            new_message = \
+                TextMessage(self.me_user.icon, self.me_user.user_id,
+                            None, send_time, new_message)
+        elif message_type == 1:  # image
+            new_message = \
+                ImageMessage(self.me_user.icon, self.me_user.user_id,
+                             None, send_time, new_message,
+                             os.stat(new_message).st_size)
+        elif message_type == 2:  # file
+            new_message = \
+                FileMessage(self.me_user.icon, self.me_user.user_id,
+                            None, send_time, new_message,
+                            os.stat(new_message).st_size)
+
+        # then iterate over all users in self.other_user to send message
+        display_message = None
+        if message_type in (1, 2):  # image or file
+            display_message = self.fan_out(new_message)
+        for key, user in self.other_user.items():
+            new_message.receiver_id = user.user_id
+
+            # different types of message
+            if message_type == 0:  # text
+                display_message = self.send_text_message(new_message, self.socks[key])
+
+        return display_message
+
+    def fan_out(self, message):
+        """Send an image or file to all members at the same time.
+        The file is mapped into memory once and shared by one thread per member,
+            each sends what its member misses at its own pace,
+            so a slow member doesn't hold up the others.
+        """
+        content_digest(message.path)  # once for all members, they find it in cache
+        with open(message.path, 'rb') as file:
+            # an empty file can't be mapped, but there is nothing to send anyway
+            source = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if message.size else None
+        failed = []
+        threads = []
+        for key, user in self.other_user.items():
+            member_message = copy.copy(message)
+            member_message.receiver_id = user.user_id
+            threads.append(Thread(target=self.fan_out_to, daemon=True,
+                                  args=(member_message, self.socks[key], source, failed)))
+        [t.start() for t in threads]
+        [t.join() for t in threads]
+        if source is not None:
+            source.close()
+
+        name = 'Image' if message.message_type == 1 else 'File'
+        if failed:
+            text = '{} {} send failed to {}, send it again to resume.'.format(
+                name, message.path, ', '.join(failed))
+        else:
+            text = '{} {} send success!'.format(name, message.path)
+        return DisplayMessage(message.sender_icon, message.sender_id, message.t,
+                              message.message_type, text,
+                              img_path=message.path if message.message_type == 1 else None)
+
+    def fan_out_to(self, message, sock, source, failed):
+        if self.send_content(message, sock, source).state != 'done':
+            failed.append(message.receiver_id)
+
+    def send_delete_message(self):
+        """Delete other user as your friend, send a message to inform."""
+        for sock in self.socks.values():
+            self.send_frame(sock, 7, '')
+
+    def send_log_out_message(self):
+        """Delete other user as your friend, send a message to inform."""
+        for sock in self.socks.values():
+            self.send_frame(sock, 8, '')
+
+    def update_server_sock(self, sock, user_id):
+        """Set self.server_socks according to id. (the socket that other user connect to me)"""
+        sock.setblocking(False)
+        self.socks[user_id] = sock
+        self.check_all_connected()
+
+    def kill(self, flush_timeout=config.SEND_FLUSH_TIMEOUT):
+        """Stop watching self.socks."""
+        super(GroupChat, self).kill(flush_timeout)
+        self.all_connected.set()  # run() may still wait for it
+        [reactor.unregister(sock) for sock in self.socks.values() if sock is not None]
+
+
+class VideoChat(Thread):
+    """Class for a video chat.
+    Inherit from thread because we can do other things when having video chat.
+    We need to have four sockets:
+        send video, send audio, receive video, receive audio
+    """
+
+    def __init__(self, me_user, other_user):
+        super(VideoChat, self).__init__()
+
+        self.me_user = me_user
+        self.other_user = other_user
+
+        # camera reader and voice recoder
+        self.video_sender = VideoClient(self.other_user.ip, config.VIDEO_PORT)
+        self.video_receiver = VideoServer(config.VIDEO_PORT, self.other_user.name)
+        self.audio_sender = AudioClient(self.other_user.ip, config.VOICE_PORT)
+        self.audio_receiver = AudioServer(config.VOICE_PORT)
+
+        # mark whether it's still talking
+        self.is_alive = False
+
+    def __del__(self):
+        del self.video_sender, self.audio_sender, self.video_receiver, self.audio_receiver
+
+    def run(self):
+        """Get video and audio piece then send."""
+        self.is_alive = True
+        self.video_sender.start()
+        self.audio_sender.start()
+        time.sleep(1)
+        self.video_receiver.start()
+        self.audio_receiver.start()
+
+        while self.audio_sender.is_alive and self.video_sender.is_alive \
+                and self.audio_receiver.is_alive and self.video_receiver.is_alive and \
+                self.is_alive:
+            time.sleep(1)
+        self.kill()
+
+    def kill(self):
+        """Kill the thread."""
+        self.video_sender.kill()
+        self.audio_sender.kill()
+        self.video_receiver.kill()
+        self.audio_receiver.kill()
+        self.is_alive = False
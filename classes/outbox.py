@@ -0,0 +1,128 @@
+"""This file contains the outbox of a chat socket, the queue of what to send on it."""
+
+import time
+import heapq
+import itertools
+from threading import Thread, Condition
+from concurrent.futures import Future
+
+import utils
+import config
+from .worker_pool import WorkerPool
+
+# priorities of what waits in an Outbox, smaller first
+CONTROL = 0  # config.CONTROL_MESSAGE_TYPES
+MESSAGE = 1  # text, requests, offers
+BULK = 2  # image or file content on the chat socket, when not config.FILE_BULK_CHANNEL
+
+# write the outboxes of all chat sockets, apart from workers
+# so that a worker putting a message never waits for a worker to write it
+senders = WorkerPool(config.SEND_THREADS)
+
+
+class Outbox:
+    """Messages waiting to be sent on a chat socket, written one after another by the senders
+        pool, instead of every sender waiting for is_sending and writing by itself.
+    Control messages go before text, which goes before image or file content,
+        messages of the same priority go in the order they are put.
+    Small messages waiting back to back are written together by one send,
+        up to config.SEND_COALESCE_SIZE bytes.
+    A sender writes until the outbox is empty and is given it again at the next put(),
+        so chats share a few threads however many have sent something.
+        Image or file content is written in its own thread, not to hold a sender that long.
+    Member Variables:
+        sock: the chat socket
+        queue: heap of (priority, order, message or function(sock), Future)
+        is_writing: whether a sender or content thread has the outbox
+        error: why a write failed, e.g. the peer stopped reading for config.FILE_TRANSFER_TIMEOUT,
+            nothing more is written as the stream may be cut in the middle of a message
+    """
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.queue = []
+        self.order = itertools.count()
+        self.is_writing = False
+        self.error = None
+        self.condition = Condition()
+
+    def put(self, item, priority):
+        """Send item, an encoded message or a function(sock) sending something itself.
+        Returns a Future set to None or what the function returns once it's sent,
+            or to the exception (e.g. OSError) if it can't be.
+        """
+        future = Future()
+        with self.condition:
+            if self.error is not None:
+                future.set_exception(self.error)
+                return future
+            heapq.heappush(self.queue, (priority, next(self.order), item, future))
+            if self.is_writing:
+                return future
+            self.is_writing = True
+        senders.submit(self, self.write)
+        return future
+
+    def take(self):
+        """Take the first item, or as many messages as can be sent together,
+            [] if there is nothing left and the outbox is given up.
+        """
+        with self.condition:
+            if not self.queue:
+                self.is_writing = False
+                self.condition.notify_all()
+                return []
+            batch = [heapq.heappop(self.queue)]
+            size = len(batch[0][2]) if not callable(batch[0][2]) else 0
+            while size and self.queue and not callable(self.queue[0][2]) and \
+                    size + len(self.queue[0][2]) <= config.SEND_COALESCE_SIZE:
+                batch.append(heapq.heappop(self.queue))
+                size += len(batch[-1][2])
+            return batch
+
+    def flush(self, timeout=None):
+        """Wait until everything put is sent, at most timeout seconds."""
+        with self.condition:
+            return self.condition.wait_for(lambda: not self.is_writing, timeout)
+
+    def write(self):
+        batch = self.take()
+        while batch:
+            if callable(batch[0][2]):  # keeps the outbox until it's sent
+                Thread(target=self.write_content, args=(batch,), daemon=True).start()
+                return
+            try:
+                utils.send_all(self.sock, b''.join(utils.pack_msg(item)
+                                                   for _, _, item, _ in batch))
+            except Exception as e:
+                self.fail(batch, e)
+                return
+            [future.set_result(None) for _, _, _, future in batch]
+            batch = self.take()
+
+    def write_content(self, batch):
+        (_, _, function, future), = batch
+        try:
+            future.set_result(function(self.sock))
+        except Exception as e:
+            self.fail(batch, e)
+            return
+        senders.submit(self, self.write)  # what was put meanwhile
+
+    def fail(self, batch, error):
+        """Set error to the Futures of batch and of everything waiting, and give up the outbox."""
+        with self.condition:
+            self.error = error
+            batch, self.queue = batch + self.queue, []
+            self.is_writing = False
+            self.condition.notify_all()
+        [future.set_exception(error) for _, _, _, future in batch]  # for whoever waits for them
+
+
+def flush_all(outboxes, timeout=None):
+    """Wait until everything put in outboxes is sent, at most timeout seconds in total,
+        they are written at the same time so a slow one doesn't hold up the others.
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    for outbox in outboxes:
+        outbox.flush(None if deadline is None else max(0, deadline - time.monotonic()))
@@ -0,0 +1,91 @@
+"""This file contains the network reactor, one thread waiting for messages on all chat sockets."""
+
+import socket
+import selectors
+from threading import Thread, Lock
+from collections import deque
+
+
+class Reactor(Thread):
+    """Wait until any registered socket is readable with a selector (epoll on Linux),
+        then call the callback it's registered with, instead of every chat polling its own.
+    A socket is paused once it's readable, so that a chat reads a whole message
+        (and the body of an image or file after it) by itself, and it's only watched again
+        after the chat calls resume(). Callbacks run in the reactor thread, so they
+        should hand the reading over to another thread and return at once.
+    Member Variables:
+        selector: the selector, data of a key is its callback
+        callbacks: {sock: callback} of all registered sockets, paused or not
+        changes: ('watch' or 'forget', sock) to apply to the selector in the reactor thread,
+            a selector is not safe to change while another thread is in select()
+        wakeup_sock, wakeup_send_sock: socket pair to interrupt select() for changes
+    """
+
+    def __init__(self):
+        super(Reactor, self).__init__()
+        self.daemon = True
+
+        self.selector = selectors.DefaultSelector()
+        self.callbacks = {}
+        self.changes = deque()
+        self.lock = Lock()
+
+        self.wakeup_sock, self.wakeup_send_sock = socket.socketpair()
+        self.wakeup_sock.setblocking(False)
+        self.wakeup_send_sock.setblocking(False)
+        self.selector.register(self.wakeup_sock, selectors.EVENT_READ)
+
+    def register(self, sock, callback):
+        """Call callback(sock) in the reactor thread when sock is readable."""
+        with self.lock:
+            self.callbacks[sock] = callback
+            if not self.is_alive():
+                self.start()
+        self.change('watch', sock)
+
+    def resume(self, sock):
+        """Watch a paused sock again, after its message is read."""
+        self.change('watch', sock)
+
+    def unregister(self, sock):
+        with self.lock:
+            self.callbacks.pop(sock, None)
+        self.change('forget', sock)
+
+    def change(self, action, sock):
+        self.changes.append((action, sock))
+        try:
+            self.wakeup_send_sock.send(b'\0')
+        except BlockingIOError:  # already many wake-ups pending
+            pass
+
+    def apply_changes(self):
+        while self.changes:
+            action, sock = self.changes.popleft()
+            with self.lock:
+                callback = self.callbacks.get(sock)
+            try:
+                if action == 'watch' and callback is not None:
+                    self.selector.register(sock, selectors.EVENT_READ, callback)
+                else:
+                    self.selector.unregister(sock)
+            except (KeyError, ValueError, OSError):  # watched already, or closed
+                pass
+
+    def run(self):
+        while True:
+            for key, _ in self.selector.select():
+                if key.fileobj is self.wakeup_sock:
+                    try:
+                        while self.wakeup_sock.recv(4096):
+                            pass
+                    except BlockingIOError:
+                        pass
+                    continue
+                self.selector.unregister(key.fileobj)  # paused until resume()
+                key.data(key.fileobj)
+            self.apply_changes()
+
+
+# shared by all chats
+reactor = Reactor()
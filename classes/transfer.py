@@ -0,0 +1,429 @@
+"""This file contains helpers for sending images and files that can be resumed,
+are checked chunk by chunk, and are not sent again if the receiver already has the same content.
+"""
+
+import os
+import zlib
+import json
+import time
+import shutil
+import hashlib
+from threading import Lock
+from collections import OrderedDict
+
+import utils
+import config
+
+# (path, size, mtime): (sha256, checksums), least recently used first
+digest_cache = OrderedDict()
+digest_cache_lock = Lock()
+
+TRANSFER_ID_LENGTH = 16  # hex digits of an id made by get_transfer_id()
+
+
+class NoRoomError(OSError):
+    """An offered image or file is larger than config.FILE_MAX_SIZE or the free disk space."""
+    pass
+
+
+def content_digest(path, stat=None):
+    """sha256 and checksums of the file at path (see digest_file()),
+        only computed again if the file is modified.
+    """
+    stat = os.stat(path) if stat is None else stat
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    with digest_cache_lock:
+        if key in digest_cache:
+            digest_cache.move_to_end(key)
+            return digest_cache[key]
+    digest = digest_file(path)
+    with digest_cache_lock:
+        digest_cache[key] = digest
+        if len(digest_cache) > config.HASH_CACHE_SIZE:
+            digest_cache.popitem(last=False)
+    return digest
+
+
+def digest_file(path):
+    """Read the file at path once in config.FILE_CHUNK_SIZE chunks,
+        returns sha256 of it and a list of crc32 of every chunk.
+    """
+    h = hashlib.sha256()
+    checksums = []
+    buffer = bytearray(config.FILE_CHUNK_SIZE)
+    view = memoryview(buffer)
+    with open(path, 'rb') as file:
+        while True:
+            size = file.readinto(buffer)
+            if not size:
+                break
+            h.update(view[:size])
+            checksums.append(zlib.crc32(view[:size]))
+    return h.hexdigest(), checksums
+
+
+def get_transfer_id(chat_name, sender_id, path, stat):
+    """Same file sent again in the same chat gets the same id, so that it can be resumed."""
+    key = '{}:{}:{}:{}:{}'.format(chat_name, sender_id, os.path.abspath(path),
+                                  stat.st_size, stat.st_mtime_ns)
+    return hashlib.sha1(key.encode()).hexdigest()[:TRANSFER_ID_LENGTH]
+
+
+def is_transfer_id(transfer_id):
+    """Whether transfer_id looks like one made by get_transfer_id(),
+        ids offered by other users are used in file names.
+    """
+    return isinstance(transfer_id, str) and len(transfer_id) == TRANSFER_ID_LENGTH and \
+        all(c in '0123456789abcdef' for c in transfer_id)
+
+
+def split_ranges(ranges, parts, align=1):
+    """Split [start, end) ranges into at most parts lists of ranges with about the same size.
+    If ranges start at multiples of align, so do the split ones.
+    """
+    share = -(-sum(end - start for start, end in ranges) // parts)
+    share = -(-share // align) * align
+    stripes, stripe, stripe_size = [], [], 0
+    for start, end in ranges:
+        while start < end:
+            size = min(end - start, share - stripe_size)
+            stripe.append([start, start + size])
+            stripe_size += size
+            start += size
+            if stripe_size == share:
+                stripes.append(stripe)
+                stripe, stripe_size = [], 0
+    if stripe:
+        stripes.append(stripe)
+    return stripes
+
+
+class PartialFile:
+    """An incoming image or file that is not completely received yet.
+    Stored in config.FILE_SAVE_FOLDER as two hidden files:
+        .ID.part: the content, allocated to its full size at the beginning (see utils.preallocate())
+        .ID.manifest: json of hash, checksums, size, message type, path (on sender) and
+            ranges, the sorted [start, end) ranges of the part file already received
+    Ranges are made of config.FILE_CHUNK_SIZE chunks, only chunks whose crc32 match
+        the sender's checksums are recorded, the others are missing and sent again.
+    Ranges may arrive at the same time from several connections,
+        the manifest is rewritten only after a range is written to the part file.
+    Member Variables:
+        transfer_id: id chosen by the sender, see get_transfer_id()
+        manifest: dict described above
+        outstanding: bytes the sender will send before it expects my next answer
+        transfer: Transfer to report progress of receiving
+        is_discarded: True if the transfer is cancelled and its files are removed
+    """
+
+    def __init__(self, transfer_id, folder=config.FILE_SAVE_FOLDER):
+        if not is_transfer_id(transfer_id):  # e.g. '../../x', would be outside folder
+            raise ValueError('bad transfer id {!r}'.format(transfer_id))
+        self.transfer_id = transfer_id
+        self.part_path = os.path.join(folder, '.{}.part'.format(transfer_id))
+        self.manifest_path = os.path.join(folder, '.{}.manifest'.format(transfer_id))
+        self.manifest = None
+        self.outstanding = 0
+        self.transfer = None
+        self.is_discarded = False
+        self.lock = Lock()
+
+    def load(self):
+        """Read the manifest, returns False if there isn't a usable one."""
+        try:
+            with open(self.manifest_path) as f:
+                self.manifest = json.load(f)
+        except (OSError, ValueError):
+            return False
+        return os.path.exists(self.part_path)
+
+    def start(self, content_hash, checksums, size, message_type, path):
+        """Prepare for receiving the offered content, returns the missing ranges.
+        Keep what we have only if it's the same content.
+        """
+        if self.load() and self.manifest['hash'] == content_hash and \
+                self.manifest['size'] == size and self.manifest.get('checksums') == checksums:
+            return self.expect(self.missing())
+        self.manifest = {'hash': content_hash, 'checksums': checksums, 'size': size,
+                         'type': message_type, 'path': path, 'ranges': []}
+        # the size comes from the other user, don't let an offer fill the disk
+        folder = os.path.dirname(self.part_path)
+        remove_stale_partials(folder)
+        if not 0 <= size <= config.FILE_MAX_SIZE or \
+                size + config.FILE_FREE_SPACE > shutil.disk_usage(folder).free:
+            raise NoRoomError('no room for {} bytes'.format(size))
+        utils.preallocate(self.part_path, size)
+        self.save()
+        return self.expect(self.missing())
+
+    def expect(self, missing):
+        """The sender will send missing ranges after my answer."""
+        self.outstanding = sum(end - start for start, end in missing)
+        return missing
+
+    def missing(self):
+        missing, position = [], 0
+        for start, end in self.manifest['ranges']:
+            if start > position:
+                missing.append([position, start])
+            position = end
+        if position < self.manifest['size']:
+            missing.append([position, self.manifest['size']])
+        return missing
+
+    @property
+    def received(self):
+        return sum(end - start for start, end in self.manifest['ranges'])
+
+    @property
+    def is_complete(self):
+        return not self.missing()
+
+    def receive(self, offset, count, received, checksums):
+        """Record a range of count bytes sent from offset, of which received bytes arrived
+            with checksums of every config.FILE_CHUNK_SIZE chunk of them.
+        Returns True if it's the last range the sender sends before my next answer.
+        """
+        size = self.manifest['size']
+        good = []
+        for i, checksum in enumerate(checksums):
+            start = offset + i * config.FILE_CHUNK_SIZE
+            end = min(start + config.FILE_CHUNK_SIZE, offset + received)
+            if end - start < min(config.FILE_CHUNK_SIZE, size - start) or \
+                    checksum != self.manifest['checksums'][start // config.FILE_CHUNK_SIZE]:
+                continue  # incomplete or corrupted
+            if good and good[-1][1] == start:
+                good[-1][1] = end
+            else:
+                good.append([start, end])
+        with self.lock:
+            if self.is_discarded:
+                return False
+            ranges = []
+            for range_start, range_end in sorted(self.manifest['ranges'] + good):
+                if ranges and range_start <= ranges[-1][1]:
+                    ranges[-1][1] = max(ranges[-1][1], range_end)
+                else:
+                    ranges.append([range_start, range_end])
+            self.manifest['ranges'] = ranges
+            self.save()
+            if received < count:  # connection broken, the sender will give up
+                return False
+            self.outstanding -= count
+            return self.outstanding == 0
+
+    def save(self):
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.manifest, f)
+        os.replace(tmp_path, self.manifest_path)
+
+    def finish(self, save_path):
+        """Move the complete content to save_path and forget the transfer."""
+        os.replace(self.part_path, save_path)
+        os.remove(self.manifest_path)
+
+    def discard(self):
+        """Remove the files of a cancelled transfer."""
+        with self.lock:
+            self.is_discarded = True
+            for path in (self.part_path, self.manifest_path):
+                try:
+                    os.remove(path)
+                except OSError:  # still open on Windows, or never written
+                    pass
+
+
+def remove_stale_partials(folder=config.FILE_SAVE_FOLDER, ttl=config.FILE_PARTIAL_TTL):
+    """Remove the files of partially received content not touched for ttl seconds,
+        e.g. of failed transfers never sent again, the id changes if the file is modified.
+    """
+    now = time.time()
+    try:
+        names = os.listdir(folder)
+    except OSError:
+        return
+    for name in names:
+        if not name.startswith('.') or not name.endswith(('.part', '.manifest', '.manifest.tmp')) \
+                or not is_transfer_id(name[1:1 + TRANSFER_ID_LENGTH]):
+            continue
+        path = os.path.join(folder, name)
+        try:
+            if now - os.stat(path).st_mtime > ttl:
+                os.remove(path)
+        except OSError:  # removed meanwhile, or still open on Windows
+            pass
+
+
+class ContentStore:
+    """Index of received images and files by their sha256,
+        so that content I already have is copied locally instead of sent again.
+    Stored in config.FILE_SAVE_FOLDER as hidden file .index.json:
+        {hash: [path, size, mtime]}, an entry is only trusted while
+        the file at path still has that size and mtime.
+    """
+
+    def __init__(self, folder=config.FILE_SAVE_FOLDER):
+        self.index_path = os.path.join(folder, '.index.json')
+        self.index = None
+        self.lock = Lock()
+
+    def load(self):
+        """Read the index at first use. Call with self.lock held."""
+        if self.index is not None:
+            return
+        try:
+            with open(self.index_path) as f:
+                self.index = json.load(f)
+        except (OSError, ValueError):
+            self.index = {}
+
+    def get(self, content_hash):
+        """Returns path of a file with content_hash, None if I don't have one."""
+        with self.lock:
+            self.load()
+            entry = self.index.get(content_hash)
+            if entry is None:
+                return None
+            path, size, mtime = entry
+            try:
+                stat = os.stat(path)
+            except OSError:
+                stat = None
+            if stat is None or stat.st_size != size or stat.st_mtime_ns != mtime:
+                del self.index[content_hash]  # deleted or modified
+                self.save()
+                return None
+            return path
+
+    def add(self, content_hash, path):
+        stat = os.stat(path)
+        with self.lock:
+            self.load()
+            self.index[content_hash] = [os.path.abspath(path), stat.st_size, stat.st_mtime_ns]
+            self.save()
+
+    def save(self):
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.index, f)
+        os.replace(tmp_path, self.index_path)
+
+    def copy(self, content_hash, save_path):
+        """Make save_path have the content, returns False if I don't have it."""
+        path = self.get(content_hash)
+        if path is None:
+            return False
+        if os.path.abspath(save_path) == path:
+            return True
+        if os.path.exists(save_path):
+            os.remove(save_path)
+        try:
+            os.link(path, save_path)  # no copy at all on the same file system
+        except OSError:
+            shutil.copyfile(path, save_path)
+        return True
+
+
+content_store = ContentStore()
+
+
+class Transfer:
+    """Progress of an image or file sent to or received from a user, shown by the UI.
+    Updated by the sending or receiving threads, reported by signal (with self)
+        at most every config.TRANSFER_REPORT_INTERVAL seconds, and when it ends.
+    Member Variables:
+        transfer_id: see get_transfer_id()
+        chat_name, user_id: the chat and the other user of the transfer
+        path: path of the image or file on the sender
+        is_sending: True if I'm the sender
+        size: bytes to transfer, only missing ranges (and those sent again) are counted
+        done: bytes transferred so far
+        state: 'running', 'done', 'failed' or 'cancelled'
+        throughput: bytes per second since the last report
+    """
+
+    def __init__(self, transfer_id, chat_name, user_id, path, is_sending, signal):
+        self.transfer_id = transfer_id
+        self.chat_name = chat_name
+        self.user_id = user_id
+        self.path = path
+        self.is_sending = is_sending
+        self.signal = signal
+
+        self.size = 0
+        self.done = 0
+        self.state = 'running'
+        self.is_finished = False
+        self.throughput = 0.
+        self.start_time = time.time()
+        self.report_time = self.start_time
+        self.report_done = 0
+        self.lock = Lock()
+
+    @property
+    def is_cancelled(self):
+        return self.state == 'cancelled'
+
+    @property
+    def average_throughput(self):
+        return self.done / max(time.time() - self.start_time, 1e-6)
+
+    @property
+    def eta(self):
+        """Seconds left, None if unknown."""
+        throughput = self.throughput or self.average_throughput
+        if not throughput:
+            return None
+        return max(self.size - self.done, 0) / throughput
+
+    def expect(self, size):
+        """size more bytes will be transferred."""
+        with self.lock:
+            self.size += size
+
+    def advance(self, size):
+        """size more bytes are transferred."""
+        with self.lock:
+            self.done += size
+        if self.state == 'running':
+            self.report()
+
+    def report(self, force=False):
+        now = time.time()
+        with self.lock:
+            if not force and now - self.report_time < config.TRANSFER_REPORT_INTERVAL:
+                return
+            self.throughput = (self.done - self.report_done) / max(now - self.report_time, 1e-6)
+            self.report_time, self.report_done = now, self.done
+        self.signal.emit(self)
+
+    def cancel(self):
+        """Stop, but it's only reported by finish()."""
+        with self.lock:
+            if self.state == 'running':
+                self.state = 'cancelled'
+
+    def finish(self, state):
+        """Report the end of the transfer once, state is ignored if it's cancelled."""
+        with self.lock:
+            if self.is_finished:
+                return
+            self.is_finished = True
+            if self.state == 'running':
+                self.state = state
+        self.report(force=True)
+
+    def describe(self):
+        """One line about the transfer for the UI."""
+        filename = os.path.basename(self.path.replace('\\', '/'))
+        action = 'Sending {} to {}'.format(filename, self.user_id) if self.is_sending else \
+            'Receiving {} from {}'.format(filename, self.user_id)
+        if self.state != 'running':
+            return '{}: {}, {:.1f} MB/s on average'.format(
+                action, self.state, self.average_throughput / 2 ** 20)
+        eta = self.eta
+        return '{}: {:.0f}% of {:.1f} MB, {:.1f} MB/s, {} left'.format(
+            action, 100 * min(self.done / self.size, 1) if self.size else 100,
+            self.size / 2 ** 20, self.throughput / 2 ** 20,
+            '?' if eta is None else '{:.0f} s'.format(eta))
@@ -0,0 +1,102 @@
+"""This file contains the worker pool handling received messages and connections."""
+
+import time
+import traceback
+from threading import Thread, Condition
+from collections import deque
+
+import config
+
+
+class WorkerPool:
+    """A fixed number of threads running tasks from a bounded queue,
+        instead of a new thread for every received message.
+    Tasks submitted with the same key (e.g. the chat of a message) run one at a time
+        in the order they are submitted, tasks with different keys run in parallel.
+    submit() blocks while limit tasks are waiting (backpressure), so the reactor
+        stops reading sockets and senders are slowed down by TCP instead of memory filling up.
+    Member Variables:
+        size: number of worker threads, started at the first submit()
+        limit: max tasks waiting
+        queues: {key: deque of (submit time, function, args)} of keys with tasks waiting or running
+        ready: keys with tasks waiting and none running, in the order to run them
+        queued: number of tasks waiting
+        waits, runs: seconds recent tasks waited in queue and ran, see stats()
+    """
+
+    def __init__(self, size=config.WORKER_THREADS, limit=config.WORKER_QUEUE_SIZE):
+        self.size = size
+        self.limit = limit
+
+        self.queues = {}
+        self.ready = deque()
+        self.queued = 0
+        self.max_queued = 0
+        self.completed = 0
+        self.waits = deque(maxlen=config.WORKER_LATENCY_SAMPLES)
+        self.runs = deque(maxlen=config.WORKER_LATENCY_SAMPLES)
+        self.condition = Condition()
+        self.threads = []
+
+    def submit(self, key, function, *args):
+        """Run function(*args) in a worker after the tasks submitted before with the same key,
+            key None for a task that doesn't need to wait for any other.
+        """
+        if key is None:
+            key = object()
+        with self.condition:
+            if not self.threads:
+                self.threads = [Thread(target=self.work, daemon=True) for _ in range(self.size)]
+                [t.start() for t in self.threads]
+            while self.queued >= self.limit:
+                self.condition.wait()
+            self.queued += 1
+            self.max_queued = max(self.max_queued, self.queued)
+            task = (time.perf_counter(), function, args)
+            if key in self.queues:  # picked up after the running or waiting ones
+                self.queues[key].append(task)
+            else:
+                self.queues[key] = deque([task])
+                self.ready.append(key)
+                self.condition.notify_all()
+
+    def work(self):
+        while True:
+            with self.condition:
+                while not self.ready:
+                    self.condition.wait()
+                key = self.ready.popleft()
+                submit_time, function, args = self.queues[key].popleft()
+                self.queued -= 1
+                self.condition.notify_all()  # room for submit()
+            start_time = time.perf_counter()
+            try:
+                function(*args)
+            except Exception:
+                traceback.print_exc()
+            end_time = time.perf_counter()
+            with self.condition:
+                self.waits.append(start_time - submit_time)
+                self.runs.append(end_time - start_time)
+                self.completed += 1
+                if self.queues[key]:  # next task of the key, after other keys waiting
+                    self.ready.append(key)
+                    self.condition.notify_all()
+                else:
+                    del self.queues[key]
+
+    def stats(self):
+        """Queue depth now and at most, and milliseconds recent tasks waited and ran."""
+        with self.condition:
+            waits, runs = sorted(self.waits), sorted(self.runs)
+            result = {'queued': self.queued, 'max_queued': self.max_queued,
+                      'completed': self.completed}
+        for name, samples in (('wait', waits), ('run', runs)):
+            for percent in (50, 99):
+                value = samples[min(len(samples) * percent // 100, len(samples) - 1)] if samples else 0.
+                result['{}_p{}_ms'.format(name, percent)] = value * 1000
+        return result
+
+
+# shared by all chats and MainWin
+workers = WorkerPool()
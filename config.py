@@ -1,81 +1,149 @@
-"""This file contains some common settings for the project."""
-
-import socket
-from pyaudio import paInt16
-
-# central server
-CENTRAL_SERVER_IP = '166.111.140.57'
-CENTRAL_SERVER_PORT = 8000
-
-# my info
-MY_ID = None  # '2017011527'
-MY_IP = None
-MY_CENTRAL_SERVER_IP = socket.gethostbyname(socket.gethostname())
-MY_CENTRAL_SERVER_PORT = 10000
-
-# hyper-parameters for the program
-GENERAL_PORT = 2333
-MAX_PACKAGE_SIZE = 1024
-UPDATE_STATUS_T = 5000  # T for update status timer
-INVALID_PORT = [3306, 5432, 6379, 8080, 8888, 9200, 27017, 22122]  # invalid port
-ID_LEN = 10
-ALL_EMOJI = [
-    '😀', '😁', '😂', '🤣', '😃', '😅', '😉',
-    '😎', '😍', '😘', '🤔', '🤐', '😶', '🙄',
-    '😥', '😪', '😣', '😴', '😒', '🙃', '😤',
-    '😭', '😨', '😱', '😡', '😷', '👻', '💩'
-]
-
-# about voice recoder
-VOICE_PORT = 2334
-VOICE_CHUNK = 256
-VOICE_FORMAT = paInt16
-VOICE_CHANNELS = 1
-VOICE_RATE = 16000
-MAX_RECORD_SECONDS = 1
-
-# baidu audio translation API
-API_KEY = 'kVcnfD9iW2XVZSMaLMrtLYIz'
-SECRET_KEY = 'O9o1O213UgG5LFn0bDGNtoRN3VWl2du6'
-CUID = '123456PYTHON'
-ASR_URL = 'http://vop.baidu.com/server_api'
-SCOPE = 'audio_voice_assistant_get'
-TOKEN_URL = 'http://openapi.baidu.com/oauth/2.0/token'
-
-# about video capturing
-VIDEO_PORT = 2335
-UPDATE_VIDEO_INTERVAL = 1000
-IDEAL_VIDEO_FREQUENCY = 10  # try to send video images in this frequency
-WORST_RESIZE_RATIO = 0.5
-
-# about path
-IMAGE_SAVE_FOLDER = './receive/imgs/'
-FILE_SAVE_FOLDER = './receive/files/'
-LOG_IN_WINDOW_BG = './src/btns/BGI_IT.jpg'
-MAIN_WINDOW_BG = './src/btns/BGI7.jpg'
-ICON_PATH = './src/icons/'
-EMOJI_PATH = './src/emoji/'
-VOICE_PATH = './src/voice/'
-VIDEO_PATH = './src/video/'
-
-# communication protocol
-"""
-For text, it's 'ChatName_ListeningPort_type_id_content_0_length'
-There are totally 9 types of message:
-    0: text, 1: image, 2: file,
-    3: private_chat_request, 4: group_chat_request,
-    5: private_chat_response, 6: group_chat_response,
-    7: friend_delete_chat, 8: friend_log_out
-    9: video_chat_request, 10: video_chat_response
-For text message: directly display them in messagesLW
-For image and file, they maybe quite large and can't be sent once.
-So we manually split it to several config.MAX_PACKAGE_SIZE bits packages and send them by:
-    1. send 'ChatName_ListeningPort_type_id_filename_FileSize'
-    2. iteratively send the split packages
-For chat request & response:
-    Once a request is required, everyone involved in the chat will
-        have a socket with other user(s).
-    Then, they keep those sockets in chat class and keep listening & sending
-        via them, which means I will only socket.connect() once!
-"""
-MESSAGE_TYPE = [0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10]
+"""This file contains some common settings for the project."""
+
+import socket
+from pyaudio import paInt16
+
+# central server
+CENTRAL_SERVER_IP = '166.111.140.57'
+CENTRAL_SERVER_PORT = 8000
+
+# my info
+MY_ID = None  # '2017011527'
+MY_IP = None
+MY_CENTRAL_SERVER_IP = socket.gethostbyname(socket.gethostname())
+MY_CENTRAL_SERVER_PORT = 10000
+MY_CENTRAL_SERVER_BACKLOG = 1024  # pending connections before login bursts get refused
+CENTRAL_SERVER_TIMEOUT = 5  # seconds to wait for a pipelined reply
+PRESENCE_PUSH_TIMEOUT = 1  # seconds a watcher may keep a presence push unread before it's dropped
+PRESENCE_PUSH_BUFFER = 1 << 20  # bytes of presence pushes unread by a watcher before it's dropped
+LOOKUP_CACHE_TTL = 3  # seconds to trust a searched ip & port
+LOOKUP_CACHE_NEGATIVE_TTL = 1  # seconds to trust an 'offline' answer
+LOOKUP_CACHE_SIZE = 4096  # max users in lookup cache
+REGISTRY_FSYNC_INTERVAL = 0.05  # seconds between two batched writes of the registry log
+REGISTRY_SNAPSHOT_RECORDS = 100000  # snapshot the registry after this many log records
+LEASE_TIME = 30  # seconds a log in stays valid without heartbeat
+LEASE_CHECK_INTERVAL = 1  # seconds between two checks of expired leases
+HEARTBEAT_T = 10000  # T for heartbeat timer, should be well below LEASE_TIME
+SHARED_REGISTRY_CAPACITY = 1 << 21  # max users of the multi-process central server
+SHARED_REGISTRY_SHARDS = 64  # each shard of the shared registry has its own lock
+SHARED_REGISTRY_MAX_DELETED = 1 / 8  # rebuild a shard when this part of its slots are deleted
+SHARED_WATCH_BUCKETS = 1 << 16  # buckets of user ids, each counting the watched ones per worker
+
+# hyper-parameters for the program
+GENERAL_PORT = 2333
+MAX_PACKAGE_SIZE = 1024
+FILE_CHUNK_SIZE = 1 << 20  # buffer size to receive files, or send them without os.sendfile
+# also the size of chunks with their own checksum, must be the same for sender and receiver
+FILE_RETRANSMIT_LIMIT = 3  # times to send chunks again that fail their checksum
+FILE_BULK_CHANNEL = True  # send images and files over data connections, False: via chat socket
+FILE_STREAMS = 4  # parallel data connections to send a large file
+FILE_STRIPE_THRESHOLD = 64 << 20  # bytes, smaller content is sent over one data connection
+FILE_FRAME_SIZE = 8 << 20  # ranges are sent in frames of at most this, cancel takes effect between them
+# a multiple of FILE_CHUNK_SIZE
+TRANSFER_REPORT_INTERVAL = 0.2  # seconds between two progress updates of a transfer on the UI
+CONTROL_MESSAGE_TYPES = [7, 8, 9, 10, 12, 15]  # sent on a chat socket before text and content
+SEND_COALESCE_SIZE = 64 << 10  # bytes of small messages waiting on a chat socket sent at once
+SEND_FLUSH_TIMEOUT = 5  # seconds a chat being killed waits for messages still to send
+SEND_THREADS = 4  # threads writing the outboxes of all chat sockets
+HASH_CACHE_SIZE = 1024  # files whose sha256 is remembered until they are modified
+CHAT_ENGINE = 'threads'  # 'threads': reactor and worker pool, 'asyncio': one event loop for all
+# chats (classes/aio_chat.py), for bots and tests with thousands of chats
+WORKER_THREADS = 8  # threads handling received messages and connections
+WORKER_QUEUE_SIZE = 1024  # received messages waiting for a worker, the reactor stops reading beyond
+WORKER_LATENCY_SAMPLES = 1000  # recent tasks whose wait and run time are kept for the metrics
+PEER_BACKLOG = 64  # pending connections to my listening port, data connections come in bursts
+FILE_TRANSFER_TIMEOUT = 30  # seconds to wait for the rest of a file before giving up
+FILE_MAX_SIZE = 8 << 30  # bytes, larger images or files offered by other users are refused
+FILE_FREE_SPACE = 1 << 30  # bytes of disk left free when space is allocated for an offer
+FILE_PARTIAL_TTL = 7 * 24 * 3600  # seconds before partial content nobody resumes is removed
+HANDSHAKE_TIMEOUT = 5  # seconds to wait for each read of the first message of a connection
+MESSAGE_CODEC = 'text'  # 'text' or 'binary' for sending, both can be received
+UPDATE_STATUS_T = 5000  # T for update status timer
+INVALID_PORT = [3306, 5432, 6379, 8080, 8888, 9200, 27017, 22122]  # invalid port
+ID_LEN = 10
+ALL_EMOJI = [
+    '😀', '😁', '😂', '🤣', '😃', '😅', '😉',
+    '😎', '😍', '😘', '🤔', '🤐', '😶', '🙄',
+    '😥', '😪', '😣', '😴', '😒', '🙃', '😤',
+    '😭', '😨', '😱', '😡', '😷', '👻', '💩'
+]
+
+# about voice recoder
+VOICE_PORT = 2334
+VOICE_CHUNK = 256
+VOICE_FORMAT = paInt16
+VOICE_CHANNELS = 1
+VOICE_RATE = 16000
+MAX_RECORD_SECONDS = 1
+
+# baidu audio translation API
+API_KEY = 'kVcnfD9iW2XVZSMaLMrtLYIz'
+SECRET_KEY = 'O9o1O213UgG5LFn0bDGNtoRN3VWl2du6'
+CUID = '123456PYTHON'
+ASR_URL = 'http://vop.baidu.com/server_api'
+SCOPE = 'audio_voice_assistant_get'
+TOKEN_URL = 'http://openapi.baidu.com/oauth/2.0/token'
+
+# about video capturing
+VIDEO_PORT = 2335
+UPDATE_VIDEO_INTERVAL = 1000
+IDEAL_VIDEO_FREQUENCY = 10  # try to send video images in this frequency
+WORST_RESIZE_RATIO = 0.5
+
+# about path
+IMAGE_SAVE_FOLDER = './receive/imgs/'
+FILE_SAVE_FOLDER = './receive/files/'
+LOG_IN_WINDOW_BG = './src/btns/BGI_IT.jpg'
+MAIN_WINDOW_BG = './src/btns/BGI7.jpg'
+ICON_PATH = './src/icons/'
+EMOJI_PATH = './src/emoji/'
+VOICE_PATH = './src/voice/'
+VIDEO_PATH = './src/video/'
+
+# communication protocol
+"""
+For text, it's 'ChatName_ListeningPort_type_id_content_0_length'
+There are totally 9 types of message:
+    0: text, 1: image, 2: file,
+    3: private_chat_request, 4: group_chat_request,
+    5: private_chat_response, 6: group_chat_response,
+    7: friend_delete_chat, 8: friend_log_out
+    9: video_chat_request, 10: video_chat_response
+    11: file_offer, 12: file_answer, 13: file_content, 14: file_stream, 15: file_cancel
+With config.MESSAGE_CODEC = 'binary', the header is packed by struct instead (see utils.BINARY_HEADER):
+    magic 0xB7, version, type, ListeningPort, id, length of ChatName, length; then ChatName and content
+    It's faster to parse and ChatName may contain '_'. Receivers accept both codecs,
+    so old and new clients can talk as long as the sender uses the text codec.
+For text message: directly display them in messagesLW
+For image and file, they maybe quite large and can't be sent once.
+So we send them by:
+    1. send file_offer 'ChatName_ListeningPort_11_id_{"id", "hash", "checksums", "type", "path"}_FileSize',
+        id is the same every time the same file is sent in the chat (see classes.transfer),
+        checksums are crc32 of every config.FILE_CHUNK_SIZE chunk
+    2. the receiver answers '..._12_id_{"id", "missing"}_0', missing is a list of
+        [start, end) ranges of the content with that hash it doesn't have yet
+        (partially received content is kept in FILE_SAVE_FOLDER),
+        or none if it has received the same content before (see classes.transfer.ContentStore)
+    3. for every missing range, send '..._13_id_{"id", "offset"}_Count'
+        and then exactly Count bytes of the file from offset (by os.sendfile if possible),
+        the receiver reads them into a config.FILE_CHUNK_SIZE buffer.
+        A range is split into frames of at most config.FILE_FRAME_SIZE bytes, each with its header
+    3'. in fact (with config.FILE_BULK_CHANNEL) the ranges are sent as in 3. but with
+        type 14 (file_stream) over a new connection to the receiver's listening port,
+        so that text and control messages on the chat socket don't wait behind them.
+        If missing ranges add up to FILE_STRIPE_THRESHOLD, they are split into
+        FILE_STREAMS stripes, each over its own connection
+    4. after receiving all missing ranges, the receiver answers again as in 2.
+        with the chunks whose crc32 doesn't match, then go back to 3. for them
+    So a transfer broken halfway continues from where it stopped when sent again.
+    Either side may cancel a transfer by '..._15_id_{"id"}_0' on the chat socket,
+        the sender stops after the frame it's sending, the receiver removes what it has received.
+    Type 1 and 2 'ChatName_ListeningPort_type_id_filename_FileSize' followed by
+        the whole file are still received from old clients.
+For chat request & response:
+    Once a request is required, everyone involved in the chat will
+        have a socket with other user(s).
+    Then, they keep those sockets in chat class and keep listening & sending
+        via them, which means I will only socket.connect() once!
+"""
+MESSAGE_TYPE = [0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15]
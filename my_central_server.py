@@ -1,94 +1,546 @@
-"""This class is my implemented central server.
-Every time a user log in, it needs to report the ip & port to this server.
-Also user can query other user's ip & port here.
-So it's more convenient for single PC debug.
-"""
-
-import socket
-import time
-from threading import Thread
-
-import utils
-import config
-
-
-class CommandError(Exception):
-    pass
-
-
-class MyCentralServer(Thread):
-    """
-    My implemented central server.
-        log in command: UserID_net2019_ListeningPort
-        query command: q_UserID
-        log out command: logoutUserID
-    """
-
-    def __init__(self, listen_port):
-        super(MyCentralServer, self).__init__()
-
-        self.setDaemon(True)
-        self.listen_port = listen_port
-        self.sock = None
-        self.all_users = {}
-
-    def run(self):
-        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.sock.bind(('', self.listen_port))
-        self.sock.listen(1)
-
-        # listen to user
-        while True:
-            sock, address = self.sock.accept()
-            t = Thread(target=self.handle_request,
-                       args=(sock, address), daemon=True)
-            t.start()
-
-    def handle_request(self, sock, address):
-        """Response to query."""
-        ip, _ = address
-        while True:
-            command = sock.recv(config.MAX_PACKAGE_SIZE).decode()
-            try:
-                if command.startswith('20'):  # log in command
-                    idx1 = command.index('_')
-                    idx2 = command.rindex('_')
-                    if idx1 == idx2:
-                        raise CommandError
-                    user_id = command[:idx1]
-                    psw = command[idx1 + 1:idx2]
-                    port = int(command[idx2 + 1:])
-                    if psw != 'net2019' or not utils.is_valid_id(user_id) or \
-                            not utils.is_valid_port(port):
-                        raise CommandError
-                    self.all_users[user_id] = {'ip': ip, 'port': port}
-                    sock.send('lol'.encode())
-                elif command.startswith('q'):  # query command
-                    user_id = command[1:]
-                    if not utils.is_valid_id(user_id) or user_id not in self.all_users.keys():
-                        sock.send('n'.encode())
-                        continue
-                    sock.send('{}_{}'.format(
-                        self.all_users[user_id]['ip'], self.all_users[user_id]['port']).encode())
-                elif command.startswith('logout'):  # log out command
-                    user_id = command[6:]
-                    if not utils.is_valid_id(user_id):
-                        raise CommandError
-                    del self.all_users[user_id]
-                    sock.send('loo'.encode())
-                    return
-                else:
-                    raise CommandError
-            except CommandError:
-                self.return_error(sock)
-
-    @staticmethod
-    def return_error(sock):
-        sock.send('Invalid Command!'.encode())
-
-
-if __name__ == '__main__':
-    server = MyCentralServer(config.MY_CENTRAL_SERVER_PORT)
-    server.start()
-    while True:
-        time.sleep(1)
+"""This class is my implemented central server.
+Every time a user log in, it needs to report the ip & port to this server.
+Also user can query other user's ip & port here.
+So it's more convenient for single PC debug.
+"""
+
+import time
+import heapq
+import socket
+import asyncio
+import selectors
+import argparse
+import multiprocessing
+from threading import Thread, Lock
+
+import utils
+import config
+from registry_log import RegistryLog
+from shared_registry import SharedRegistry, WatchTable
+
+
+class CommandError(Exception):
+    pass
+
+
+class MyCentralServer(Thread):
+    """
+    My implemented central server.
+        log in command: UserID_net2019_ListeningPort
+        query command: qUserID
+        multi-query command: mUserID1,UserID2,... (replies 'ip_port' or 'n' for each, joined by ',')
+        log out command: logoutUserID
+        watch command: wUserID1,UserID2,... (replies 'ok')
+        unwatch command: uUserID1,UserID2,... (replies 'ok')
+        heartbeat command: hUserID (replies 'hb', or 'n' if not logged in any more)
+        stats command: s (replies 'active_renewed_expired' counts of leases)
+    Commands may also be prefixed with a 4-byte length like utils.send_msg,
+        then the reply is length-prefixed too. Long commands such as
+        multi-query should be sent this way.
+    A length-prefixed command can be tagged with a request id as '#RequestID_Command',
+        then the reply is tagged as '#RequestID_Reply', so clients may
+        pipeline many commands and match the replies in any order.
+    After watching some users, the connection gets length-prefixed pushes
+        'pUserID_ip_port' or 'pUserID_n' (several ones joined by ',')
+        first for their current states, then whenever they log in,
+        change ip/port or log out.
+    Every client connection is served by its own thread.
+    If data_folder is given, logged in users are persisted there by RegistryLog
+        and restored when the server restarts.
+    Every log in holds a lease of config.LEASE_TIME seconds, which is renewed
+        by heartbeat. Users that stop renewing (e.g. crashed) are logged out
+        automatically. Leases are kept in a heap ordered by expire time,
+        so checking them never scans all the users.
+    """
+
+    def __init__(self, listen_port, data_folder=None):
+        super(MyCentralServer, self).__init__()
+
+        self.setDaemon(True)
+        self.listen_port = listen_port
+        self.sock = None
+        self.all_users = {}
+
+        # persistence
+        self.registry_log = None
+        if data_folder is not None:
+            self.registry_log = RegistryLog(data_folder)
+            self.all_users = self.registry_log.load()
+            self.registry_log.start()
+
+        # presence subscriptions, an inverted index from watched user to connections
+        self.watchers = {}
+        self.watchers_lock = Lock()
+
+        # leases, a restored user gets a whole lease to come back and renew it
+        self.leases = {}  # user_id: expire time
+        self.lease_heap = []  # (expire time, user_id), stale ones are skipped when popped
+        self.lease_lock = Lock()  # for leases, lease_heap and the counters below
+        self.renewed_leases = 0
+        self.expired_leases = 0
+        for user_id in self.all_users.keys():
+            self.grant_lease(user_id)
+
+    def run(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind(('', self.listen_port))
+        self.sock.listen(config.MY_CENTRAL_SERVER_BACKLOG)
+
+        t = Thread(target=self.check_leases, daemon=True)
+        t.start()
+
+        # listen to user
+        while True:
+            sock, address = self.sock.accept()
+            t = Thread(target=self.handle_request,
+                       args=(sock, address), daemon=True)
+            t.start()
+
+    def handle_request(self, sock, address):
+        """Response to query."""
+        ip, _ = address
+        conn = ClientConnection(sock, ip)
+        while True:
+            try:
+                data = sock.recv(config.MAX_PACKAGE_SIZE)
+            except ConnectionResetError:
+                break
+            if not data:  # client closes the connection
+                break
+            try:
+                keep_alive = self.handle_data(conn, data)
+            except (ConnectionResetError, BrokenPipeError):
+                break
+            if not keep_alive:
+                break
+        self.remove_watcher(conn)
+        conn.close()
+
+    def handle_data(self, conn, data):
+        """Handle bytes received from conn and send back the replies.
+        A plain command takes a whole recv, while commands prefixed with
+            a 4-byte length (see utils.send_msg) get length-prefixed replies.
+        Returns False if the connection should be closed.
+        """
+        conn.buffer += data
+        if conn.buffer[:1] != b'\x00':  # plain command
+            commands, conn.buffer = [conn.buffer], b''
+            is_framed = False
+        else:
+            commands, conn.buffer = utils.split_msgs(conn.buffer)
+            is_framed = True
+        for command in commands:
+            command = command.decode(errors='replace')
+            tag = ''
+            if is_framed and command.startswith('#'):  # request id tagged command
+                idx = command.find('_')
+                tag, command = command[:idx + 1], command[idx + 1:]
+            reply, keep_alive = self.handle_command(command, conn)
+            reply = (tag + reply).encode()
+            conn.write(utils.pack_msg(reply) if is_framed else reply)
+            if command.startswith('w'):  # send current states after the reply
+                self.push_presence(conn, command[1:].split(','))
+            if not keep_alive:
+                return False
+        return True
+
+    def handle_command(self, command, conn):
+        """Execute one command sent from conn.
+        Returns the reply and whether to keep serving the connection.
+        """
+        try:
+            if command.startswith('20'):  # log in command
+                idx1 = command.index('_')
+                idx2 = command.rindex('_')
+                if idx1 == idx2:
+                    raise CommandError
+                user_id = command[:idx1]
+                psw = command[idx1 + 1:idx2]
+                port = command[idx2 + 1:]
+                if psw != 'net2019' or not utils.is_valid_id(user_id) or \
+                        not utils.is_number(port) or not utils.is_valid_port(int(port)):
+                    raise CommandError
+                self.log_in_user(user_id, conn.ip, int(port))
+                return 'lol', True
+            elif command.startswith('q'):  # query command
+                return self.query_user(command[1:]), True
+            elif command.startswith('m'):  # multi-query command
+                return ','.join(self.query_user(user_id)
+                                for user_id in command[1:].split(',')), True
+            elif command.startswith('logout'):  # log out command
+                user_id = command[6:]
+                if not utils.is_valid_id(user_id):
+                    raise CommandError
+                self.log_out_user(user_id)
+                return 'loo', False
+            elif command.startswith('w'):  # watch command
+                self.add_watcher(conn, command[1:].split(','))
+                return 'ok', True
+            elif command.startswith('u'):  # unwatch command
+                self.remove_watcher(conn, command[1:].split(','))
+                return 'ok', True
+            elif command.startswith('h'):  # heartbeat command
+                return ('hb' if self.renew_lease(command[1:]) else 'n'), True
+            elif command == 's':  # stats command
+                with self.lease_lock:
+                    return '{}_{}_{}'.format(len(self.leases), self.renewed_leases,
+                                             self.expired_leases), True
+            else:
+                raise CommandError
+        except (CommandError, ValueError):
+            return self.return_error(), True
+
+    def log_in_user(self, user_id, ip, port):
+        new_info = {'ip': ip, 'port': port}
+        old_info = self.all_users.get(user_id)
+        self.all_users[user_id] = new_info
+        self.grant_lease(user_id)
+        if old_info != new_info:
+            if self.registry_log is not None:
+                self.registry_log.log_in(user_id, ip, port)
+            self.notify_watchers(user_id)
+
+    def log_out_user(self, user_id):
+        with self.lease_lock:
+            self.leases.pop(user_id, None)
+        if self.all_users.pop(user_id, None) is not None:
+            if self.registry_log is not None:
+                self.registry_log.log_out(user_id)
+            self.notify_watchers(user_id)
+
+    def grant_lease(self, user_id, renew=False):
+        """Give the user a whole lease, if renew only if it holds one (returns False if not)."""
+        expire_time = time.monotonic() + config.LEASE_TIME
+        with self.lease_lock:
+            if renew:
+                if user_id not in self.leases:
+                    return False
+                self.renewed_leases += 1
+            self.leases[user_id] = expire_time
+            heapq.heappush(self.lease_heap, (expire_time, user_id))
+        return True
+
+    def renew_lease(self, user_id):
+        """Returns False if the user doesn't hold a lease."""
+        return self.grant_lease(user_id, renew=True)
+
+    def expire_leases(self):
+        """Log out users whose leases are expired, only looks at the heap top."""
+        now = time.monotonic()
+        expired = []
+        with self.lease_lock:
+            while self.lease_heap and self.lease_heap[0][0] <= now:
+                expire_time, user_id = heapq.heappop(self.lease_heap)
+                if self.leases.get(user_id) == expire_time:  # not renewed since then
+                    expired.append(user_id)
+        for user_id in expired:
+            self.lease_expired(user_id)
+
+    def lease_expired(self, user_id):
+        with self.lease_lock:
+            self.expired_leases += 1
+        self.log_out_user(user_id)
+
+    def check_leases(self):
+        while True:
+            time.sleep(config.LEASE_CHECK_INTERVAL)
+            self.expire_leases()
+
+    def query_user(self, user_id):
+        """Returns 'ip_port' of an online user, otherwise 'n'."""
+        if not utils.is_valid_id(user_id):
+            return 'n'
+        info = self.all_users.get(user_id)
+        if info is None:
+            return 'n'
+        return '{}_{}'.format(info['ip'], info['port'])
+
+    def add_watcher(self, conn, user_ids):
+        """Let conn receive presence changes of user_ids."""
+        user_ids = [user_id for user_id in user_ids if utils.is_valid_id(user_id)]
+        with self.watchers_lock:
+            for user_id in user_ids:
+                if user_id not in self.watchers:
+                    self.watchers[user_id] = set()
+                    self.watch_started(user_id)
+                self.watchers[user_id].add(conn)
+            conn.watching.update(user_ids)
+
+    def remove_watcher(self, conn, user_ids=None):
+        """Stop pushing presence changes of user_ids (all watched users if None) to conn."""
+        with self.watchers_lock:
+            user_ids = list(conn.watching) if user_ids is None else user_ids
+            for user_id in user_ids:
+                watchers = self.watchers.get(user_id)
+                if watchers is None:
+                    continue
+                watchers.discard(conn)
+                if not watchers:
+                    del self.watchers[user_id]
+                    self.watch_ended(user_id)
+                conn.watching.discard(user_id)
+
+    def watch_started(self, user_id):
+        """user_id got its first watcher, called with self.watchers_lock held."""
+        pass
+
+    def watch_ended(self, user_id):
+        """user_id lost its last watcher, called with self.watchers_lock held."""
+        pass
+
+    def notify_watchers(self, user_id):
+        """Push the presence of user_id to its watchers only."""
+        with self.watchers_lock:
+            watchers = list(self.watchers.get(user_id, ()))
+        for conn in watchers:
+            self.push_presence(conn, [user_id])
+
+    def push_presence(self, conn, user_ids):
+        """Push the current states of user_ids to conn."""
+        user_ids = [user_id for user_id in user_ids if user_id in conn.watching]
+        if not user_ids:
+            return
+        message = 'p' + ','.join('{}_{}'.format(user_id, self.query_user(user_id))
+                                 for user_id in user_ids)
+        try:
+            conn.push(utils.pack_msg(message.encode()))
+        except OSError:  # gone, or stopped reading and must not hold up the users it watches
+            self.remove_watcher(conn)
+            conn.close()  # its presence subscriber finds out and subscribes again
+
+    @staticmethod
+    def return_error():
+        return 'Invalid Command!'
+
+
+class ClientConnection:
+    """One client connection of MyCentralServer, served by its own thread."""
+
+    def __init__(self, sock, ip):
+        self.sock = sock
+        self.ip = ip
+        self.buffer = b''  # received bytes of unfinished length-prefixed commands
+        self.watching = set()  # users whose presence changes are pushed here
+        self.write_lock = Lock()  # pushes come from other clients' threads
+
+    def write(self, data):
+        with self.write_lock:
+            self.sock.sendall(data)
+
+    def push(self, data):
+        """Write a presence push from another client's thread, raise TimeoutError if
+            it can't be written in config.PRESENCE_PUSH_TIMEOUT, e.g. the client stopped reading.
+        Without MSG_DONTWAIT (Windows) it may block like write().
+        """
+        deadline = time.monotonic() + config.PRESENCE_PUSH_TIMEOUT
+        if not self.write_lock.acquire(timeout=config.PRESENCE_PUSH_TIMEOUT):
+            raise TimeoutError('watcher not reading')
+        try:
+            data = memoryview(data)
+            while data:
+                try:
+                    data = data[self.sock.send(data, getattr(socket, 'MSG_DONTWAIT', 0)):]
+                except BlockingIOError:
+                    if not utils.wait_for(self.sock, selectors.EVENT_WRITE,
+                                          max(0, deadline - time.monotonic())):
+                        raise TimeoutError('watcher not reading')
+        finally:
+            self.write_lock.release()
+
+    def close(self):
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)  # wakes up its handler thread
+        except OSError:
+            pass
+        self.sock.close()
+
+
+class CentralServerProtocol(asyncio.Protocol):
+    """One client connection of MyAsyncCentralServer."""
+
+    def __init__(self, server):
+        self.server = server
+        self.transport = None
+        self.ip = None
+        self.buffer = b''  # received bytes of unfinished length-prefixed commands
+        self.watching = set()  # users whose presence changes are pushed here
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.ip = transport.get_extra_info('peername')[0]
+
+    def connection_lost(self, exc):
+        self.server.remove_watcher(self)
+
+    def data_received(self, data):
+        if not self.server.handle_data(self, data):
+            self.close()
+
+    def write(self, data):
+        self.transport.write(data)
+
+    def push(self, data):
+        """Write a presence push, raise ConnectionError if the client has left more than
+            config.PRESENCE_PUSH_BUFFER bytes unread, instead of buffering for it forever.
+        """
+        if self.transport.get_write_buffer_size() > config.PRESENCE_PUSH_BUFFER:
+            raise ConnectionError('watcher not reading')
+        self.transport.write(data)
+
+    def close(self):
+        self.transport.close()
+
+
+class MyAsyncCentralServer(MyCentralServer):
+    """Event-loop version of MyCentralServer, speaking exactly the same protocol.
+    All the connections are served by a single asyncio loop (in this thread),
+        so idle clients only cost a socket and a small protocol object
+        instead of a thread and its stack.
+    """
+
+    def __init__(self, listen_port, data_folder=None):
+        super(MyAsyncCentralServer, self).__init__(listen_port, data_folder)
+
+        self.loop = None
+        self.server = None
+
+    def run(self):
+        raise_fd_limit()
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_until_complete(self.serve())
+
+    def check_leases(self):
+        """Expire leases on the loop, then check again later."""
+        self.expire_leases()
+        self.loop.call_later(config.LEASE_CHECK_INTERVAL, self.check_leases)
+
+    async def serve(self):
+        self.loop.call_later(config.LEASE_CHECK_INTERVAL, self.check_leases)
+        self.server = await self.loop.create_server(
+            lambda: CentralServerProtocol(self), port=self.listen_port,
+            backlog=config.MY_CENTRAL_SERVER_BACKLOG, reuse_address=True)
+        async with self.server:
+            await self.server.serve_forever()
+
+
+class MyShardedCentralServer(MyAsyncCentralServer):
+    """One of the worker processes of a multi-core central server.
+    All workers accept on the same port (SO_REUSEPORT, Linux only) and share
+        the user registry (a SharedRegistry sharded by user id hash),
+        so any worker can answer queries of users logged in via others.
+    Leases and watchers stay in the worker holding the connection,
+        presence changes are forwarded via queues to the other workers watching the user
+        (see WatchTable), most log ins and outs aren't watched anywhere else.
+    """
+
+    def __init__(self, listen_port, worker_id, registry, queues, watch_table):
+        super(MyShardedCentralServer, self).__init__(listen_port)
+
+        self.worker_id = worker_id
+        self.all_users = registry
+        self.queues = queues  # queues[i]: user ids whose presence changed, for worker i
+        self.watch_table = watch_table
+
+    def run(self):
+        t = Thread(target=self.receive_changes, daemon=True)
+        t.start()
+        super(MyShardedCentralServer, self).run()
+
+    async def serve(self):
+        self.loop.call_later(config.LEASE_CHECK_INTERVAL, self.check_leases)
+        self.server = await self.loop.create_server(
+            lambda: CentralServerProtocol(self), port=self.listen_port,
+            backlog=config.MY_CENTRAL_SERVER_BACKLOG, reuse_address=True, reuse_port=True)
+        async with self.server:
+            await self.server.serve_forever()
+
+    def notify_watchers(self, user_id):
+        """Notify my watchers and let other workers watching user_id notify theirs."""
+        super(MyShardedCentralServer, self).notify_watchers(user_id)
+        for i, queue in enumerate(self.queues):
+            if i != self.worker_id and self.watch_table.is_watched(user_id, i):
+                queue.put(user_id)
+
+    def watch_started(self, user_id):
+        self.watch_table.add(user_id, self.worker_id, 1)
+
+    def watch_ended(self, user_id):
+        self.watch_table.add(user_id, self.worker_id, -1)
+
+    def receive_changes(self):
+        """Notify my watchers about presence changes made by other workers."""
+        while True:
+            user_id = self.queues[self.worker_id].get()
+            while self.loop is None or not self.loop.is_running():
+                time.sleep(0.1)
+            self.loop.call_soon_threadsafe(
+                super(MyShardedCentralServer, self).notify_watchers, user_id)
+
+    def lease_expired(self, user_id):
+        """The user may have logged in again via another worker, which holds the valid lease."""
+        if self.all_users.owner(user_id) == self.worker_id:
+            super(MyShardedCentralServer, self).lease_expired(user_id)
+
+
+def run_worker(worker_id, listen_port, registry, queues, watch_table):
+    registry.worker_id = worker_id
+    server = MyShardedCentralServer(listen_port, worker_id, registry, queues, watch_table)
+    server.run()
+
+
+def run_workers(workers, listen_port):
+    """Run a central server with several worker processes, returns them."""
+    context = multiprocessing.get_context('fork')  # registry memory is inherited by fork
+    registry = SharedRegistry()
+    watch_table = WatchTable(workers)
+    # put() of a Queue doesn't block the loop of the worker, a feeder thread writes the pipe
+    queues = [context.Queue() for _ in range(workers)]
+    processes = [context.Process(target=run_worker,
+                                 args=(i, listen_port, registry, queues, watch_table),
+                                 daemon=True) for i in range(workers)]
+    for process in processes:
+        process.start()
+    return processes
+
+
+def raise_fd_limit():
+    """Every connection holds a file descriptor, so use the hard limit if possible."""
+    try:
+        import resource
+    except ImportError:  # not available on Windows
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='My implemented central server.')
+    parser.add_argument('--mode', choices=['thread', 'async'], default='thread',
+                        help='one thread per client, or a single asyncio event loop')
+    parser.add_argument('--port', type=int, default=config.MY_CENTRAL_SERVER_PORT)
+    parser.add_argument('--data-folder', default=None,
+                        help='persist logged in users in this folder, not persisted if omitted')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='run this many async mode worker processes sharing the port (Linux only)')
+    args = parser.parse_args()
+    if args.workers > 1 and args.data_folder is not None:
+        parser.error('--data-folder only works with a single worker')
+    return args
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    if args.workers > 1:
+        run_workers(args.workers, args.port)
+    else:
+        if args.mode == 'async':
+            server = MyAsyncCentralServer(args.port, args.data_folder)
+        else:
+            server = MyCentralServer(args.port, args.data_folder)
+        server.start()
+    print('central server running')
+    while True:
+        time.sleep(1)
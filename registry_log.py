@@ -0,0 +1,143 @@
+"""This file contains the persistence of my central server's user registry,
+so that logged in users survive a server restart.
+"""
+
+import os
+import time
+from threading import Thread, Lock
+
+import config
+
+
+class RegistryLog(Thread):
+    """Append-only log plus periodic snapshot of MyCentralServer.all_users.
+    Log in and log out only append a record in memory, this thread writes and fsyncs
+        the records in batches every config.REGISTRY_FSYNC_INTERVAL seconds,
+        so the disk never slows down a log in (at the cost of losing that
+        short window of records if the machine crashes).
+    Files in the folder:
+        snapshot: first line is its generation G, then one 'UserID ip port' per user
+        log.G, log.G+1, ...: '+UserID ip port' or '-UserID' records after the snapshot
+    Replaying the snapshot then all logs of generation >= G rebuilds the registry,
+        records are idempotent so a crash at any point of snapshotting is fine.
+    """
+
+    def __init__(self, folder, snapshot_records=config.REGISTRY_SNAPSHOT_RECORDS):
+        super(RegistryLog, self).__init__()
+
+        self.setDaemon(True)
+        self.folder = folder
+        self.snapshot_records = snapshot_records
+
+        self.generation = 0
+        self.log_file = None
+        self.pending = []  # records waiting for the next batch
+        self.records_since_snapshot = 0
+        self.lock = Lock()
+        self.all_users = None  # the registry to snapshot, set by load()
+
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+
+    def load(self):
+        """Replay snapshot and logs, returns the registry dict
+        which should be used (and updated) by the server from now on.
+        """
+        all_users = {}
+        snapshot_path = os.path.join(self.folder, 'snapshot')
+        if os.path.exists(snapshot_path):
+            with open(snapshot_path, 'rb') as f:
+                lines = f.read().decode().split('\n')
+            self.generation = int(lines[0])
+            for line in lines[1:]:
+                fields = line.split(' ')
+                if len(fields) == 3:
+                    all_users[fields[0]] = {'ip': fields[1], 'port': int(fields[2])}
+
+        for generation in self.log_generations():
+            if generation < self.generation:  # already in snapshot
+                continue
+            with open(self.log_path(generation), 'rb') as f:
+                lines = f.read().decode(errors='replace').split('\n')
+            for line in lines:
+                self.replay(all_users, line)
+            self.records_since_snapshot += len(lines)
+            self.generation = generation
+
+        self.log_file = open(self.log_path(self.generation), 'ab')
+        self.all_users = all_users
+        return all_users
+
+    @staticmethod
+    def replay(all_users, line):
+        fields = line.split(' ')
+        try:
+            if line.startswith('+') and len(fields) == 3:
+                all_users[fields[0][1:]] = {'ip': fields[1], 'port': int(fields[2])}
+            elif line.startswith('-'):
+                all_users.pop(line[1:], None)
+        except ValueError:  # a record torn by crash
+            pass
+
+    def log_generations(self):
+        generations = []
+        for filename in os.listdir(self.folder):
+            if filename.startswith('log.') and filename[4:].isdigit():
+                generations.append(int(filename[4:]))
+        return sorted(generations)
+
+    def log_path(self, generation):
+        return os.path.join(self.folder, 'log.{}'.format(generation))
+
+    def log_in(self, user_id, ip, port):
+        with self.lock:
+            self.pending.append('+{} {} {}\n'.format(user_id, ip, port))
+
+    def log_out(self, user_id):
+        with self.lock:
+            self.pending.append('-{}\n'.format(user_id))
+
+    def run(self):
+        while True:
+            time.sleep(config.REGISTRY_FSYNC_INTERVAL)
+            self.flush()
+            if self.records_since_snapshot >= self.snapshot_records:
+                self.snapshot()
+
+    def flush(self):
+        """Write and fsync all pending records as one batch."""
+        with self.lock:
+            pending, self.pending = self.pending, []
+            log_file = self.log_file
+        if not pending:
+            return
+        log_file.write(''.join(pending).encode())
+        log_file.flush()
+        os.fsync(log_file.fileno())
+        self.records_since_snapshot += len(pending)
+
+    def snapshot(self):
+        """Write the whole registry to snapshot, then drop the logs it covers.
+        Called by this thread only.
+        """
+        self.flush()
+        with self.lock:
+            # later records go to the new log, a copy is consistent enough since replay is idempotent
+            old_generation = self.generation
+            self.generation += 1
+            old_log_file, self.log_file = self.log_file, open(self.log_path(self.generation), 'ab')
+            all_users = self.all_users.copy()
+            self.records_since_snapshot = 0
+        old_log_file.close()
+
+        tmp_path = os.path.join(self.folder, 'snapshot.tmp')
+        with open(tmp_path, 'wb') as f:
+            f.write('{}\n'.format(self.generation).encode())
+            f.write(''.join('{} {} {}\n'.format(user_id, info['ip'], info['port'])
+                            for user_id, info in all_users.items()).encode())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, os.path.join(self.folder, 'snapshot'))
+        for generation in self.log_generations():
+            if generation <= old_generation:
+                os.remove(self.log_path(generation))
@@ -0,0 +1,208 @@
+"""This file contains a user registry shared by the worker processes of my central server."""
+
+import mmap
+import zlib
+import socket
+import struct
+import multiprocessing
+
+import config
+
+SLOT = struct.Struct('>B10s16sHB')  # state, user_id, ip (IPv6 or IPv4-mapped), port, owner worker
+EMPTY, USED, DELETED = 0, 1, 2
+COUNT = struct.Struct('>I')  # deleted slots of a shard
+IPV4_MAPPED_PREFIX = b'\x00' * 10 + b'\xff' * 2
+
+
+class RegistryFullError(ValueError):
+    pass
+
+
+class SharedRegistry:
+    """A dict-like table of user_id: {'ip': ip, 'port': port} in shared memory.
+    Create it before forking the worker processes, then all of them see the same table.
+    The table is split into shards by crc32 of user_id. Every shard is an open addressing
+        hash table guarded by its own process-shared lock, so workers only
+        contend when they touch the same shard.
+    Deleted slots (tombstones) are reused by inserts, and a shard is rebuilt without them
+        once config.SHARED_REGISTRY_MAX_DELETED of it are deleted, so that lookups of
+        users who aren't there still stop at an empty slot soon after log ins and outs.
+    Member Variables:
+        worker_id: set by every worker after fork, recorded as the owner of its log ins
+        deleted: shared memory with the number of deleted slots of every shard
+    """
+
+    def __init__(self, capacity=config.SHARED_REGISTRY_CAPACITY,
+                 shards=config.SHARED_REGISTRY_SHARDS):
+        self.shards = shards
+        self.shard_capacity = capacity // shards
+        self.memory = mmap.mmap(-1, SLOT.size * self.shard_capacity * shards)
+        self.deleted = mmap.mmap(-1, COUNT.size * shards)
+        self.max_deleted = max(1, int(self.shard_capacity * config.SHARED_REGISTRY_MAX_DELETED))
+        self.locks = [multiprocessing.Lock() for _ in range(shards)]
+        self.worker_id = 0
+
+    def locate(self, user_id):
+        """Returns the shard, hash and key of user_id."""
+        key = user_id.encode().ljust(config.ID_LEN, b'\x00')
+        h = zlib.crc32(key)
+        return h % self.shards, h // self.shards, key
+
+    def find(self, shard, h, key):
+        """Returns the offset of key's slot (None if not found)
+            and the offset of the first free slot for it (None if shard is full).
+        Call with the shard lock held.
+        """
+        free = None
+        base = shard * self.shard_capacity
+        for i in range(self.shard_capacity):
+            offset = (base + (h + i) % self.shard_capacity) * SLOT.size
+            state = self.memory[offset]
+            if state == EMPTY:
+                return None, offset if free is None else free
+            if state == DELETED:
+                if free is None:
+                    free = offset
+            elif self.memory[offset + 1:offset + 1 + config.ID_LEN] == key:
+                return offset, free
+        return None, free
+
+    def read(self, offset):
+        _, _, ip, port, owner = SLOT.unpack_from(self.memory, offset)
+        return {'ip': unpack_ip(ip), 'port': port}, owner
+
+    def get(self, user_id, default=None):
+        shard, h, key = self.locate(user_id)
+        with self.locks[shard]:
+            offset, _ = self.find(shard, h, key)
+            if offset is None:
+                return default
+            info, _ = self.read(offset)
+        return info
+
+    def owner(self, user_id):
+        """Returns the worker that user_id logged in, None if offline."""
+        shard, h, key = self.locate(user_id)
+        with self.locks[shard]:
+            offset, _ = self.find(shard, h, key)
+            if offset is None:
+                return None
+            _, owner = self.read(offset)
+        return owner
+
+    def __getitem__(self, user_id):
+        info = self.get(user_id)
+        if info is None:
+            raise KeyError(user_id)
+        return info
+
+    def __contains__(self, user_id):
+        return self.get(user_id) is not None
+
+    def __setitem__(self, user_id, info):
+        shard, h, key = self.locate(user_id)
+        with self.locks[shard]:
+            offset, free = self.find(shard, h, key)
+            if offset is None:
+                offset = free
+            if offset is None:
+                raise RegistryFullError('Shared registry is full!')
+            if self.memory[offset] == DELETED:  # reused
+                self.count_deleted(shard, -1)
+            SLOT.pack_into(self.memory, offset, USED, key, pack_ip(info['ip']),
+                           info['port'], self.worker_id)
+
+    def pop(self, user_id, default=None):
+        shard, h, key = self.locate(user_id)
+        with self.locks[shard]:
+            offset, _ = self.find(shard, h, key)
+            if offset is None:
+                return default
+            info, _ = self.read(offset)
+            self.delete(shard, offset)
+        return info
+
+    def delete(self, shard, offset):
+        """Free the slot at offset, call with the shard lock held.
+        If the next slot is empty, no lookup needs to go past this one,
+            so it and the deleted slots right before it become empty instead of deleted.
+        """
+        base = shard * self.shard_capacity * SLOT.size
+        size = self.shard_capacity * SLOT.size
+        if self.memory[base + (offset - base + SLOT.size) % size] != EMPTY:
+            self.memory[offset] = DELETED
+            if self.count_deleted(shard, 1) >= self.max_deleted:
+                self.rebuild(shard)
+            return
+        self.memory[offset] = EMPTY
+        offset = base + (offset - base - SLOT.size) % size
+        while self.memory[offset] == DELETED:
+            self.memory[offset] = EMPTY
+            self.count_deleted(shard, -1)
+            offset = base + (offset - base - SLOT.size) % size
+
+    def count_deleted(self, shard, change):
+        """Add change to the deleted slots of shard, returns the new number."""
+        count = COUNT.unpack_from(self.deleted, shard * COUNT.size)[0] + change
+        COUNT.pack_into(self.deleted, shard * COUNT.size, count)
+        return count
+
+    def rebuild(self, shard):
+        """Insert the users of shard again into an empty shard, call with the shard lock held."""
+        start = shard * self.shard_capacity * SLOT.size
+        end = start + self.shard_capacity * SLOT.size
+        used = [self.memory[offset:offset + SLOT.size] for offset in range(start, end, SLOT.size)
+                if self.memory[offset] == USED]
+        self.memory[start:end] = bytes(end - start)
+        for slot in used:
+            key = slot[1:1 + config.ID_LEN]
+            _, free = self.find(shard, zlib.crc32(key) // self.shards, key)
+            self.memory[free:free + SLOT.size] = slot
+        COUNT.pack_into(self.deleted, shard * COUNT.size, 0)
+
+    def keys(self):
+        """Scan the whole table, only for rare operations."""
+        for offset in range(0, len(self.memory), SLOT.size):
+            if self.memory[offset] == USED:
+                yield SLOT.unpack_from(self.memory, offset)[1].rstrip(b'\x00').decode()
+
+    def __len__(self):
+        return sum(1 for _ in self.keys())
+
+
+class WatchTable:
+    """Which workers have watchers of which users, in shared memory, so that a worker
+        forwards a presence change only to the workers with someone to push it to.
+    User ids are counted in buckets by crc32, a user sharing a bucket with a watched one
+        only costs a forward that finds no watcher.
+    Every worker only changes its own counts, so there is no lock.
+    """
+
+    def __init__(self, workers, buckets=config.SHARED_WATCH_BUCKETS):
+        self.workers = workers
+        self.buckets = buckets
+        self.memory = mmap.mmap(-1, COUNT.size * workers * buckets)
+        self.counts = memoryview(self.memory).cast('I')
+
+    def index(self, user_id, worker):
+        return zlib.crc32(user_id.encode()) % self.buckets * self.workers + worker
+
+    def add(self, user_id, worker, change):
+        """The watched users of worker in the bucket of user_id change by change."""
+        self.counts[self.index(user_id, worker)] += change
+
+    def is_watched(self, user_id, worker):
+        """Whether worker may have watchers of user_id."""
+        return self.counts[self.index(user_id, worker)] > 0
+
+
+def pack_ip(ip):
+    if ':' in ip:
+        return socket.inet_pton(socket.AF_INET6, ip)
+    return IPV4_MAPPED_PREFIX + socket.inet_aton(ip)
+
+
+def unpack_ip(packed):
+    if packed.startswith(IPV4_MAPPED_PREFIX):
+        return socket.inet_ntoa(packed[12:])
+    return socket.inet_ntop(socket.AF_INET6, packed)
@@ -0,0 +1,73 @@
+"""Tests of shared_registry, run with python -m pytest tests"""
+
+import os
+import sys
+import random
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shared_registry import SharedRegistry, WatchTable, SLOT, EMPTY, DELETED  # noqa: E402
+
+
+def longest_probe(registry, shard):
+    """Most slots a lookup of a user not in shard can read, the longest run without an empty one."""
+    states = [registry.memory[(shard * registry.shard_capacity + i) * SLOT.size]
+              for i in range(registry.shard_capacity)]
+    if EMPTY not in states:
+        return registry.shard_capacity
+    longest = run = 0
+    for state in states + states:  # runs may wrap around the end of the shard
+        run = run + 1 if state != EMPTY else 0
+        longest = max(longest, run)
+    return longest + 1
+
+
+class SharedRegistryTest(unittest.TestCase):
+
+    def test_get_set_pop(self):
+        registry = SharedRegistry(capacity=64, shards=4)
+        registry['2017011527'] = {'ip': '127.0.0.1', 'port': 2333}
+        registry['2017011528'] = {'ip': '::1', 'port': 2334}
+        self.assertEqual(registry['2017011527'], {'ip': '127.0.0.1', 'port': 2333})
+        self.assertEqual(registry.pop('2017011528'), {'ip': '::1', 'port': 2334})
+        self.assertNotIn('2017011528', registry)
+        self.assertEqual(len(registry), 1)
+
+    def test_lookups_stay_bounded_under_churn(self):
+        registry = SharedRegistry(capacity=1024, shards=4)
+        online = set()
+        for i in range(50000):  # users keep logging in and out, new ids every time
+            if len(online) < 500 or random.random() < 0.5 and len(online) < 700:
+                user_id = str(2000000000 + i)
+                registry[user_id] = {'ip': '127.0.0.1', 'port': i % 60000}
+                online.add(user_id)
+            else:
+                registry.pop(online.pop())
+
+        self.assertEqual(set(registry.keys()), online)
+        for shard in range(registry.shards):
+            deleted = sum(registry.memory[(shard * registry.shard_capacity + i) * SLOT.size]
+                          == DELETED for i in range(registry.shard_capacity))
+            self.assertLess(deleted, registry.max_deleted)
+            self.assertEqual(deleted, registry.count_deleted(shard, 0))
+            used = sum(registry.get(user_id) is not None and registry.locate(user_id)[0] == shard
+                       for user_id in online)
+            self.assertLessEqual(longest_probe(registry, shard), used + registry.max_deleted + 1)
+        self.assertIsNone(registry.get('1999999999'))
+
+
+
+class WatchTableTest(unittest.TestCase):
+
+    def test_only_workers_watching_are_flagged(self):
+        table = WatchTable(workers=3, buckets=1024)
+        table.add('2017011527', 1, 1)
+        self.assertTrue(table.is_watched('2017011527', 1))
+        self.assertFalse(table.is_watched('2017011527', 0))
+        self.assertFalse(table.is_watched('2017011527', 2))
+        table.add('2017011527', 1, -1)
+        self.assertFalse(table.is_watched('2017011527', 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+"""Tests of classes.transfer, run with python -m pytest tests"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import config  # noqa: E402
+from classes.transfer import PartialFile, NoRoomError, get_transfer_id, is_transfer_id, \
+    remove_stale_partials  # noqa: E402
+
+
+class TransferIdTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.folder = os.path.join(self.root, 'files')
+        os.mkdir(self.folder)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_own_ids_are_valid(self):
+        transfer_id = get_transfer_id('chat', '2017011527', __file__, os.stat(__file__))
+        self.assertTrue(is_transfer_id(transfer_id))
+        partial = PartialFile(transfer_id, self.folder)
+        self.assertEqual(os.path.dirname(partial.part_path), self.folder)
+
+    def test_malicious_ids_are_refused(self):
+        for transfer_id in ('../../evil', '../0123456789ab', '0123456789abcdeF',
+                            '0123456789abcde', '0123456789abcdef0', '/etc/passwd', '', None, 16):
+            self.assertFalse(is_transfer_id(transfer_id), transfer_id)
+            with self.assertRaises(ValueError):
+                PartialFile(transfer_id, self.folder)
+
+    def test_malicious_offer_writes_nothing_outside(self):
+        with self.assertRaises(ValueError):
+            PartialFile('/../../escaped', self.folder).start('hash', [], 10, 2, 'a.txt')
+        self.assertEqual(os.listdir(self.root), ['files'])
+        self.assertEqual(os.listdir(self.folder), [])
+
+
+
+class NoRoomTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_huge_offer_is_refused(self):
+        partial = PartialFile('0123456789abcdef', self.folder)
+        with self.assertRaises(NoRoomError):
+            partial.start('hash', [], config.FILE_MAX_SIZE + 1, 2, 'a.txt')
+        with self.assertRaises(NoRoomError):  # more than the disk has
+            partial.start('hash', [], shutil.disk_usage(self.folder).free, 2, 'a.txt')
+        with self.assertRaises(NoRoomError):
+            partial.start('hash', [], -1, 2, 'a.txt')
+        self.assertEqual(os.listdir(self.folder), [])
+
+    def test_small_offer_is_allocated(self):
+        partial = PartialFile('0123456789abcdef', self.folder)
+        self.assertEqual(partial.start('hash', [0], 100, 2, 'a.txt'), [[0, 100]])
+        self.assertEqual(os.path.getsize(partial.part_path), 100)
+
+    def test_stale_partials_are_removed(self):
+        stale = PartialFile('0123456789abcdef', self.folder)
+        stale.start('hash', [0], 100, 2, 'a.txt')
+        fresh = PartialFile('fedcba9876543210', self.folder)
+        fresh.start('hash', [0], 100, 2, 'b.txt')
+        other = os.path.join(self.folder, '.index.json')
+        open(other, 'w').close()
+        old = time.time() - config.FILE_PARTIAL_TTL - 60
+        for path in (stale.part_path, stale.manifest_path, other):
+            os.utime(path, (old, old))
+
+        remove_stale_partials(self.folder)
+        self.assertEqual(sorted(os.listdir(self.folder)),
+                         ['.fedcba9876543210.manifest', '.fedcba9876543210.part', '.index.json'])
+
+
+if __name__ == '__main__':
+    unittest.main()
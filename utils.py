@@ -1,150 +1,476 @@
-"""This file contains some utility functions."""
-
-import os
-import re
-import struct
-import random
-from PyQt5.QtGui import QIcon
-
-import config
-
-
-def get_icon():
-    """Randomly sample an icon and return."""
-    all_icon_path = os.listdir(config.ICON_PATH)
-    icon_path = random.sample(all_icon_path, 1)[0]
-    return QIcon(os.path.join(config.ICON_PATH, icon_path))
-
-
-def is_number(text):
-    pattern = r'\d{' + str(len(text)) + '}'
-    if re.match(pattern, text) is not None:
-        return True
-    return False
-
-
-def is_valid_id(user_id):
-    """Judge whether the id is valid. Should be ten digits."""
-    pattern = r'\d{' + str(config.ID_LEN) + '}'
-    if re.match(pattern, user_id) is not None:
-        return True
-    return False
-
-
-def is_valid_port(port):
-    if port <= 1024 or port > 65535 or port in config.INVALID_PORT:
-        return False
-    return True
-
-
-def get_filename_from_path(text):
-    """Get the filename from a piece of text.
-    Find the last '/' and returns the words after that.
-    """
-    return text[text.rindex('/') + 1:]
-
-
-def get_chat_name_from_id(all_id):
-    """Get a chat name 'id1-id2-id3-...' from a list of id."""
-    all_id.sort()
-    chat_name = '{}'.format(all_id[0])
-    for i in range(1, len(all_id)):
-        chat_name += '-'
-        chat_name += all_id[i]
-    return chat_name
-
-
-def get_id_from_chat_name(chat_name):
-    """Get a list of id from 'id1-id2-id3-...'."""
-    all_id = []
-    while True:
-        idx = chat_name.find('-')
-        if idx == -1:
-            all_id.append(chat_name)
-            break
-        all_id.append(chat_name[:config.ID_LEN])
-        chat_name = chat_name[config.ID_LEN + 1:]
-    return all_id
-
-
-def encode_message(chat_name, port, message_type, sender_id, message, length):
-    """Encode message for sending. In the format of ChatName_ListenPort_type_id_content_length.
-    Actually length is only useful when sending images or files.
-    """
-    message = '{}_{}_{}_{}_{}_{}'.format(
-        chat_name, port, message_type, sender_id, message, length)
-    return message.encode()
-
-
-def decode_message(message):
-    """Decode received message. Returns chat_name, port, type, id and content (optionally length)."""
-    try:
-        message = message.decode()
-    except AttributeError:
-        return None
-
-    # get chat_name
-    idx = message.index('_')
-    chat_name = message[:idx]
-    message = message[idx + 1:]
-
-    # get port
-    idx = message.index('_')
-    port = message[:idx]
-    if not is_number(port):
-        return None
-    port = int(port)
-    message = message[idx + 1:]
-
-    # get length
-    idx = message.rindex('_')
-    length = message[idx + 1:]
-    if not is_number(length):
-        return None
-    length = int(length)
-    message = message[:idx]
-
-    # type, id and content
-    idx = message.index('_')
-    message_type = int(message[:idx])
-    if message_type not in config.MESSAGE_TYPE:
-        return None
-    message = message[idx + 1:]
-    sender_id = message[:10]
-    if not is_valid_id(sender_id):
-        return None
-    return [chat_name, port, message_type, sender_id, message[11:], length]
-
-
-# https://stackoverflow.com/questions/17667903/python-socket-receive-large-amount-of-data
-def send_msg(sock, msg):
-    """Prefix each message with a 4-byte length (network byte order)"""
-    msg = struct.pack('>I', len(msg)) + msg
-    try:
-        sock.sendall(msg)
-    except ConnectionResetError:
-        pass
-
-
-def recv_msg(sock):
-    """Read message length and unpack it into an integer"""
-    raw_msglen = recvall(sock, 4)
-    if not raw_msglen:
-        return None
-    msglen = struct.unpack('>I', raw_msglen)[0]
-    # Read the message data
-    try:
-        return recvall(sock, msglen)
-    except ConnectionResetError:
-        return None
-
-
-def recvall(sock, n):
-    """Helper function to recv n bytes or return None if EOF is hit"""
-    data = bytearray()
-    while len(data) < n:
-        packet = sock.recv(n - len(data))
-        if not packet:
-            return None
-        data.extend(packet)
-    return data
+"""This file contains some utility functions."""
+
+import os
+import re
+import mmap
+import zlib
+import errno
+import selectors
+import struct
+import random
+from PyQt5.QtGui import QIcon
+
+import config
+
+NUMBER_PATTERN = re.compile(r'\d*')
+ID_PATTERN = re.compile(r'\d{' + str(config.ID_LEN) + '}')
+
+# binary message header: magic, version, type, port, sender_id, chat name length, length
+# followed by the chat name and then the content
+BINARY_MAGIC = 0xB7  # text messages start with a digit of chat name, never this byte
+BINARY_MAGIC_BYTE = bytes((BINARY_MAGIC,))
+BINARY_VERSION = 1
+BINARY_HEADER = struct.Struct('>BBBH10sHQ')
+
+
+def get_icon():
+    """Randomly sample an icon and return."""
+    all_icon_path = os.listdir(config.ICON_PATH)
+    icon_path = random.sample(all_icon_path, 1)[0]
+    return QIcon(os.path.join(config.ICON_PATH, icon_path))
+
+
+def is_number(text):
+    return NUMBER_PATTERN.fullmatch(text) is not None
+
+
+def is_valid_id(user_id):
+    """Judge whether the id is valid. Should be ten digits."""
+    return ID_PATTERN.match(user_id) is not None
+
+
+def is_valid_port(port):
+    if port <= 1024 or port > 65535 or port in config.INVALID_PORT:
+        return False
+    return True
+
+
+def get_filename_from_path(text):
+    """Get the filename from a piece of text.
+    Find the last '/' and returns the words after that.
+    """
+    return text[text.rindex('/') + 1:]
+
+
+def get_chat_name_from_id(all_id):
+    """Get a chat name 'id1-id2-id3-...' from a list of id."""
+    all_id.sort()
+    chat_name = '{}'.format(all_id[0])
+    for i in range(1, len(all_id)):
+        chat_name += '-'
+        chat_name += all_id[i]
+    return chat_name
+
+
+def get_id_from_chat_name(chat_name):
+    """Get a list of id from 'id1-id2-id3-...'."""
+    all_id = []
+    while True:
+        idx = chat_name.find('-')
+        if idx == -1:
+            all_id.append(chat_name)
+            break
+        all_id.append(chat_name[:config.ID_LEN])
+        chat_name = chat_name[config.ID_LEN + 1:]
+    return all_id
+
+
+def encode_message(chat_name, port, message_type, sender_id, message, length):
+    """Encode message for sending with the codec chosen by config.MESSAGE_CODEC.
+    Actually length is only useful when sending images or files.
+    """
+    if config.MESSAGE_CODEC == 'binary':
+        return encode_message_binary(chat_name, port, message_type, sender_id, message, length)
+    return encode_message_text(chat_name, port, message_type, sender_id, message, length)
+
+
+def encode_message_text(chat_name, port, message_type, sender_id, message, length):
+    """Encode message in the format of ChatName_ListenPort_type_id_content_length."""
+    message = '{}_{}_{}_{}_{}_{}'.format(
+        chat_name, port, message_type, sender_id, message, length)
+    return message.encode()
+
+
+def encode_message_binary(chat_name, port, message_type, sender_id, message, length):
+    """Encode message as BINARY_HEADER + chat name + content.
+    Content maybe str or bytes-like, the latter is not encoded again.
+    """
+    chat_name = chat_name.encode()
+    if isinstance(message, str):
+        message = message.encode()
+    header = BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, message_type, port,
+                                sender_id.encode(), len(chat_name), length)
+    return b''.join((header, chat_name, message))
+
+
+def decode_message(message):
+    """Decode received message of either codec.
+    Returns chat_name, port, type, id and content (optionally length).
+    """
+    if message is None:
+        return None
+    if message[:1] == BINARY_MAGIC_BYTE:
+        return decode_message_binary(message)
+    return decode_message_text(message)
+
+
+def decode_message_binary(message):
+    """Decode a binary message, header fields are unpacked in place.
+    Content is decoded to str like decode_message_text().
+    """
+    if len(message) < BINARY_HEADER.size:
+        return None
+    _, version, message_type, port, sender_id, name_len, length = \
+        BINARY_HEADER.unpack_from(message)
+    if version != BINARY_VERSION or message_type not in config.MESSAGE_TYPE or \
+            not sender_id.isdigit():  # fixed width, so ten ascii digits
+        return None
+    content_start = BINARY_HEADER.size + name_len
+    try:
+        chat_name = message[BINARY_HEADER.size:content_start].decode()
+    except UnicodeDecodeError:
+        return None
+    content = message[content_start:].decode(errors='replace')
+    return [chat_name, port, message_type, sender_id.decode(), content, length]
+
+
+def decode_message_text(message):
+    """Decode a message in the format of ChatName_ListenPort_type_id_content_length."""
+    try:
+        message = message.decode()
+    except AttributeError:
+        return None
+
+    # get chat_name
+    idx = message.index('_')
+    chat_name = message[:idx]
+    message = message[idx + 1:]
+
+    # get port
+    idx = message.index('_')
+    port = message[:idx]
+    if not is_number(port):
+        return None
+    port = int(port)
+    message = message[idx + 1:]
+
+    # get length
+    idx = message.rindex('_')
+    length = message[idx + 1:]
+    if not is_number(length):
+        return None
+    length = int(length)
+    message = message[:idx]
+
+    # type, id and content
+    idx = message.index('_')
+    message_type = int(message[:idx])
+    if message_type not in config.MESSAGE_TYPE:
+        return None
+    message = message[idx + 1:]
+    sender_id = message[:10]
+    if not is_valid_id(sender_id):
+        return None
+    return [chat_name, port, message_type, sender_id, message[11:], length]
+
+
+# https://stackoverflow.com/questions/17667903/python-socket-receive-large-amount-of-data
+def pack_msg(msg):
+    """Prefix a message with a 4-byte length (network byte order)"""
+    return struct.pack('>I', len(msg)) + msg
+
+
+def split_msgs(buffer):
+    """Split all complete length-prefixed messages off the front of buffer.
+    Returns a list of messages and the remaining (incomplete) bytes.
+    """
+    messages = []
+    start = 0
+    while len(buffer) - start >= 4:
+        msglen = struct.unpack_from('>I', buffer, start)[0]
+        if len(buffer) - start - 4 < msglen:
+            break
+        messages.append(bytes(buffer[start + 4:start + 4 + msglen]))
+        start += 4 + msglen
+    return messages, buffer[start:]
+
+
+def send_msg(sock, msg):
+    """Prefix each message with a 4-byte length (network byte order)"""
+    send_all(sock, pack_msg(msg))
+
+
+def send_all(sock, data):
+    """sock.sendall(data), but a non-blocking sock may be full while an image or file is sent,
+        so wait for it instead of giving up halfway and breaking the stream.
+    """
+    data = memoryview(data)
+    try:
+        sent = 0
+        while sent < len(data):
+            try:
+                sent += sock.send(data[sent:])
+            except BlockingIOError:
+                wait_writable(sock)
+    except ConnectionResetError:
+        pass
+
+
+def recv_msg(sock):
+    """Read message length and unpack it into an integer
+    A non-blocking sock with nothing to read raises BlockingIOError.
+    """
+    raw_msglen = recvall(sock, 4)
+    if not raw_msglen:
+        return None
+    msglen = struct.unpack('>I', raw_msglen)[0]
+    # Read the message data
+    try:
+        return recvall(sock, msglen, wait=True)
+    except ConnectionResetError:
+        return None
+
+
+def recvall(sock, n, wait=False):
+    """Helper function to recv n bytes or return None if EOF is hit
+    Once some of them are received (or if wait), wait for the rest on a non-blocking sock
+        instead of raising BlockingIOError and losing them,
+        None if they don't come in config.FILE_TRANSFER_TIMEOUT.
+    """
+    data = bytearray()
+    while len(data) < n:
+        try:
+            packet = sock.recv(n - len(data))
+        except BlockingIOError:
+            if not data and not wait:
+                raise
+            if not wait_for(sock, selectors.EVENT_READ):
+                return None
+            continue
+        if not packet:
+            return None
+        data.extend(packet)
+    return data
+
+
+# errors of the first os.sendfile() meaning "not for this file or socket", nothing sent yet
+SENDFILE_UNSUPPORTED = {errno.EINVAL, errno.ENOTSOCK, errno.ENOSYS,
+                        getattr(errno, 'EOPNOTSUPP', errno.EINVAL)}
+
+
+def wait_for(sock, events, timeout=config.FILE_TRANSFER_TIMEOUT):
+    """Wait until sock is ready for events (selectors.EVENT_READ or EVENT_WRITE),
+        False if it isn't in timeout seconds.
+    A selector instead of select.select(), which can't watch fds over 1023.
+    """
+    with selectors.DefaultSelector() as selector:
+        selector.register(sock, events)
+        return bool(selector.select(timeout))
+
+
+def wait_writable(sock):
+    """Block until a (maybe non-blocking) sock can be written,
+        raise TimeoutError if it can't in config.FILE_TRANSFER_TIMEOUT, e.g. the receiver hangs.
+    """
+    if not wait_for(sock, selectors.EVENT_WRITE):
+        raise TimeoutError('sock not writable in {} seconds'.format(config.FILE_TRANSFER_TIMEOUT))
+
+
+def send_file(sock, path, offset=0, count=None, progress=None):
+    """Send count bytes (default to the end) of the file at path starting from offset.
+    Use os.sendfile so that the kernel copies the file to sock directly,
+        fall back to sending config.FILE_CHUNK_SIZE chunks where it's unavailable.
+    If progress is given, it's called with the number of bytes sent every time some are.
+    Works for both blocking and non-blocking sock, returns the number of bytes sent.
+    """
+    with open(path, 'rb') as file:
+        if count is None:
+            count = os.fstat(file.fileno()).st_size - offset
+        if hasattr(os, 'sendfile'):
+            try:
+                return sendfile(sock, file, offset, count, progress)
+            except OSError as e:
+                if e.errno not in SENDFILE_UNSUPPORTED:
+                    raise
+        return send_file_chunks(sock, file, offset, count, progress)
+
+
+def sendfile(sock, file, offset, count, progress=None):
+    sent = 0
+    while sent < count:
+        try:
+            n = os.sendfile(sock.fileno(), file.fileno(), offset + sent, count - sent)
+        except BlockingIOError:
+            wait_writable(sock)
+            continue
+        except OSError as e:
+            if sent and e.errno in SENDFILE_UNSUPPORTED:  # can't fall back halfway
+                raise ConnectionError(e.errno, e.strerror)
+            raise
+        if n == 0:  # file truncated
+            break
+        sent += n
+        if progress is not None:
+            progress(n)
+    return sent
+
+
+def send_file_chunks(sock, file, offset, count, progress=None):
+    buffer = bytearray(min(config.FILE_CHUNK_SIZE, max(count, 1)))
+    view = memoryview(buffer)
+    file.seek(offset)
+    sent = 0
+    while sent < count:
+        size = file.readinto(view[:min(len(buffer), count - sent)])
+        if not size:  # file truncated
+            break
+        start = 0
+        while start < size:
+            try:
+                start += sock.send(view[start:size])
+            except BlockingIOError:
+                wait_writable(sock)
+        sent += size
+        if progress is not None:
+            progress(size)
+    return sent
+
+
+def send_mapped(sock, source, offset, count, progress=None):
+    """Send count bytes of source (a mmap or other buffer) from offset without copying them.
+    Several threads may send from the same source to different socks at the same time.
+    """
+    sent = 0
+    with memoryview(source) as view:
+        while sent < count:
+            try:
+                n = sock.send(view[offset + sent:offset + count])
+            except BlockingIOError:
+                wait_writable(sock)
+                continue
+            sent += n
+            if progress is not None:
+                progress(n)
+    return sent
+
+
+def recv_file(sock, path, size, offset=None, checksums=None, progress=None):
+    """Receive exactly size bytes from a (maybe non-blocking) sock into the file at path.
+    If offset is given, write into the existing file from there instead of truncating it,
+        several threads may receive different ranges of the same file at the same time,
+        see recv_mapped() for a file allocated to its full size beforehand.
+    Wait for data with a selector instead of spinning on BlockingIOError,
+        read with recv_into a config.FILE_CHUNK_SIZE buffer and write it when full.
+    If checksums is a list, crc32 of every config.FILE_CHUNK_SIZE chunk received is appended,
+        computed on the buffer before it's written, so the file is never read again.
+    If progress is given, it's called with the number of bytes written every time the buffer is.
+    Stops early if the sender closes or sends nothing for config.FILE_TRANSFER_TIMEOUT,
+        returns the number of bytes received.
+    """
+    if offset is not None and size and os.path.getsize(path) >= offset + size:
+        return recv_mapped(sock, path, size, offset, checksums, progress)
+    buffer = bytearray(min(config.FILE_CHUNK_SIZE, max(size, 1)))
+    view = memoryview(buffer)
+    received = filled = 0
+    position = offset or 0
+    with open(path, 'wb' if offset is None else 'r+b') as file, \
+            selectors.DefaultSelector() as selector:
+        selector.register(sock, selectors.EVENT_READ)
+        while received < size:
+            try:
+                n = sock.recv_into(view[filled:], min(len(buffer) - filled, size - received))
+            except BlockingIOError:
+                if not selector.select(config.FILE_TRANSFER_TIMEOUT):
+                    break
+                continue
+            except OSError:  # reset by sender, or timeout of a blocking sock
+                break
+            if not n:  # closed by sender
+                break
+            received += n
+            filled += n
+            if filled == len(buffer):
+                if checksums is not None:
+                    checksums.append(zlib.crc32(view))
+                write_at(file, view, position)
+                position += filled
+                if progress is not None:
+                    progress(filled)
+                filled = 0
+        if checksums is not None and filled:
+            checksums.append(zlib.crc32(view[:filled]))
+        write_at(file, view[:filled], position)
+        if progress is not None and filled:
+            progress(filled)
+    return received
+
+
+def recv_mapped(sock, path, size, offset, checksums=None, progress=None):
+    """recv_file() into a range of an existing file, by mapping the range into memory
+        and receiving straight into it: the kernel copies the data from sock to the page cache
+        once, with no buffer in between and no write call, and writes it back in large ranges.
+    Checksums and progress are taken every config.FILE_CHUNK_SIZE bytes as in recv_file().
+    """
+    start = offset - offset % mmap.ALLOCATIONGRANULARITY  # where a mapping may start
+    received = checked = 0
+    with open(path, 'r+b') as file, selectors.DefaultSelector() as selector:
+        selector.register(sock, selectors.EVENT_READ)
+        mapped = mmap.mmap(file.fileno(), offset - start + size, offset=start)
+        view = memoryview(mapped)[offset - start:]
+        try:
+            while received < size:
+                try:
+                    n = sock.recv_into(view[received:])
+                except BlockingIOError:
+                    if not selector.select(config.FILE_TRANSFER_TIMEOUT):
+                        break
+                    continue
+                except OSError:  # reset by sender, or timeout of a blocking sock
+                    break
+                if not n:  # closed by sender
+                    break
+                received += n
+                while received - checked >= config.FILE_CHUNK_SIZE:
+                    checked = check_chunk(view, checked, config.FILE_CHUNK_SIZE,
+                                          checksums, progress)
+            if received > checked:
+                check_chunk(view, checked, received - checked, checksums, progress)
+        finally:
+            view.release()
+            mapped.close()
+    return received
+
+
+def check_chunk(view, position, size, checksums, progress):
+    if checksums is not None:
+        checksums.append(zlib.crc32(view[position:position + size]))
+    if progress is not None:
+        progress(size)
+    return position + size
+
+
+def preallocate(path, size):
+    """Create the file at path with size bytes allocated on disk by posix_fallocate,
+        so that it's not fragmented and receiving into it never runs out of space halfway.
+    Falls back to a sparse file where it's unsupported.
+    """
+    with open(path, 'wb') as file:
+        if size and hasattr(os, 'posix_fallocate'):
+            try:
+                os.posix_fallocate(file.fileno(), 0, size)
+                return
+            except OSError as e:
+                if e.errno == errno.ENOSPC:
+                    raise
+        file.truncate(size)
+
+
+def write_at(file, data, position):
+    """Write data at position of file without moving a shared file offset."""
+    if not hasattr(os, 'pwrite'):  # Windows, but then every thread opens its own file
+        file.seek(position)
+        file.write(data)
+        return
+    written = 0
+    while written < len(data):
+        written += os.pwrite(file.fileno(), data[written:], position + written)